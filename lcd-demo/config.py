@@ -6,6 +6,9 @@ PUMP_PINS = {
     
 }
 
+# Pump flow rate (mL per second, the same for every pump)
+FLOW_RATE = 2.08
+
 # Priming durations (seconds) for each pump
 PRIMING_TIME = {
     'rum': 5,
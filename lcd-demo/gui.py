@@ -4,54 +4,139 @@ import config
 
 
 from drinks import drink_list
+from thumbnails import Thumbnails
+
+
+# Frame cap for screen updates (the framebuffer copy is the expensive part)
+FPS = 30
+# Rendered strings kept around, keyed by (text, colour)
+TEXT_CACHE_SIZE = 256
+# Menu entries after the highlighted one whose thumbnails are loaded ahead
+PREFETCH = 3
+
+BLACK  = (0, 0, 0)
+WHITE  = (255, 255, 255)
+YELLOW = (255, 255, 0)
+GREEN  = (0, 255, 0)
+
+# Layout
+MENU_X, MENU_Y, MENU_ROW = 20, 20, 40
+BAR_RECT = pygame.Rect(20, 200, 280, 20)
+PCT_POS  = (150, 170)
 
 
 class GUI:
     def __init__(self, screen):
         self.screen = screen
         self.font = pygame.font.Font(None, 28)
+        self.text_cache = {}
+        self.dirty = []                 # rects drawn since the last present()
+        self.last_frame = 0.0
+        self.menu_state = None          # (options, selected) currently on screen
+        self.pour_pct = None            # percentage currently on the pour bar
 
-        # Pre‑load recipe images keyed by name
-        self.recipe_images = {}
-        for drink in drink_list:
-            try:
-                img = pygame.image.load(drink["image"]).convert_alpha()
-                # Optionally: scale to fit half the screen width
-                img = pygame.transform.smoothscale(img, (120, 120))
-                self.recipe_images[drink["name"]] = img
-            except Exception as e:
-                print(f"Failed loading {drink['image']}: {e}")
+        # Recipe thumbnails load on demand; only their paths are known up front
+        self.thumbnails = Thumbnails()
+        self.recipe_images = {drink["name"]: drink["image"] for drink in drink_list}
 
-    def draw_text(self, text, pos):
-        surf = self.font.render(text, True, (255,255,255))
+    def text(self, text, color=WHITE):
+        """
+        The rendered surface for `text`, rendered only the first time it is asked for.
+        """
+        key = (text, color)
+        surf = self.text_cache.get(key)
+        if surf is None:
+            if len(self.text_cache) >= TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surf = self.text_cache[key] = self.font.render(text, True, color)
+        return surf
+
+    def blit(self, surf, pos, clear=None):
+        """
+        Draw `surf` at `pos` and mark its area for the next update. `clear` is an
+        extra rect to wipe first (e.g. where longer text used to be).
+        """
+        rect = surf.get_rect(topleft=pos)
+        if clear is not None:
+            rect = rect.union(clear)
+            self.screen.fill(BLACK, rect)
         self.screen.blit(surf, pos)
+        self.dirty.append(rect)
+        return rect
+
+    def present(self, force=True):
+        """
+        Push the dirty rects to the display. With force=False the update is skipped
+        if the last one was less than a frame ago; the rects stay pending.
+        """
+        now = time.monotonic()
+        if not self.dirty or (not force and now - self.last_frame < 1.0 / FPS):
+            return False
+        pygame.display.update(self.dirty)
+        self.dirty = []
+        self.last_frame = now
+        return True
+
+    def clear(self):
+        self.screen.fill(BLACK)
+        self.dirty = [self.screen.get_rect()]
+        self.menu_state = None
+        self.pour_pct = None
+
+    def draw_text(self, text, pos):
+        self.blit(self.text(text), pos)
 
     def show_menu(self, options, selected):
-        self.screen.fill((0,0,0))
-        for i, opt in enumerate(options):
-            color = (255,255,0) if i == selected else (255,255,255)
-            surf = self.font.render(opt, True, color)
-            self.screen.blit(surf, (20, 20 + 40*i))
-        pygame.display.flip()
+        # Same menu already showing: only the old and new highlighted rows change
+        if self.menu_state and self.menu_state[0] == options:
+            rows = {self.menu_state[1], selected}
+        else:
+            self.clear()
+            rows = range(len(options))
+        for i in rows:
+            color = YELLOW if i == selected else WHITE
+            row = pygame.Rect(0, MENU_Y + MENU_ROW*i, self.screen.get_width(), MENU_ROW)
+            self.screen.fill(BLACK, row)
+            self.screen.blit(self.text(options[i], color), (MENU_X, row.y))
+            self.dirty.append(row)
+        self.menu_state = (list(options), selected)
+        self.present()
+
+        upcoming = [options[(selected + i) % len(options)] for i in range(PREFETCH + 1)]
+        self.thumbnails.prefetch([self.recipe_images[name] for name in upcoming
+                                  if name in self.recipe_images])
 
     def show_recipe(self, name, ingredients):
-        self.screen.fill((0, 0, 0))
+        self.clear()
         # Draw the image centered top‑left
-        img = self.recipe_images.get(name)
+        src = self.recipe_images.get(name)
+        img = self.thumbnails.get(src) if src else None
         if img:
             self.screen.blit(img, (10, 10))
         # Draw ingredients list next to image
         y = 10
         for fluid, ml in ingredients.items():
-            text = self.font.render(f"{fluid}: {ml}ml", True, (255, 255, 255))
             # Offset x by image width + padding
-            self.screen.blit(text, (140, y))
+            self.screen.blit(self.text(f"{fluid}: {ml}ml"), (140, y))
             y += 30
-        pygame.display.flip()
+        self.present()
 
     def update_during_pour(self, poured, total):
-        pct = int(poured/total*100)
-        bar = pygame.Rect(20,200, int(280*pct/100), 20)
-        pygame.draw.rect(self.screen, (0,255,0), bar)
-        self.draw_text(f"{pct}%", (150, 170))
-        pygame.display.flip()
+        pct = min(100, int(poured/total*100))
+        if pct == self.pour_pct:
+            return
+        self.pour_pct = pct
+        bar = pygame.Rect(BAR_RECT.x, BAR_RECT.y, int(BAR_RECT.w*pct/100), BAR_RECT.h)
+        pygame.draw.rect(self.screen, GREEN, bar)
+        self.dirty.append(bar)
+        # wipe the widest label so "100%" never leaves digits behind
+        self.blit(self.text(f"{pct}%"), PCT_POS,
+                  clear=self.text("100%").get_rect(topleft=PCT_POS))
+        self.present(force=(pct == 100))
+
+    def finish_pour(self):
+        """
+        Push the last pour frame however the pour ended: a pour that stops short
+        of 100% may have its final update still waiting on the frame cap.
+        """
+        self.present()
@@ -1,5 +1,5 @@
-import pygame, sys
-from sensors import is_glass_present, get_weight
+import pygame, sys, time
+from sensors import is_glass_present, wait_for_glass
 from pumps import init_pumps, prime_all, dispense
 from gui import GUI
 from drinks import drink_list
@@ -14,7 +14,7 @@ def main():
 
     # 1. Priming prompt
     gui.draw_text("Prime pumps? Press any key", (20,100))
-    pygame.display.flip()
+    gui.present()
     wait_for_key()
     prime_all()
 
@@ -30,18 +30,20 @@ def main():
 
         # 4. Wait for glass
         gui.draw_text("Place glass...", (20,100))
-        pygame.display.flip()
-        while not is_glass_present():
-            time.sleep(0.2)
+        gui.present()
+        wait_for_glass()
 
-        # 5. Dispense with live update
+        # 5. Dispense with live update (the callback runs here, on the UI thread)
         total_ml = sum(recipe['ingredients'].values())
-        dispense(recipe['ingredients'],
-                 update_callback=lambda poured: gui.update_during_pour(poured, total_ml))
+        try:
+            dispense(recipe['ingredients'],
+                     update_callback=lambda poured: gui.update_during_pour(poured, total_ml))
+        finally:
+            gui.finish_pour()
 
         # 6. Finished pouring
         gui.draw_text("Done! Remove glass.", (20,100))
-        pygame.display.flip()
+        gui.present()
         while is_glass_present():
             time.sleep(0.2)
 
@@ -0,0 +1,107 @@
+"""
+Recipe thumbnails, scaled once and cached on disk.
+
+A thumbnail is scaled from its source image the first time it is needed and
+saved under THUMB_DIR, named after the source path, its mtime and the size, so
+editing an image simply produces a new thumbnail. Loaded surfaces live in a
+small LRU; a background thread can prefetch the ones about to be shown.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pygame
+
+
+THUMB_DIR  = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".thumbs")
+THUMB_SIZE = (120, 120)
+CAPACITY   = 8          # thumbnails kept in memory
+
+
+def thumbPath(src, size=THUMB_SIZE):
+    """
+    Where the thumbnail of `src` at `size` is (or will be) cached.
+    """
+    src = os.path.abspath(src)
+    key = f"{src}:{os.stat(src).st_mtime_ns}:{size[0]}x{size[1]}"
+    return os.path.join(THUMB_DIR, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+
+def loadThumbnail(src, size=THUMB_SIZE):
+    """
+    Load the cached thumbnail of `src`, scaling and caching it first if needed.
+    Safe to call from any thread; the surface is not converted for the display.
+    """
+    path = thumbPath(src, size)
+    if os.path.exists(path):
+        return pygame.image.load(path)
+    img = pygame.transform.smoothscale(pygame.image.load(src), size)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.png"
+    pygame.image.save(img, tmp)
+    os.replace(tmp, path)
+    return img
+
+
+class Thumbnails:
+    def __init__(self, size=THUMB_SIZE, capacity=CAPACITY):
+        self.size = size
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.surfaces = OrderedDict()   # src -> (surface, converted), least recently used first
+        self.wanted = []
+        self.wakeup = threading.Event()
+        threading.Thread(target=self._prefetcher, daemon=True).start()
+
+    def get(self, src):
+        """
+        The thumbnail for `src`, or None if it can't be loaded. Call from the UI thread.
+        """
+        with self.lock:
+            surf, converted = self.surfaces.get(src, (None, False))
+        if surf is None:
+            try:
+                surf = loadThumbnail(src, self.size)
+            except Exception as e:
+                print(f"Failed loading {src}: {e}")
+                return None
+        if not converted:
+            surf = surf.convert_alpha()
+        self._store(src, surf, True)
+        return surf
+
+    def prefetch(self, sources):
+        """
+        Load `sources` into the LRU in the background, replacing any earlier request.
+        At most capacity-1 are taken so the thumbnail on screen stays cached.
+        """
+        with self.lock:
+            self.wanted = [src for src in sources[:self.capacity - 1]
+                           if src not in self.surfaces]
+        self.wakeup.set()
+
+    def _store(self, src, surf, converted):
+        with self.lock:
+            self.surfaces[src] = (surf, converted)
+            self.surfaces.move_to_end(src)
+            while len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+
+    def _prefetcher(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while True:
+                with self.lock:
+                    if not self.wanted:
+                        break
+                    src = self.wanted.pop(0)
+                    if src in self.surfaces:
+                        continue
+                try:
+                    surf = loadThumbnail(src, self.size)
+                except Exception:
+                    continue        # get() reports it if it is ever shown
+                # converted for the display later, on the UI thread
+                self._store(src, surf, False)
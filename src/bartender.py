@@ -1,14 +1,32 @@
-import time                  # Time utilities (sleep)
+import clock                 # Time utilities (sleep), real or virtual
 import sys                   # System utilities
+import threading             # Lock around load-cell reads
 import RPi.GPIO as GPIO      # Raspberry Pi GPIO library
 import json                  # JSON parsing for config
-import threading             # Threading for pump control
-from luma.core.render import canvas
+import argparse              # --split and its options
 from luma.core.interface.serial import i2c
 from luma.oled.device import ssd1306
-from hx711 import HX711       # HX711 ADC driver for load cell
-from menu import MenuItem, Menu, Back, MenuContext, MenuDelegate
+from loadcell import HX711Reader, HX711Bank, LOADCELL_FILE   # interrupt-driven HX711 readers
+from scalecal import ScaleCalibration, CALIBRATION_FILE
+from menu import MenuItem, DrinkItem, Menu, Back, MenuContext, MenuDelegate
+from menu import SEARCH_SHOW, SEARCH_JUMP, SEARCH_DELETE, SEARCH_EXIT
 from drinks import drink_list, drink_options
+from inputs import ButtonInput, CONFIRM, CANCEL, NEXT, PREV
+from widgets import ChoicePicker, NumberStepper, ConfirmDialog, runWidget
+from estop import EmergencyStop, SWITCH_INTERVAL
+from relays import RelayBank
+from glass import GlassMonitor
+from glasses import GlassRegistry, CONFIDENCE
+from display import Display
+from usage import PumpUsage
+from priming import PrimeState, PRIMED, DRAINED, SWAPPED
+from snapshot import Snapshot, SNAPSHOT_INTERVAL
+from loadout import OrderHistory, bestLoadout, applyLoadout
+from catalog import Catalog
+from control import ControlClient, ControlError, CONTROL_CORE, CONTROL_PRIORITY
+from recipematrix import RecipeMatrix, np
+from stream import LiveState, StreamServer, STREAM_PORT
+from recipes import scaleRecipe, pumpSchedule, pourTime
 
 # Use BCM (Broadcom) pin numbering
 GPIO.setmode(GPIO.BCM)
@@ -20,10 +38,7 @@ SCREEN_WIDTH    = 128       # OLED width in pixels
 SCREEN_HEIGHT   = 64        # OLED height in pixels
 OLED_RESET_PIN  = 15        # Reset pin for OLED (not used in luma)
 OLED_DC_PIN     = 16        # Data/Command pin for OLED
-
-
-#ALCOHOLIC INGREDIENTS
-ALCOHOLS = {"gin", "rum", "vodka", "tequila"}
+STOP_SHOWN      = 1.0       # seconds the emergency message stays up before the menu returns
 
 
 # Pump flow rate: seconds needed to deliver 1 mL
@@ -33,77 +48,177 @@ FLOW_RATE = 0.48
 IR_PIN       = 22  # IR break-beam sensor output
 TORSION_DT   = 4   # HX711 data pin
 TORSION_SCK  = 16  # HX711 clock pin
+GLASS_CELL   = "glass"   # the glass scale's name in LOADCELL_FILE, when there is one
 BTN_CONFIRM  = 12   # Confirm button
 BTN_CANCEL   = 6   # Cancel button
 BTN_MENU     = 5  # Menu navigation button
 BTN_SPECIAL  = 13  # Special function button
 
-# Glass weight thresholds and capacities
+# Button pins and the events they send
+BUTTONS = {
+    BTN_CONFIRM: CONFIRM,
+    BTN_CANCEL:  CANCEL,
+    BTN_MENU:    NEXT,
+    BTN_SPECIAL: PREV
+}
+
+# Glass weight thresholds and capacities (glasses.py starts its registry from these)
 SMALL_EMPTY_WT = 66    # Empty small glass weight in grams
 LARGE_EMPTY_WT = 371   # Empty large glass weight in grams
 SMALL_CAPACITY = 35    # Small glass capacity in mL
 LARGE_CAPACITY = 310   # Large glass capacity in mL
+GLASS_MIN_WT   = 20    # grams on the scale that confirm a glass on the beam
+TEACH_SAMPLES  = 10    # readings averaged when teaching a new glass
+TEACH_CAPACITIES = (35, 50, 150, 250, 310, 450)   # mL offered when teaching a glass
 
-# Pump priming duration (to fill lines)
-PRIME_TIME     = 10    # Seconds to run all pumps
+# Warm restart (snapshot.py)
+TARE_MAX_AGE   = 12 * 3600   # seconds a saved tare is trusted instead of re-zeroing
+RESUME_SLACK   = 0.1         # seconds of pour left that aren't worth resuming
 
 class Bartender(MenuDelegate):
-    def __init__(self):
+    def __init__(self, control = None):
         """
-        Initialize all hardware: buttons, sensors, display, pumps
+        Initialize all hardware: buttons, sensors, display, pumps.
+        control: a ControlClient (control.py) to run the hardware through
+        another process, None to drive it from this one
         """
         self.running = False  # Flag to disable input during pours
-        self.emergency_stop = False
+        self.stop_shown_at = None   # when the emergency message went up, while it is up
+
+        # what the previous run left behind: menu position, pour in flight, tare
+        self.snapshot = Snapshot.load()
+
+        # --- Load pump config ---
+        self.pump_configuration = Bartender.readPumpConfiguration()
 
+        # --- Buttons, load cell, IR beam and relays: here, or in the control process ---
+        self.scale_lock = threading.Lock()
+        self.control = control
+        if control is None:
+            self.initHardware()
+        else:
+            self.buttons = control.buttons
+            self.hx = control.hx if control.has_scale else None
+            self.loadcells = None   # only the glass scale is read across processes
+            self.relays = control.relays
+            self.estop = control.estop
+            self.glass = control.glass
+
+        # a recent tare survives a restart (there may be a glass on the plate)
+        if self.hx:
+            try:
+                if not self.restoreTare():
+                    self.hx.zero()  # tare to zero
+                    self.saveTare()
+            except Exception as e:
+                print(f"[WARNING] HX711 zero failed: {e}")
+                self.hx = None
+
+        if self.hx and not self.hx.calibrated():
+            print("[WARNING] scale not calibrated (run calibrate_scale.py): "
+                  "glasses are not confirmed, recognised or taught by weight")
+
+        # --- IR beam edges: wake on placement, pause the pumps on removal ---
+        # (armed once the scale is tared, the scale confirms every glass)
+        self.glass.arm()
+
+        # Initialize the OLED via I2C
+        serial = i2c(port=1, address=0x3D)
+        self.led = ssd1306(serial, width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+        self.led.clear()
+        self.led.show()
+        # from here on only the render thread touches the panel
+        self.display = Display(self.led)
+        self.display.start()
+
+        # --- Known glasses: recognised on the scale, taught from Settings ---
+        self.glasses = GlassRegistry.load()
+        self.glass_grams = None     # empty weight of the glass on the plate, when known
+
+        # --- What each line has pumped since it was last cleaned, and which are primed ---
+        self.usage = PumpUsage.load()
+        # drinks ordered lately, for the loadout suggestion
+        self.history = OrderHistory.load()
+        self.priming = PrimeState.load()
+
+        # --- What the machine is doing, for the live stream (stream.py) ---
+        # state: idle, waiting (for a glass), pouring, cleaning, priming, paused, stopped or done
+        # pumps/delivered: the running pumps and the mL out of each so far
+        # queue: orders waiting behind this one; drinks are made one at a time, so 0
+        # estop: EmergencyStop.summary() as of the last emergency stop
+        self.live = LiveState(state='idle', order=None, pumps=[], delivered=[],
+                              progress=0.0, weight=None, queue=0, estop=None)
+
+        print("Done initializing")
+
+
+
+    def initHardware(self):
+        """
+        Set up the buttons, load cell, IR beam and relays in this process.
+        """
         # configure all buttons as inputs, pulled down
         for btn in (BTN_CONFIRM, BTN_CANCEL, BTN_MENU, BTN_SPECIAL):
             GPIO.setup(btn, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
 
-        # keep these for wait_for_confirmation()
-        self.btn_confirm = BTN_CONFIRM
-        self.btn_cancel  = BTN_CANCEL
-
-        # initialize the last-seen state for polling
-        self._last_state = {
-            BTN_CONFIRM: GPIO.LOW,
-            BTN_CANCEL:  GPIO.LOW,
-            BTN_MENU:    GPIO.LOW,
-            BTN_SPECIAL: GPIO.LOW
-        }
+        # one debounced event source shared by the menu loop and all widgets
+        self.buttons = ButtonInput(BUTTONS)
 
-        # --- Initialize the HX711 load-cell interface ---
-        GPIO.setup(TORSION_DT, GPIO.IN)
-        GPIO.setup(TORSION_SCK, GPIO.OUT)
+        # --- Initialize the HX711 load-cell interface (it sets up its own pins) ---
+        # LOADCELL_FILE, if present, adds more cells (bottles) on the glass scale's
+        # SCK; they are all read at once, the glass scale is one of its channels
+        self.loadcells = None
         try:
-            self.hx = HX711(
-                dout_pin       = TORSION_DT,
-                pd_sck_pin     = TORSION_SCK,
-                gain_channel_A = 128,
-                select_channel = 'A'
-            )
+            self.loadcells = HX711Bank.load(LOADCELL_FILE)
+            if self.loadcells:
+                self.hx = self.loadcells.channels[GLASS_CELL]
+            else:
+                self.hx = HX711Reader(
+                    dout_pin       = TORSION_DT,
+                    pd_sck_pin     = TORSION_SCK,
+                    gain_channel_A = 128,
+                    select_channel = 'A'
+                )
             self.hx.reset()
-            self.hx.zero()  # tare to zero
+            # calibrate_scale.py's curve, if it has been run; raw counts otherwise
+            if not self.hx.calibration:
+                self.hx.set_calibration(ScaleCalibration.load(CALIBRATION_FILE))
         except Exception as e:
-            print(f"[WARNING] HX711 init/zero failed: {e}")
+            print(f"[WARNING] HX711 init failed: {e}")
             self.hx = None
 
         # --- Initialize IR beam sensor ---
         GPIO.setup(IR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
 
-        # Initialize the OLED via I2C
-        serial = i2c(port=1, address=0x3D)
-        self.led = ssd1306(serial, width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
-        self.led.clear()
-        self.led.show()
-
-        # --- Load pump config and set up relay outputs ---
-        self.pump_configuration = Bartender.readPumpConfiguration()
+        # --- Set up relay outputs ---
         for pump in self.pump_configuration.values():
             GPIO.setup(pump['pin'], GPIO.OUT, initial=GPIO.HIGH)
 
-        print("Done initializing")
+        # all relays are switched together through one bank; a crashed run may
+        # have left some on, so start from all off
+        self.relays = RelayBank([p['pin'] for p in self.pump_configuration.values()])
+        self.relays.allOff()
 
+        # --- CANCEL edge kills every relay directly, independent of polling ---
+        self.estop = EmergencyStop(self.relays)
+        self.estop.arm(BTN_CANCEL)
 
+        # --- IR beam: watched by the GlassMonitor, armed after the tare ---
+        self.glass = GlassMonitor(IR_PIN, self.relays, confirm=self.confirmGlass)
+
+    @property
+    def emergency_stop(self):
+        """
+        True once CANCEL has been pressed (or a flow was cancelled) until the next flow resets it.
+        """
+        return self.estop.tripped.is_set()
+
+    @emergency_stop.setter
+    def emergency_stop(self, value):
+        if value:
+            self.estop.stop()
+        else:
+            self.estop.reset()
 
     @staticmethod
     def readPumpConfiguration():
@@ -122,18 +237,20 @@ class Bartender(MenuDelegate):
             
     def pollButtons(self):
         """
-        Poll each button once; on LOW?HIGH transition call its handler.
-        """
-        for pin, handler in (
-            (BTN_CONFIRM, self.confirm_btn),
-            (BTN_CANCEL,  self.emergency_stop_cb),
-            (BTN_MENU,    self.next_btn),
-            (BTN_SPECIAL, self.prev_btn),
-        ):
-            cur = GPIO.input(pin)
-            if cur == GPIO.HIGH and self._last_state[pin] == GPIO.LOW:
-                handler(pin)
-            self._last_state[pin] = cur
+        Poll the buttons once and pass every pending press to its handler.
+        """
+        handlers = {
+            CONFIRM: (BTN_CONFIRM, self.confirm_btn),
+            CANCEL:  (BTN_CANCEL,  self.emergency_stop_cb),
+            NEXT:    (BTN_MENU,    self.next_btn),
+            PREV:    (BTN_SPECIAL, self.prev_btn),
+        }
+        self.buttons.poll()
+        event = self.buttons.pop()
+        while event is not None:
+            pin, handler = handlers[event]
+            handler(pin)
+            event = self.buttons.pop()
        
                     
     def next_btn(self, channel):
@@ -146,11 +263,8 @@ class Bartender(MenuDelegate):
         """SPECIAL: move to the previous menu item."""
         print(f"[DEBUG] SPECIAL button pressed (GPIO {channel})")
         if not self.running:
-            ctx = self.menuContext
-            # cycle backwards through options
-            menu = ctx.currentMenu
-            menu.selectedOption = (menu.selectedOption - 1) % len(menu.options)
-            ctx.display(menu.getSelection())
+            # cycle backwards through options (or letters while searching)
+            self.menuContext.retreat()
         
     def confirm_btn(self, channel):
         """
@@ -164,14 +278,23 @@ class Bartender(MenuDelegate):
     def buildMenu(self, drink_list, drink_options):
         """
         Build the hierarchical menu structure:
-        - Top level: drinks + 'Settings'
+        - Top level: drinks + 'Search' + 'Settings'
         - Settings: submenus for each pump to select liquid, plus Clean + Back
         """
+        self.drink_list = drink_list
+        self.drink_options = drink_options
+        self.catalog = Catalog(drink_list)
+        # the catalog's recipe maths in one matrix, built by the first batch query
+        self.recipes = None
+
         # 1) Top-level menu
         m = Menu("Main Menu")
-        # add all drinks
-        for d in drink_list:
-            m.addOption(MenuItem('drink', d['name'], {'ingredients': d['ingredients']}))
+        # add all drinks (their recipes stay packed in the catalog)
+        for i in range(len(self.catalog)):
+            m.addOption(DrinkItem(self.catalog, i))
+
+        # type-ahead search over the drinks above
+        m.addOption(MenuItem('search', 'Search'))
 
         # 2) Settings submenu
         settings = Menu('Settings')
@@ -187,20 +310,32 @@ class Bartender(MenuDelegate):
                     opt['name'] + selected,
                     {'key': p, 'value': opt['value']}
                 ))
+            sub.addOption(MenuItem('bottle_swapped', 'New bottle', {'key': p}))
             sub.addOption(Back('Back'))           # back out of each pump submenu
             settings.addOption(sub)
 
-        # 3) Clean option
+        # 3) Loadout suggestion, prime and clean options
+        settings.addOption(MenuItem('loadout', 'Best loadout'))
+        settings.addOption(MenuItem('prime', 'Prime'))
         settings.addOption(MenuItem('clean', 'Clean'))
 
+        # 3b) Glass registry
+        glasses = Menu('Glasses')
+        glasses.setParent(settings)
+        glasses.addOption(MenuItem('teach_glass', 'Teach glass'))
+        glasses.addOption(MenuItem('reset_glasses', 'Reset glasses'))
+        glasses.addOption(Back('Back'))
+        settings.addOption(glasses)
+
         # 4) Back from Settings to Main Menu
         settings.addOption(Back('Back'))
 
         # 5) Attach settings to the top-level
         m.addOption(settings)
 
-        # 6) Save into context
-        self.menuContext = MenuContext(m, self)
+        # 6) Save into context (search also matches ingredient display names)
+        aliases = {opt['value']: opt['name'] for opt in drink_options}
+        self.menuContext = MenuContext(m, self, aliases)
 
 
 
@@ -208,17 +343,31 @@ class Bartender(MenuDelegate):
         """
         Hide drinks from menu if required ingredients aren't configured.
         """
+        loaded = self.catalog.mask(self.loadedIngredients())
         for item in menu.options:
             if item.type == 'drink':
-                ingrs = item.attributes['ingredients']
-                item.visible = all(
-                    any(ing == self.pump_configuration[p]['value']
-                        for p in self.pump_configuration)
-                    for ing in ingrs
-                )
+                item.visible = item.mask & ~loaded == 0
             elif item.type == 'menu':
                 self.filterDrinks(item)
 
+    def recipeMatrix(self):
+        """
+        The whole catalog as a RecipeMatrix for batch scaling and availability,
+        built the first time it is asked for; None without NumPy.
+        """
+        if self.recipes is None and np is not None:
+            self.recipes = RecipeMatrix(self.catalog)
+        return self.recipes
+
+    def loadedIngredients(self):
+        return set(p['value'] for p in self.pump_configuration.values())
+
+    def isAvailable(self, menuItem):
+        """
+        True if every ingredient of the drink is assigned to some pump.
+        """
+        return self.catalog.makeable(menuItem.index, self.catalog.mask(self.loadedIngredients()))
+
     def selectConfigurations(self, menu):
         """
         Mark the selected fluid for each pump with an asterisk.
@@ -238,100 +387,237 @@ class Bartender(MenuDelegate):
 
     def menuItemClicked(self, menuItem):
         if menuItem.type == 'drink':
-            self.makeDrink(menuItem.name, menuItem.attributes['ingredients'])
+            self.makeDrink(menuItem.name, menuItem.ingredients, menuItem.index)
             return True
         if menuItem.type == 'pump_selection':
             key = menuItem.attributes['key']
+            if self.pump_configuration[key]['value'] != menuItem.attributes['value']:
+                self.priming.mark([key], SWAPPED)
+                self.priming.save()
             self.pump_configuration[key]['value'] = menuItem.attributes['value']
             Bartender.writePumpConfiguration(self.pump_configuration)
             return True
+        if menuItem.type == 'bottle_swapped':
+            self.priming.mark([menuItem.attributes['key']], SWAPPED)
+            self.priming.save()
+            self.showText("Prime before use", top=20)
+            clock.sleep(1)
+            self.menuContext.showMenu()
+            return True
+        if menuItem.type == 'loadout':
+            self.suggestLoadout()
+            self.menuContext.showMenu()
+            return True
+        if menuItem.type == 'prime':
+            self.prime_pumps()
+            self.menuContext.showMenu()
+            return True
         if menuItem.type == 'clean':
             self.clean()
             return True
+        if menuItem.type == 'teach_glass':
+            self.teachGlass()
+            return True
+        if menuItem.type == 'reset_glasses':
+            if self.ask(ConfirmDialog("Forget taught", "glasses?")):
+                self.glasses = GlassRegistry(path=self.glasses.path)
+                self.glasses.save()
+            self.menuContext.showMenu()
+            return True
         return False
 
+    def teachGlass(self):
+        """
+        Weigh an empty glass, ask how much it holds and add it to the registry.
+        """
+        self.emergency_stop = False
+        if not self.scaleCalibrated():
+            self.showText("Scale not calibrated", "run calibrate_scale")
+            clock.sleep(2)
+            self.menuContext.showMenu()
+            return
+        self.showText("Place empty glass")
+        if not self.waitForGlass():
+            return
+        self.showText("Weighing...")
+        weights = list(self.readGlassWeights(TEACH_SAMPLES))
+        if not weights:
+            self.showText("Scale not working")
+            clock.sleep(2)
+            self.menuContext.showMenu()
+            return
+
+        capacity = self.ask(ChoicePicker(
+            "Glass holds",
+            [(f"{c} mL", float(c)) for c in TEACH_CAPACITIES],
+            detail=lambda c: f"empty {sum(weights) / len(weights):.0f} g"
+        ))
+        if capacity is not None:
+            profile = self.glasses.teach(weights, capacity)
+            self.glasses.save()
+            self.showText(f"Learned {profile.name}",
+                          f"{profile.weight:.0f} g, {int(profile.capacity)} mL")
+            clock.sleep(2)
+        self.menuContext.showMenu()
+
+    def suggestLoadout(self):
+        """
+        Work out which bottles make the most drinks (recently ordered ones count
+        more) and put them on the pumps if CONFIRM is pressed.
+        """
+        options = set(opt['value'] for opt in self.drink_options)
+        weights = self.history.weights(self.drink_list)
+        ingredients, _ = bestLoadout(self.drink_list, len(self.pump_configuration),
+                                     options, weights)
+        makeable = sum(1 for d in self.drink_list if set(d['ingredients']) <= ingredients)
+        current = sum(1 for d in self.drink_list if set(d['ingredients']) <= self.loadedIngredients())
+
+        config = {k: dict(p) for k, p in self.pump_configuration.items()}
+        changed = applyLoadout(config, ingredients)
+        if not changed:
+            self.showText("Loadout is best", f"{current} drinks")
+            clock.sleep(2)
+            return
+        if not self.ask(ConfirmDialog(f"{current} -> {makeable} drinks",
+                                      f"Swap {len(changed)} bottles",
+                                      "Press Confirm")):
+            self.emergency_stop = False
+            return
+
+        self.pump_configuration = config
+        Bartender.writePumpConfiguration(self.pump_configuration)
+        self.priming.mark(changed, SWAPPED)
+        self.priming.save()
+        # walk through the swaps one pump at a time
+        for key in changed:
+            p = self.pump_configuration[key]
+            self.ask(ConfirmDialog(f"{p['name']}:", self.optionName(p['value']), "Press Confirm"))
+        self.emergency_stop = False
+
+    def optionName(self, value):
+        return next((opt['name'] for opt in self.drink_options if opt['value'] == value), value)
+
     def clean(self):
         """
-        Run all pumps for a fixed time (clean cycle), 
-        but only after a glass is detected and Confirmed.
+        Flush the lines that have pumped something since their last clean, each
+        for as long as its usage calls for (usage.py), but only after a glass is
+        detected and Confirmed.
         """
         # Reset emergency flag
         self.emergency_stop = False
 
+        schedule, dispenses, keys = self.usage.cleanSchedule(self.pump_configuration, FLOW_RATE)
+        if not schedule:
+            self.showText("Lines are clean", "nothing to flush")
+            clock.sleep(2)
+            self.menuContext.showMenu()
+            return
+        max_time = max(schedule.values())
+
         # 0) Wait for glass to break the beam
-        with canvas(self.led) as draw:
-            draw.text((0, 10), "Place glass to clean", fill="white")
-        while not self.is_glass_present():
-            # allow emergency-stop during wait
-            self.pollButtons()
-            if self.emergency_stop:
-                return
-            time.sleep(0.1)
+        self.showText("Place glass to clean")
+        if not self.waitForGlass():
+            return
 
         # Flash Glass detected! briefly
-        with canvas(self.led) as draw:
-            draw.text((0, 10), "Glass detected!", fill="white")
-        time.sleep(0.5)
+        self.showText("Glass detected!")
+        clock.sleep(0.5)
 
         # 1) Prompt user to Confirm
-        with canvas(self.led) as draw:
-            draw.text((0, 10), "Press Confirm to", fill="white")
-            draw.text((0, 30), "start cleaning", fill="white")
-        self.wait_for_confirmation()
-        if self.emergency_stop:
+        if not self.ask(ConfirmDialog(f"Clean {len(keys)} pumps, {max_time:.0f} s",
+                                      "Press Confirm to", "start cleaning")):
             return
 
-        # 2) Fire pumps for clean cycle
+        # 2) Fire the dirty pumps for their flush times
         self.running = True
-        wait = 20  # seconds
-        threads = []
-        for p in self.pump_configuration.values():
-            threads.append(threading.Thread(
-                target=self.pour,
-                args=(p['pin'], wait)
-            ))
-        for t in threads:
-            t.start()
-
-        # 3) Show time-based progress bar
-        # We pass a single dummy dispense so the bar advances over `wait` seconds.
-        self.progressBar(wait, [(1.0, wait)])
+        self.live.update(state='cleaning', order=None, pumps=self.livePumps(schedule, dispenses))
+        result = {}
+        pump_thread = clock.Thread(
+            target=lambda: result.update(done=self.pour(schedule))
+        )
+        pump_thread.start()
+
+        # 3) Show the real plan: water volume over the longest flush
+        self.progressBar(max_time, dispenses)
 
-        # 4) Wait for all pump threads to finish
-        for t in threads:
-            t.join()
+        # 4) Wait for the pumps to finish; only a full flush counts as clean
+        pump_thread.join()
+        if result.get('done'):
+            self.usage.cleaned(keys)
+            self.usage.save()
+            # the flushed lines are full of water now
+            self.priming.mark(keys, DRAINED)
+            self.priming.save()
 
         # 5) Return to menu
         self.menuContext.showMenu()
-        time.sleep(2)
+        clock.sleep(2)
         self.running = False
 
 
     def displayMenuItem(self, menuItem):
-        with canvas(self.led) as draw:
-            draw.text((0, 20), menuItem.name, fill="white")
+        if self.stop_shown_at is not None:
+            return      # the emergency message stays up; run() redraws the menu after it
+        self.showText(menuItem.name, top=20)
 
-
-    def pour(self, pin, duration):
+    def show(self, render):
         """
-        Activate pump (active LOW) for up to `duration` seconds,
-        but abort immediately on emergency_stop.
+        Post render(draw) to the OLED's render thread; returns at once.
         """
-        GPIO.output(pin, GPIO.LOW)
-        start = time.monotonic()
-        while True:
-            # 1) Check for emergency stop
-            self.pollButtons()
-            if self.emergency_stop:
-                break
+        self.display.show(render)
 
-            # 2) Check if run time has elapsed
-            if (time.monotonic() - start) >= duration:
-                break
+    def showText(self, *lines, top = 10):
+        """
+        Show lines of text, 20 px apart from `top` down.
+        """
+        def render(draw):
+            for i, line in enumerate(lines):
+                draw.text((0, top + 20*i), line, fill="white")
+        self.display.show(render)
 
-            time.sleep(0.05)
+    def ask(self, widget):
+        """
+        Run a widget on the OLED until it is answered; an emergency stop aborts it.
+        """
+        return runWidget(widget, self.buttons, self.show,
+                         idle=lambda: self.emergency_stop)
 
-        GPIO.output(pin, GPIO.HIGH)
+    def displaySearch(self, query, choice, matches):
+        """
+        Search picker: query with the highlighted entry, best match, match count.
+        """
+        labels = {
+            SEARCH_SHOW:   f"Show {len(matches)}",
+            SEARCH_JUMP:   "Jump to",
+            SEARCH_DELETE: "Delete",
+            SEARCH_EXIT:   "Exit",
+        }
+        if choice in labels:
+            line = f"{query}_  < {labels[choice]} >"
+        else:
+            line = f"{query}<{choice}>"
+        best = matches[0].name if matches else "No match"
+        count = len(matches)
+        def render(draw):
+            draw.text((0,  0), "Search", fill="white")
+            draw.text((0, 16), line, fill="white")
+            draw.text((0, 32), best, fill="white")
+            draw.text((0, 48), f"{count} drinks", fill="white")
+        self.display.show(render)
+
+
+    def pour(self, schedule):
+        """
+        Run every pump in `schedule` ({pin: seconds}) for its time, switching the
+        relays as one bank, but abort immediately on emergency_stop.
+        The CANCEL edge has already switched the relays off by the time we wake.
+        A control process that dies or fails the pour counts as a stopped pour.
+        """
+        try:
+            return self.relays.run(schedule, self.estop.tripped)
+        except ControlError as e:
+            print(f"[WARNING] pour failed: {e}")
+            return False
 
 
 
@@ -339,22 +625,40 @@ class Bartender(MenuDelegate):
         """
         Volume-based progress bar over `max_time` seconds.
         dispenses: list of (volume_mL, pour_time_s).
+        Returns the seconds of pumping it saw (less than max_time if stopped).
         """
         # skip any zero-duration entries
         dispenses = [(v, t) for v, t in dispenses if t > 0]
         if not dispenses or max_time <= 0:
-            return
+            return 0.0
 
         total_vol = sum(v for v, _ in dispenses)
-        start     = time.monotonic()
+        start     = clock.monotonic()
+        paused    = self.relays.pausedTime()
+        state     = self.live.fields['state']
 
         while True:
             # allow emergency-stop
             self.pollButtons()
             if self.emergency_stop:
-                break
+                self.live.update(state='stopped')
+                return min(clock.monotonic() - start - (self.relays.pausedTime() - paused), max_time)
+
+            # glass pulled: the relays are paused, so is the bar
+            if self.relays.paused:
+                if self.live.fields['state'] != 'paused':
+                    self.live.update(state='paused')
+                self.showText("Glass removed!", "Replace to resume")
+                self.glass.wait(0.1)
+                continue
+
+            elapsed = clock.monotonic() - start - (self.relays.pausedTime() - paused)
 
-            elapsed = time.monotonic() - start
+            # keep the in-flight pour's progress in the snapshot
+            pour = self.snapshot.get('pour')
+            if pour and clock.monotonic() - self.snapshot.written_at >= SNAPSHOT_INTERVAL:
+                pour['elapsed'] = elapsed
+                self.snapshot.save()
 
             if elapsed >= max_time:
                 delivered = total_vol
@@ -365,136 +669,125 @@ class Bartender(MenuDelegate):
                 percent   = delivered / total_vol
                 done      = False
 
-            with canvas(self.led) as draw:
-                draw.text((0,   0), f"Pouring {int(total_vol)} mL", fill="white")
-                x, y, w, h = 15, 20, SCREEN_WIDTH - 30, 10
-                draw.rectangle((x, y, x+w, y+h), outline="white")
-                draw.rectangle((x, y, x+int(percent*w), y+h), fill="white")
-                draw.text((0, y+h+4),
-                          f"{int(delivered)}/{int(total_vol)} mL",
-                          fill="white")
+            self.display.show(
+                lambda draw, d=delivered, p=percent: self.drawProgress(draw, d, total_vol, p))
+            self.live.update(state=state, progress=round(percent, 3),
+                             delivered=[round(v * min(elapsed, t)/t, 1) for v, t in dispenses])
 
             if done:
-                break
-            time.sleep(0.05)
+                return max_time
+            clock.sleep(0.05)
 
     
-    def makeDrink(self, drink, ingredients):
+    def drawProgress(self, draw, delivered, total_vol, percent):
+        """
+        One frame of the pour progress bar.
+        """
+        draw.text((0,   0), f"Pouring {int(total_vol)} mL", fill="white")
+        x, y, w, h = 15, 20, SCREEN_WIDTH - 30, 10
+        draw.rectangle((x, y, x+w, y+h), outline="white")
+        draw.rectangle((x, y, x+int(percent*w), y+h), fill="white")
+        draw.text((0, y+h+4),
+                  f"{int(delivered)}/{int(total_vol)} mL",
+                  fill="white")
+
+    def makeDrink(self, drink, ingredients, index = None):
         """
         Main sequence to:
           0) wait for glass,
-          1) pick Shot (50 mL) or Regular (250 mL),
+          1) recognise the glass by weight, or pick Shot (50 mL) or Regular (250 mL),
           2) pick Strength (1-5),
           3) confirm pour, and
           4) pour with emergency-stop support.
+        index: the drink's row in the catalog, if it came from the menu
         """
         self.emergency_stop = False
 
         # 0) Wait for glass on the break-beam
-        with canvas(self.led) as draw:
-            draw.text((0, 10), "Place glass to start", fill="white")
-        while not self.is_glass_present():
-            self.pollButtons()
-            if self.emergency_stop:
-                return
-            time.sleep(0.1)
-        with canvas(self.led) as draw:
-            draw.text((0, 10), "Glass detected!", fill="white")
-        time.sleep(0.5)
-
-        # 1) Glass size picker
-        sizes = [("Shot", 50.0), ("Regular", 250.0)]
-        sel = 1
-        while True:
-            with canvas(self.led) as draw:
-                draw.text((0,  5), "Select Glass Size", fill="white")
-                draw.text((0, 25), f"< {sizes[sel][0]} >", fill="white")
-                draw.text((0, 45), f"{int(sizes[sel][1])} mL", fill="white")
-
-            if GPIO.input(BTN_MENU) == GPIO.HIGH:
-                sel = (sel + 1) % 2
-                time.sleep(0.2)
-            elif GPIO.input(BTN_SPECIAL) == GPIO.HIGH:
-                sel = (sel - 1) % 2
-                time.sleep(0.2)
-            elif GPIO.input(self.btn_confirm) == GPIO.HIGH:
-                glass_vol = sizes[sel][1]
-                break
-            elif GPIO.input(self.btn_cancel) == GPIO.HIGH:
-                self.emergency_stop = True
-                return
-            time.sleep(0.05)
-            
-        strength = 3
-        while True:
-            with canvas(self.led) as draw:
-                draw.text((0,  5), "Drink Strength", fill="white")
-                draw.text((0, 25), f"< {strength} >", fill="white")
-                draw.text((0, 45), f"{int((strength-1)/4*100)}% alc", fill="white")
-
-            if GPIO.input(BTN_MENU) == GPIO.HIGH:
-                strength = min(5, strength + 1)
-                time.sleep(0.2)
-            elif GPIO.input(BTN_SPECIAL) == GPIO.HIGH:
-                strength = max(1, strength - 1)
-                time.sleep(0.2)
-            elif GPIO.input(self.btn_confirm) == GPIO.HIGH:
-                break
-            elif GPIO.input(self.btn_cancel) == GPIO.HIGH:
+        self.live.update(state='waiting', order={'drink': drink}, pumps=[], delivered=[], progress=0.0)
+        self.showText("Place glass to start")
+        if not self.waitForGlass():
+            return
+        self.showText("Glass detected!")
+        clock.sleep(0.5)
+
+        # 1) Glass size: from the recognised glass, else ask
+        profile = self.identifyGlass()
+        if profile:
+            glass_vol, size_name = profile.capacity, profile.name
+            self.showText(f"{profile.name} glass", f"{int(glass_vol)} mL")
+            clock.sleep(0.5)
+        else:
+            sizes = {50.0: "Shot", 250.0: "Regular"}
+            glass_vol = self.ask(ChoicePicker(
+                "Select Glass Size",
+                [(name, vol) for vol, name in sizes.items()],
+                selected=1,
+                detail=lambda vol: f"{int(vol)} mL"
+            ))
+            if glass_vol is None:
                 self.emergency_stop = True
                 return
-            time.sleep(0.05)
-
-        # 3) Compute scaled volumes
-        max_alc_frac   = 100.0 / 250.0
-        target_alc_vol = (strength - 1)/4 * glass_vol * max_alc_frac
-        target_mix_vol = glass_vol - target_alc_vol
-
-        alc_total = sum(v for k, v in ingredients.items() if k in ALCOHOLS)
-        mix_total = sum(v for k, v in ingredients.items() if k not in ALCOHOLS)
+            size_name = sizes[glass_vol]
+
+        # 2) Strength picker
+        strength = self.ask(NumberStepper(
+            "Drink Strength", 3, 1, 5,
+            detail=lambda s: f"{int((s-1)/4*100)}% alc"
+        ))
+        if strength is None:
+            self.emergency_stop = True
+            return
 
-        scaled = {}
-        for ing, vol in ingredients.items():
-            if ing in ALCOHOLS:
-                scaled[ing] = (vol/alc_total)*target_alc_vol if alc_total else 0.0
-            else:
-                scaled[ing] = (vol/mix_total)*target_mix_vol if mix_total else 0.0
+        # 3) Compute scaled volumes (a row of the matrix if a batch query built it)
+        if index is not None and self.recipes is not None:
+            scaled = self.recipes.scaleRow(index, glass_vol, strength)
+        else:
+            scaled = scaleRecipe(ingredients, glass_vol, strength)
 
         # 4) Confirm pour
-        with canvas(self.led) as draw:
-            draw.text((0, 10), f"{sizes[sel][0]} / Str {strength}", fill="white")
-            draw.text((0, 40), "Press Confirm",            fill="white")
-        self.wait_for_confirmation()
-        if self.emergency_stop:
+        if not self.ask(ConfirmDialog(f"{size_name} / Str {strength}", "Press Confirm")):
+            self.emergency_stop = True
             return
 
         # 5) Fire pumps & collect dispenses
         self.running = True
-        threads   = []
-        dispenses = []
-        max_time  = 0.0
-
-        for ing, vol in scaled.items():
-            for key, p in self.pump_configuration.items():
-                if ing == p["value"]:
-                    t = vol * FLOW_RATE
-                    if t <= 0:
-                        continue
-                    max_time  = max(max_time, t)
-                    dispenses.append((vol, t))
-                    threads.append(
-                        threading.Thread(target=self.pour, args=(p["pin"], t))
-                    )
-
-        for thr in threads:
-            thr.start()
+        schedule, dispenses = pumpSchedule(scaled, self.pump_configuration, FLOW_RATE)
+        max_time = max(schedule.values(), default=0.0)
+
+        # written before the first relay switches, so a crash can be reconciled
+        self.snapshot.save(pour={
+            'drink':    drink,
+            'schedule': schedule,
+            'volumes':  [v for v, _ in dispenses],
+            'scaled':   scaled,
+            'glass_g':  self.glass_grams,
+            'elapsed':  0.0,
+        })
+
+        self.live.update(state='pouring',
+                         order={'drink': drink, 'size': size_name, 'strength': strength},
+                         pumps=self.livePumps(schedule, dispenses))
+        result = {}
+        pump_thread = clock.Thread(
+            target=lambda: result.update(done=self.pour(schedule))
+        )
+        pump_thread.start()
 
         # 6) Show progress
-        self.progressBar(max_time, dispenses)
-
-        # 7) Wait for all pumps
-        for thr in threads:
-            thr.join()
+        elapsed = self.progressBar(max_time, dispenses)
+
+        # 7) Wait for all pumps; a stopped pour counts against the lines only
+        #    for what came out, and isn't an order
+        pump_thread.join()
+        if result.get('done'):
+            self.recordUsage(scaled)
+            self.history.record(drink)
+            self.history.save()
+            self.live.update(state='done')
+        else:
+            self.recordUsage(self.pouredSoFar(scaled, schedule, elapsed))
+        self.snapshot.save(pour=None)
 
         # 8) Back to menu
         self.menuContext.showMenu()
@@ -504,22 +797,62 @@ class Bartender(MenuDelegate):
 
 
 
+    def livePumps(self, schedule, dispenses):
+        """
+        The pumps of a pour for the live stream: pin, bottle and mL, in the
+        order of `dispenses` (and of progressBar's delivered list).
+        """
+        values = {p['pin']: p['value'] for p in self.pump_configuration.values()}
+        return [{'pin': pin, 'ingredient': values.get(pin), 'ml': round(v, 1)}
+                for pin, (v, _) in zip(schedule, dispenses)]
+
+    def pouredSoFar(self, scaled, schedule, elapsed):
+        """
+        {ingredient: mL} of a pour (`scaled`, timed by `schedule`) after `elapsed` seconds.
+        """
+        values = {p['pin']: p['value'] for p in self.pump_configuration.values()}
+        return {values[pin]: scaled[values[pin]] * min(elapsed, t) / t
+                for pin, t in schedule.items()}
+
+    def recordUsage(self, scaled):
+        """
+        Note what went through each line ({ingredient: mL}) for the next clean.
+        """
+        for key, p in self.pump_configuration.items():
+            if p['value'] in scaled:
+                self.usage.record(key, p['value'], scaled[p['value']])
+        self.usage.save()
+
     def emergency_stop_cb(self, channel):
         """
         Cancel button pressed → abort everything & return to main menu.
+        The relays were already killed from the CANCEL edge callback; this is
+        only the polled, UI side of the stop.
         """
         self.emergency_stop = True
         self.running = False
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "!! EMERGENCY !!", fill="white")
-
-        time.sleep(1)
-        self.menuContext.showMenu()
+        self.showText("!! EMERGENCY !!", top=20)
+        # no sleeping here: run() brings the menu back after STOP_SHOWN
+        self.stop_shown_at = clock.monotonic()
 
     
 
 
 
+    def reportStop(self):
+        """
+        Put the stop latencies on the live stream and warn if any stop was slower
+        than the bound. Runs once the emergency message is down, off the stop path.
+        """
+        try:
+            report = self.estop.summary()
+        except ControlError as e:
+            print(f"[WARNING] no emergency stop report: {e}")
+            return
+        self.live.update(estop=report)
+        if report["violations"]:
+            print(f"[WARNING] {report['violations']} emergency stop(s) over the bound: {report}")
+
     def left_btn(self, ctx):
         if not self.running:
             self.menuContext.advance()
@@ -531,82 +864,77 @@ class Bartender(MenuDelegate):
     def updateProgressBar(self, percent, x=15, y=15):
         height = 10
         width = SCREEN_WIDTH - 2*x
-        for w in range(width):
-            self.led.draw_pixel(w + x, y)
-            self.led.draw_pixel(w + x, y + height)
-        for h in range(height):
-            self.led.draw_pixel(x, h + y)
-            self.led.draw_pixel(x + width, h + y)
         fill_w = int(percent/100.0 * width)
-        for w in range(fill_w):
-            for h in range(height):
-                self.led.draw_pixel(x + w, y + h)
-
-    def wait_for_confirmation(self):
-        """
-        Block until the Confirm button goes HIGH, or until emergency_stop is triggered.
-        """
-        while GPIO.input(self.btn_confirm) == GPIO.LOW:
-            # check for emergency button
-            self.pollButtons()
-            if self.emergency_stop:
-                return
-            time.sleep(0.1)
+        def render(draw):
+            draw.rectangle((x, y, x + width, y + height), outline="white")
+            draw.rectangle((x, y, x + fill_w, y + height), fill="white")
+        self.show(render)
 
     def prime_pumps(self):
         """
-        Run all pumps for PRIME_TIME seconds to prime tubing,
-        but only after a glass is placed on the break-beam.
+        Prime the lines that need it (priming.py), all together, each for its
+        own line volume and flow, but only after a glass is placed on the break-beam.
         """
+        schedule, dispenses, keys = self.priming.primeSchedule(self.pump_configuration, FLOW_RATE)
+        if not schedule:
+            self.showText("All pumps primed", top=20)
+            clock.sleep(1)
+            return
+
         # 0) Wait for glass to break the beam
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "Place glass to prime", fill="white")
-        while not self.is_glass_present():
-            # allow emergency-stop while waiting
-            self.pollButtons()
-            if self.emergency_stop:
-                return
-            time.sleep(0.1)
+        self.showText("Place glass to prime", top=20)
+        if not self.waitForGlass():
+            return
 
         # 1) Glass detected confirmation
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "Glass detected!", fill="white")
-        time.sleep(0.5)
+        self.showText("Glass detected!", top=20)
+        clock.sleep(0.5)
 
         # 2) Notify user that priming is starting
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "Priming pumps...", fill="white")
+        self.showText(f"Priming {len(keys)} pumps...", top=20)
 
-        # 3) Activate all pumps (relays are active LOW)
-        for pump in self.pump_configuration.values():
-            GPIO.output(pump['pin'], GPIO.LOW)
+        # 3) Run them together (one relay write on; CANCEL stops them early)
+        self.live.update(state='priming', order=None, pumps=self.livePumps(schedule, dispenses))
+        if not self.pour(schedule):
+            return
+        for key, (ml, _) in zip(keys, dispenses):
+            self.usage.record(key, self.pump_configuration[key]['value'], ml)
+        self.usage.save()
+        self.priming.mark(keys, PRIMED)
+        self.priming.save()
 
-        # 4) Let them run for PRIME_TIME seconds
-        start = time.time()
-        while time.time() - start < PRIME_TIME:
-            # allow emergency-stop during prime
-            self.pollButtons()
-            if self.emergency_stop:
-                break
-            time.sleep(0.1)
+        # 4) Notify user that priming is done
+        self.showText("Priming done", top=20)
+        clock.sleep(2)
 
-        # 5) Turn pumps off
-        for pump in self.pump_configuration.values():
-            GPIO.output(pump['pin'], GPIO.HIGH)
 
-        # 6) Notify user that priming is done
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "Priming done", fill="white")
-        time.sleep(2)
+    def is_glass_present(self):
+        """
+        Returns True while a glass is in place: the IR beam is broken (GPIO LOW)
+        and the scale confirmed it when it was put down. Kept up to date by the
+        beam's edge callback, so this costs nothing.
+        """
+        return self.glass.isPresent()
 
+    def waitForGlass(self):
+        """
+        Block until a glass is placed, waking on the beam edge itself.
+        Returns False if the flow was cancelled meanwhile.
+        """
+        while not self.glass.wait(0.1):
+            self.pollButtons()
+            if self.emergency_stop:
+                return False
+        return True
 
-    def is_glass_present(self):
+    def confirmGlass(self):
         """
-        Returns True when the IR beam is broken (glass is in place).
-        Beam intact (no glass) ? GPIO HIGH
-        Beam broken (glass present) ? GPIO LOW
+        Called once per beam-break: does the scale agree there is a glass?
+        An uncalibrated scale reads raw counts, so it isn't asked.
         """
-        return GPIO.input(IR_PIN) == GPIO.LOW
+        if not self.scaleCalibrated():
+            return True
+        return self.get_glass_weight() > GLASS_MIN_WT
 
 
     
@@ -620,42 +948,191 @@ class Bartender(MenuDelegate):
             return 0.0
 
         try:
-            return self.hx.get_weight_mean(readings=5)
+            with self.scale_lock:
+                grams = self.hx.get_weight_mean(readings=5)
+            if grams is not False:
+                self.live.update(weight=round(grams, 1))
+            return grams
         except Exception as e:
             print(f"[WARNING] HX711 read failed: {e}")
             return 0.0
 
 
+    def readGlassWeights(self, count = None):
+        """
+        Yield single scale readings in grams, one conversion each, until `count`
+        (or the caller stops asking, or the scale fails).
+        """
+        if not self.hx:
+            return
+        n = 0
+        while count is None or n < count:
+            try:
+                with self.scale_lock:
+                    grams = self.hx.get_weight_mean(readings=1)
+            except Exception as e:
+                print(f"[WARNING] HX711 read failed: {e}")
+                return
+            if grams is False:
+                return
+            n += 1
+            self.live.update(weight=round(grams, 1))
+            yield grams
+
+    def identifyGlass(self):
+        """
+        Recognise the glass on the scale from the registry, sampling only until
+        one profile is confident; it then learns this glass's weight. None if
+        unknown, or if no glass got confident before classify() gave up, or
+        if the scale isn't calibrated.
+        """
+        if not self.scaleCalibrated():
+            self.glass_grams = None
+            return None
+        profile, prob, n, grams = self.glasses.classify(self.readGlassWeights())
+        print(f"[DEBUG] glass: {profile.name if profile else 'unknown'} "
+              f"p={prob:.2f} after {n} readings ({grams:.1f} g)")
+        self.glass_grams = grams if n else None
+        if profile is None or prob < CONFIDENCE:
+            return None
+        profile.observe(grams)
+        self.glasses.save()
+        return profile
+
+    def scaleCalibrated(self):
+        """
+        True if the scale is there and reads grams (see GLASS_MIN_WT, the glass registry).
+        """
+        return bool(self.hx) and self.hx.calibrated()
+
     def detect_glass_type(self):
-        w = self.get_glass_weight()
-        if abs(w - SMALL_EMPTY_WT) < 50:
-            return 'small'
-        if abs(w - LARGE_EMPTY_WT) < 100:
-            return 'large'
-        return None
+        profile = self.identifyGlass()
+        return profile.name if profile else None
 
     def check_sensors(self):
         return self.is_glass_present() and (self.detect_glass_type() is not None)
 
+    def saveTare(self):
+        offset, shift = self.hx.getTare()
+        self.snapshot.save(tare={'offset': offset, 'shift': shift, 'at': clock.time()})
+
+    def restoreTare(self):
+        """
+        Reuse the previous run's tare if it is recent enough. True if it was.
+        """
+        tare = self.snapshot.get('tare')
+        if not tare or clock.time() - tare['at'] > TARE_MAX_AGE:
+            return False
+        self.hx.setTare(tare['offset'], tare['shift'])
+        return True
+
+    def menuPath(self):
+        """
+        [[menu name, selected option], ...] from the top-level menu to the current one.
+        """
+        path = []
+        menu = self.menuContext.currentMenu
+        while menu is not None:
+            path.append([menu.name, menu.selectedOption])
+            menu = menu.parent
+        return path[::-1]
+
+    def restoreMenu(self):
+        """
+        Go back to the menu position in the snapshot, as far as it still exists.
+        """
+        path = self.snapshot.get('menu')
+        menu = self.menuContext.topLevelMenu
+        if not path or path[0][0] != menu.name:
+            return
+        for depth, (name, selected) in enumerate(path):
+            if depth:
+                sub = next((o for o in menu.options if o.type == 'menu' and o.name == name), None)
+                if sub is None:
+                    break
+                menu = sub
+            if selected < len(menu.options):
+                menu.selectedOption = selected
+        self.menuContext.currentMenu = menu
+
+    def resumePour(self):
+        """
+        Reconcile a pour the previous run didn't finish. How far it got comes
+        from the glass's weight gain (the relays may have stayed on after the
+        crash) or, failing that, the last progress written. It is resumed for
+        what is left if the glass is still there and CONFIRM is pressed, and
+        dropped otherwise.
+        """
+        pour = self.snapshot.get('pour')
+        schedule = {int(pin): t for pin, t in pour['schedule'].items()}
+        volumes = pour['volumes']
+        done = pour['elapsed']
+
+        if not self.glass.wait(2.0):
+            self.showText("Pour interrupted", "No glass: aborted")
+            clock.sleep(2)
+            self.abortPour(pour)
+            return
+        weight = None
+        if self.hx and pour['glass_g'] is not None:
+            weight = self.get_glass_weight()
+            delivered = weight - pour['glass_g']   # ~1 g per mL
+            done = max(done, pourTime(schedule, volumes, delivered))
+
+        remaining = {}
+        left = []
+        for (pin, t), v in zip(schedule.items(), volumes):
+            if t - done > RESUME_SLACK:
+                remaining[pin] = t - done
+                left.append((v * (t - done) / t, t - done))
+        if not remaining or not self.ask(ConfirmDialog(f"Resume {pour['drink']}?",
+                                                       f"{sum(v for v, _ in left):.0f} mL left",
+                                                       "Press Confirm")):
+            self.emergency_stop = False
+            self.abortPour(pour)
+            return
+
+        # the rest is a pour of its own, should this run crash too
+        self.snapshot.save(pour=dict(pour,
+            schedule=remaining,
+            volumes=[v for v, _ in left],
+            glass_g=weight,
+            elapsed=0.0))
+
+        self.running = True
+        self.live.update(state='pouring', order={'drink': pour['drink']},
+                         pumps=self.livePumps(remaining, left))
+        pump_thread = clock.Thread(target=self.pour, args=(remaining,))
+        pump_thread.start()
+        self.progressBar(max(remaining.values()), left)
+        pump_thread.join()
+        self.running = False
+        self.emergency_stop = False
+        self.abortPour(pour)
+
+    def abortPour(self, pour):
+        """
+        Forget an interrupted pour (counting it against the lines it used).
+        """
+        self.recordUsage(pour['scaled'])
+        self.snapshot.save(pour=None)
+
     def run(self):
         """
-        1) Ask once whether to prime.
+        0) Reconcile a pour a crashed run left unfinished.
+        1) Ask once whether to prime, if any line needs it.
         2) Prime (or skip) on user choice.
-        3) Immediately show drink menu.
+        3) Immediately show drink menu, where the last run left it.
         4) Poll buttons in a tight loop for navigation & selection.
         """
-        # 1) Offer priming choice
-        with canvas(self.led) as draw:
-            draw.text((0, 20), "CONFIRM ? prime", fill="white")
-            draw.text((0, 40), "CANCEL  ? skip",  fill="white")
+        # 0) Warm restart: finish or drop the interrupted pour
+        if self.snapshot.get('pour'):
+            self.resumePour()
 
-        choice = None
-        while choice is None:
-            if GPIO.input(self.btn_confirm) == GPIO.HIGH:
-                choice = True
-            elif GPIO.input(self.btn_cancel) == GPIO.HIGH:
-                choice = False
-            time.sleep(0.05)
+        # 1) Offer priming choice (a restart mid-service finds every line primed)
+        _, _, unprimed = self.priming.primeSchedule(self.pump_configuration, FLOW_RATE)
+        choice = unprimed and self.ask(ConfirmDialog(f"{len(unprimed)} pumps unprimed",
+                                                     "CONFIRM ? prime", "CANCEL  ? skip"))
 
         # 2) Act on choice
         if choice:
@@ -665,25 +1142,84 @@ class Bartender(MenuDelegate):
         self.emergency_stop = False
 
         # 3) Show the menu once
+        self.restoreMenu()
         self.menuContext.showMenu()
 
-        # 4) Poll buttons forever
+        # 4) Poll buttons forever, keeping the menu position in the snapshot
         try:
             while True:
                 self.pollButtons()
-                time.sleep(0.05)
+                if self.stop_shown_at is not None and \
+                        clock.monotonic() - self.stop_shown_at >= STOP_SHOWN:
+                    self.stop_shown_at = None
+                    self.reportStop()
+                    self.menuContext.showMenu()
+                if self.live.fields['state'] != 'idle':
+                    # whatever a button started is over once pollButtons returns
+                    self.live.update(state='idle', order=None, pumps=[], delivered=[], progress=0.0)
+                path = self.menuPath()
+                if path != self.snapshot.get('menu'):
+                    self.snapshot.set('menu', path)
+                self.snapshot.flush()
+                clock.sleep(0.05)
         except KeyboardInterrupt:
             pass
         finally:
-            GPIO.cleanup()
+            if self.control:
+                self.control.close()
+            else:
+                GPIO.cleanup()
+
+
 
 
 
 
 
+def controlConfig(pump_configuration):
+    """
+    What the control process needs to drive the hardware (control.py).
+    """
+    return {
+        "pump_pins":        [p['pin'] for p in pump_configuration.values()],
+        "buttons":          BUTTONS,
+        "cancel_pin":       BTN_CANCEL,
+        "ir_pin":           IR_PIN,
+        "hx_dout":          TORSION_DT,
+        "hx_sck":           TORSION_SCK,
+        "calibration_file": CALIBRATION_FILE,
+        "loadcell_file":    LOADCELL_FILE,
+        "glass_cell":       GLASS_CELL,
+        "glass_min":        GLASS_MIN_WT,
+    }
 
 
 if __name__ == '__main__':
-    bartender = Bartender()
+    parser = argparse.ArgumentParser(description="Automated bartender")
+    parser.add_argument("--split", action="store_true",
+                        help="drive the hardware from a separate control process")
+    parser.add_argument("--core", type=int, default=CONTROL_CORE,
+                        help="CPU to pin the control process to, -1 for any")
+    parser.add_argument("--priority", type=int, default=CONTROL_PRIORITY,
+                        help="SCHED_FIFO priority of the control process, 0 for none")
+    parser.add_argument("--switch-interval", type=float, default=SWITCH_INTERVAL,
+                        help="interpreter thread switch interval in seconds, so the "
+                             "CANCEL callback gets the GIL quickly; 0 for the default")
+    parser.add_argument("--stream-port", type=int, default=STREAM_PORT,
+                        help="localhost port of the live state stream, 0 for none")
+    args = parser.parse_args()
+
+    # before the control process is forked: it inherits the interval
+    if args.switch_interval > 0:
+        sys.setswitchinterval(args.switch_interval)
+
+    control = None
+    if args.split:
+        control = ControlClient(controlConfig(Bartender.readPumpConfiguration()),
+                                core=None if args.core < 0 else args.core,
+                                priority=args.priority)
+    bartender = Bartender(control)
+    if args.stream_port:
+        StreamServer(bartender.live, port=args.stream_port).start()
     bartender.buildMenu(drink_list, drink_options)
     bartender.run()
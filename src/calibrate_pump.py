@@ -41,6 +41,22 @@ def main():
     GPIO.output(pin, GPIO.HIGH)
 
     GPIO.cleanup()
+
+    # the line was full before the run, so everything collected is the flow
+    measured = input("mL collected (blank to leave the flow rate alone): ").strip()
+    if measured:
+        try:
+            collected = float(measured)
+        except ValueError:
+            collected = 0.0
+        if not (0 < collected < float("inf")):
+            print("Error: '%s' is not a volume in mL; flow rate left alone" % measured)
+        else:
+            flow_rate = 60.0 / collected
+            config[pump_id]["flow_rate"] = flow_rate
+            with open(CONFIG_FILE, "w") as f:
+                json.dump(config, f)
+            print("Saved %s flow rate: %.3f s/mL (%.2f mL/s)" % (name, flow_rate, 1.0 / flow_rate))
     print("Done. Exiting.")
 
 if __name__ == "__main__":
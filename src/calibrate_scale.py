@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Calibrate the load cell over several reference weights, with temperature:
+
+    python3 calibrate_scale.py                  # measure, fit, save
+    python3 calibrate_scale.py --drift 30       # ... then log 30 min of warm-up
+    python3 calibrate_scale.py --refit --degree 2
+
+Every measurement is logged with the CPU temperature. The points are fitted by
+least squares (scalecal.py) and saved to scale_calibration.json, which the
+bartender loads at start-up. Logging a warm-up (start with the enclosure cold,
+leave the plate alone while the Pi heats up) is what lets the fit learn how
+far the reading moves per °C; without it only the curve is fitted.
+"""
+import time
+import argparse
+import RPi.GPIO as GPIO
+
+from loadcell import HX711Reader
+from scalecal import ScaleCalibration, CALIBRATION_FILE, cpuTemp
+
+# ————— CONFIG ————— #
+DT_PIN       = 4     # HX711 DOUT → BCM4 (same wiring as bartender.py)
+CLK_PIN      = 16    # HX711 SCK  → BCM16
+CAL_SAMPLES  = 50    # raw readings averaged per calibration point
+DRIFT_EVERY  = 30    # seconds between points while logging warm-up
+# —————————————— #
+
+
+def measure(hx, grams):
+    raw = hx.get_raw_data_mean(CAL_SAMPLES)
+    if raw is False:
+        raise RuntimeError("no data from HX711")
+    point = {"grams": grams, "raw": raw, "temp": cpuTemp(), "time": time.time()}
+    temp = "n/a" if point["temp"] is None else f"{point['temp']:.1f} °C"
+    print(f"  {grams:8.1f} g   raw {raw:10.1f}   {temp}")
+    return point
+
+
+def collect(hx):
+    points = []
+    input("❯ Clear the plate & press Enter…")
+    points.append(measure(hx, 0.0))
+    while True:
+        entry = input("❯ Place a reference weight, enter its grams (blank to finish): ").strip()
+        if not entry:
+            return points
+        points.append(measure(hx, float(entry)))
+
+
+def logDrift(hx, grams, minutes):
+    """
+    Measure the same load every DRIFT_EVERY seconds while the enclosure warms up.
+    """
+    points = []
+    print(f"Logging {minutes:.0f} min of drift at {grams:.1f} g: don't touch the plate (Ctrl-C ends early)")
+    end = time.time() + minutes * 60
+    try:
+        while time.time() < end:
+            points.append(measure(hx, grams))
+            time.sleep(DRIFT_EVERY)
+    except KeyboardInterrupt:
+        pass
+    return points
+
+
+def report(cal):
+    print(f"\nDegree {cal.degree} fit over {len(cal.points)} points")
+    if cal.compensated:
+        print(f"Temperature term {cal.temp_coeff:+.3f} g/°C around {cal.temp_ref:.1f} °C")
+    else:
+        print("No temperature term (points span less than a degree, or no thermal zone)")
+    worst = max(abs(err) for _, err in cal.residuals())
+    print(f"Worst residual {worst:.2f} g")
+    for grams, err in cal.residuals():
+        print(f"  {grams:8.1f} g   {err:+6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--degree", type=int, default=1, help="polynomial degree of the curve")
+    parser.add_argument("--drift", type=float, default=0.0,
+                        help="minutes of warm-up to log after the reference weights")
+    parser.add_argument("--refit", action="store_true",
+                        help="refit the points already in the calibration file")
+    args = parser.parse_args()
+
+    if args.refit:
+        saved = ScaleCalibration.load(CALIBRATION_FILE)
+        if not saved:
+            print(f"Error: no {CALIBRATION_FILE} to refit")
+            return
+        points = saved.points
+    else:
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BCM)
+        hx = HX711Reader(dout_pin=DT_PIN, pd_sck_pin=CLK_PIN)
+        hx.reset()
+        try:
+            points = collect(hx)
+            if args.drift > 0:
+                points += logDrift(hx, points[-1]["grams"], args.drift)
+        finally:
+            GPIO.cleanup()
+
+    cal = ScaleCalibration.fit(points, args.degree)
+    report(cal)
+    cal.save(CALIBRATION_FILE)
+    print(f"\n✔ Saved to {CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
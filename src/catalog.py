@@ -0,0 +1,86 @@
+# catalog.py
+"""
+The drink catalog, packed for a Pi with little RAM.
+
+drinks.py's list of {"name", "ingredients": {value: mL}} dicts costs several
+hundred bytes a drink once it is on the menu. Catalog keeps the same recipes
+as flat arrays instead: ingredients are interned to small integer ids, drink
+i's ids and volumes are ids[offsets[i]:offsets[i + 1]] and
+amounts[offsets[i]:offsets[i + 1]], and masks[i] has one bit per ingredient id
+so "can this drink be made" is a single AND against the loaded pumps' mask.
+A recipe is unpacked back into a dict only when it is poured or indexed.
+"""
+from array import array
+
+
+class Catalog(object):
+    __slots__ = ("names", "ingredients", "ids", "amounts", "offsets", "masks", "_index")
+
+    def __init__(self, drink_list = ()):
+        self.names = []                   # drink index -> name
+        self.ingredients = []             # ingredient id -> value ("gin")
+        self._index = {}                  # value -> ingredient id
+        self.ids = array('H')             # ingredient ids of every recipe, back to back
+        self.amounts = array('f')         # mL, parallel to ids
+        self.offsets = array('I', [0])    # where each drink's run starts in ids/amounts
+        self.masks = []                   # drink index -> bitmask of its ingredient ids
+        for d in drink_list:
+            self.add(d['name'], d['ingredients'])
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, value):
+        """
+        The small integer id of ingredient `value`, assigned on first use.
+        """
+        id = self._index.get(value)
+        if id is None:
+            id = self._index[value] = len(self.ingredients)
+            self.ingredients.append(value)
+        return id
+
+    def lookup(self, value):
+        """
+        The id of ingredient `value`, None if no recipe uses it.
+        """
+        return self._index.get(value)
+
+    def add(self, name, ingredients):
+        """
+        Append a drink ({value: mL}); returns its index.
+        """
+        mask = 0
+        for value, ml in ingredients.items():
+            id = self.intern(value)
+            self.ids.append(id)
+            self.amounts.append(ml)
+            mask |= 1 << id
+        self.offsets.append(len(self.ids))
+        self.masks.append(mask)
+        self.names.append(name)
+        return len(self.names) - 1
+
+    def recipe(self, index):
+        """
+        Drink `index`'s ingredients as {value: mL}, the shape recipes.py works on.
+        """
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return {self.ingredients[self.ids[i]]: self.amounts[i] for i in range(start, end)}
+
+    def mask(self, values):
+        """
+        Bitmask of the ingredients in `values` (ones no recipe uses are left out).
+        """
+        mask = 0
+        for value in values:
+            id = self.lookup(value)
+            if id is not None:
+                mask |= 1 << id
+        return mask
+
+    def makeable(self, index, loaded):
+        """
+        True if every ingredient of drink `index` is in the `loaded` mask.
+        """
+        return self.masks[index] & ~loaded == 0
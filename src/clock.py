@@ -0,0 +1,239 @@
+# clock.py
+"""
+The bartender's notion of time.
+
+Everything that sleeps, waits or reads the time goes through this module
+instead of `time` and `threading` directly:
+
+    clock.sleep(0.1)                 instead of time.sleep(0.1)
+    clock.monotonic()                instead of time.monotonic()
+    stop = clock.Event()             instead of threading.Event()
+    clock.Thread(target=...)         instead of threading.Thread(target=...)
+
+Normally this is the real clock. A replay swaps in a VirtualClock with use(),
+which only moves time forward once every clock thread is blocked, so a long
+recorded session runs in a fraction of the time and always the same way.
+"""
+import time as _time
+import heapq
+import threading
+
+# Wall-clock time that virtual time 0 corresponds to
+VIRTUAL_EPOCH = 1700000000.0
+
+
+class ClockStopped(Exception):
+    """
+    Raised in clock threads once a VirtualClock has been stopped.
+    """
+
+
+class RealClock(object):
+    def monotonic(self):
+        return _time.monotonic()
+
+    def time(self):
+        return _time.time()
+
+    def sleep(self, seconds):
+        _time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        return threading.Event.wait(event, timeout)
+
+    def eventSet(self, event):
+        pass
+
+    def thread(self, target, args, daemon):
+        return threading.Thread(target=target, args=args, daemon=daemon)
+
+
+class _Waiter(object):
+    __slots__ = ("thread", "event", "woken")
+
+    def __init__(self, thread, event):
+        self.thread = thread
+        self.event = event
+        self.woken = False
+
+
+class VirtualClock(object):
+    def __init__(self, start = 0.0):
+        self.now = start
+        self.cond = threading.Condition(threading.RLock())
+        self.queue = []          # heap of (time, seq, _Waiter or callable)
+        self.seq = 0
+        self.waiters = []        # blocked _Waiters that an event can wake
+        self.running = {threading.get_ident()}
+        self.stopped = False
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return VIRTUAL_EPOCH + self.now
+
+    def sleep(self, seconds):
+        self.wait(None, seconds)
+
+    def at(self, when, callback):
+        """
+        Run callback() when virtual time reaches `when`, on the thread advancing the clock.
+        """
+        with self.cond:
+            self._push(when, callback)
+
+    def stop(self):
+        """
+        Make every clock thread raise ClockStopped the next time it waits.
+        """
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def wait(self, event, timeout):
+        me = threading.get_ident()
+        with self.cond:
+            if self.stopped:
+                raise ClockStopped()
+            if event is not None and event.is_set():
+                return True
+            waiter = _Waiter(me, event)
+            if timeout is not None:
+                self._push(self.now + max(0.0, timeout), waiter)
+            if event is not None:
+                self.waiters.append(waiter)
+            self.running.discard(me)
+            try:
+                while not waiter.woken:
+                    if not self.running:
+                        self._advance()
+                        if waiter.woken:
+                            break
+                        if not self.running and not self.queue:
+                            raise ClockStopped("every clock thread is blocked forever")
+                    self.cond.wait()
+                    if self.stopped:
+                        raise ClockStopped()
+            finally:
+                waiter.woken = True
+                if event is not None and waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                self.running.add(me)
+            return event.is_set() if event is not None else False
+
+    def eventSet(self, event):
+        with self.cond:
+            for waiter in self.waiters:
+                if waiter.event is event and not waiter.woken:
+                    self._wake(waiter)
+            self.cond.notify_all()
+
+    def thread(self, target, args, daemon):
+        return _ClockThread(self, target, args, daemon)
+
+    def _push(self, when, item):
+        self.seq += 1
+        heapq.heappush(self.queue, (when, self.seq, item))
+
+    def _wake(self, waiter):
+        waiter.woken = True
+        self.running.add(waiter.thread)
+
+    def _advance(self):
+        """
+        Nobody can run: move time to the next deadline and wake or run what is due.
+        """
+        while not self.running and self.queue:
+            when, _, item = heapq.heappop(self.queue)
+            self.now = max(self.now, when)
+            if isinstance(item, _Waiter):
+                if not item.woken:
+                    self._wake(item)
+            else:
+                item()
+        self.cond.notify_all()
+
+
+class _ClockThread(threading.Thread):
+    """
+    A thread the VirtualClock counts as runnable from start() until it blocks or ends.
+    """
+    def __init__(self, vclock, target, args, daemon):
+        threading.Thread.__init__(self, daemon=daemon)
+        self.vclock = vclock
+        self.clock_target = target
+        self.clock_args = args
+        self.started = threading.Event()
+        self.done = Event()
+
+    def start(self):
+        # hold the clock until the new thread has registered itself
+        token = object()
+        with self.vclock.cond:
+            self.vclock.running.add(token)
+        self.token = token
+        threading.Thread.start(self)
+        self.started.wait()
+
+    def run(self):
+        with self.vclock.cond:
+            self.vclock.running.add(threading.get_ident())
+            self.vclock.running.discard(self.token)
+        self.started.set()
+        try:
+            self.clock_target(*self.clock_args)
+        except ClockStopped:
+            pass
+        finally:
+            with self.vclock.cond:
+                self.vclock.running.discard(threading.get_ident())
+                self.done.set()
+                self.vclock.cond.notify_all()
+
+    def join(self, timeout = None):
+        self.done.wait(timeout)
+
+
+_current = RealClock()
+
+
+def use(new_clock):
+    """
+    Switch every clock user to `new_clock` (a RealClock or VirtualClock).
+    """
+    global _current
+    _current = new_clock
+    return new_clock
+
+
+def current():
+    return _current
+
+
+def monotonic():
+    return _current.monotonic()
+
+
+def time():
+    return _current.time()
+
+
+def sleep(seconds):
+    _current.sleep(seconds)
+
+
+class Event(threading.Event):
+    """
+    threading.Event whose wait() and set() go through the current clock.
+    """
+    def set(self):
+        threading.Event.set(self)
+        _current.eventSet(self)
+
+    def wait(self, timeout = None):
+        return _current.wait(self, timeout)
+
+
+def Thread(target, args = (), daemon = False):
+    return _current.thread(target, args, daemon)
@@ -0,0 +1,487 @@
+# control.py
+"""
+The hardware control process, for running the bartender as two processes.
+
+In one process, relay timing, the emergency stop and the HX711 readout share
+the GIL with the menu, widgets and PIL rasterising every OLED frame, and that
+is where pour-time jitter comes from. With bartender.py --split, a small
+control process owns the hardware instead: the relay bank, the CANCEL kill
+path, the buttons, the IR beam and the load cell. The UI process (menu,
+widgets, display, state files) keeps running Bartender, but its relays,
+estop, glass, hx and buttons are the proxies below.
+
+The processes talk through two single-producer rings in shared memory, one of
+commands (UI -> control) and one of events (control -> UI). A message is a
+short JSON list, [op, args...], in a fixed-size slot; semaphores count the
+full and free slots so either side sleeps until there is something to do.
+
+    commands                         events
+    ["run", id, {pin: s}]            ["reply", id, value]      answers an id'd command
+    ["weight", id, readings]         ["button", name]          debounced press
+    ["zero", id] / ["tare", id]      ["glass", present]        settled beam + scale
+    ["set_tare", offset, shift]      ["paused", on, total, at] relay bank pause state
+    ["off"] ["pause"] ["resume"]     ["tripped", on]           emergency stop state
+    ["stop"] ["reset"] ["arm"]       ["ready", has_scale, cal] hardware is up
+    ["summary", id] ["quit"]         ["failed", id, error]     an id'd command raised
+
+Everything time-critical stays inside the control process: relays.run times
+the pumps there, the CANCEL edge kills them there, and pulling the glass
+pauses them there. The control process can also be pinned to its own core
+and given a real-time scheduling priority.
+"""
+import json
+import os
+import struct
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+import RPi.GPIO as GPIO
+import clock
+from inputs import ButtonInput
+from relays import RelayBank
+from estop import EmergencyStop
+from glass import GlassMonitor
+from loadcell import HX711Reader, HX711Bank
+from scalecal import ScaleCalibration
+
+# ————— CONFIG ————— #
+RING_SLOTS       = 64       # messages each ring holds
+SLOT_SIZE        = 256      # bytes per message slot (2 of them the length)
+CONTROL_POLL     = 0.005    # seconds between button / state samples in the control loop
+CONTROL_CORE     = 3        # CPU the control process is pinned to (the last core of a Pi 3/4)
+CONTROL_PRIORITY = 50       # SCHED_FIFO priority of the control process
+START_TIMEOUT    = 15.0     # seconds to wait for the control process to report ready
+CALL_TIMEOUT     = 10.0     # seconds a command other than a pour may take to answer
+CALL_POLL        = 0.5      # seconds between checks that the control process is alive
+REPLIED          = ("run", "weight", "zero", "tare", "summary")   # commands with an id
+# —————————————— #
+
+_HEAD = struct.Struct("<QQ")    # messages written, messages read
+_LEN = struct.Struct("<H")
+
+
+class ControlError(RuntimeError):
+    """
+    The control process died, failed a command or didn't answer in time.
+    """
+
+
+class Ring(object):
+    """
+    Fixed-size message ring in shared memory. Create it before forking; one
+    process puts, the other gets (threads on the putting side share a lock).
+    """
+    def __init__(self, slots = RING_SLOTS, slot_size = SLOT_SIZE, context = multiprocessing):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=_HEAD.size + slots * slot_size)
+        _HEAD.pack_into(self.shm.buf, 0, 0, 0)
+        self.full = context.Semaphore(0)
+        self.free = context.Semaphore(slots)
+        self.lock = threading.Lock()
+
+    def put(self, message, timeout = None):
+        """
+        Queue `message`; False if no slot came free within `timeout` seconds.
+        """
+        data = json.dumps(message, separators=(",", ":")).encode()
+        if len(data) > self.slot_size - _LEN.size:
+            raise ValueError(f"message too long for a ring slot: {message!r}")
+        with self.lock:
+            if not self.free.acquire(timeout=timeout):
+                return False
+            written, _ = _HEAD.unpack_from(self.shm.buf, 0)
+            at = _HEAD.size + (written % self.slots) * self.slot_size
+            _LEN.pack_into(self.shm.buf, at, len(data))
+            self.shm.buf[at + _LEN.size:at + _LEN.size + len(data)] = data
+            struct.pack_into("<Q", self.shm.buf, 0, written + 1)
+        self.full.release()
+        return True
+
+    def get(self, timeout = None):
+        """
+        The next message, or None after `timeout` seconds.
+        """
+        if not self.full.acquire(timeout=timeout):
+            return None
+        _, read = _HEAD.unpack_from(self.shm.buf, 0)
+        at = _HEAD.size + (read % self.slots) * self.slot_size
+        length, = _LEN.unpack_from(self.shm.buf, at)
+        data = bytes(self.shm.buf[at + _LEN.size:at + _LEN.size + length])
+        struct.pack_into("<Q", self.shm.buf, 8, read + 1)
+        self.free.release()
+        return json.loads(data)
+
+    def close(self, unlink = False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def pin(core, priority):
+    """
+    Pin this process to `core` and give it SCHED_FIFO `priority`, as far as
+    the system allows (priority needs root or CAP_SYS_NICE).
+    """
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {core % os.cpu_count()})
+        except OSError as e:
+            print(f"[WARNING] control: cannot pin to core {core}: {e}")
+    if priority and hasattr(os, "sched_setscheduler"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except OSError as e:
+            print(f"[WARNING] control: no real-time priority: {e}")
+
+
+# --- control process side ---
+
+class ControlServer(object):
+    def __init__(self, config, commands, events):
+        """
+        config: pins and settings, see bartender.controlConfig()
+        """
+        self.config = config
+        self.commands = commands
+        self.events = events
+        self.scale_lock = threading.Lock()
+        self.hx = None
+
+    def setup(self):
+        c = self.config
+        for btn in c["buttons"]:
+            GPIO.setup(btn, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        self.buttons = ButtonInput(c["buttons"])
+        GPIO.setup(c["ir_pin"], GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        for p in c["pump_pins"]:
+            GPIO.setup(p, GPIO.OUT, initial=GPIO.HIGH)
+        self.relays = RelayBank(c["pump_pins"])
+        self.relays.allOff()
+        self.estop = EmergencyStop(self.relays)
+        self.estop.arm(c["cancel_pin"])
+
+        try:
+            bank = HX711Bank.load(c["loadcell_file"])
+            if bank:
+                self.hx = bank.channels[c["glass_cell"]]
+            else:
+                self.hx = HX711Reader(dout_pin=c["hx_dout"], pd_sck_pin=c["hx_sck"],
+                                      gain_channel_A=128, select_channel='A')
+            self.hx.reset()
+            if not self.hx.calibration:
+                self.hx.set_calibration(ScaleCalibration.load(c["calibration_file"]))
+        except Exception as e:
+            print(f"[WARNING] control: HX711 init failed: {e}")
+            self.hx = None
+
+        # armed by the UI's "arm" once the scale is tared
+        self.glass = GlassMonitor(c["ir_pin"], self.relays, confirm=self.confirmGlass)
+
+    def confirmGlass(self):
+        if not self.hx or not self.hx.calibrated():
+            return True
+        return self.weight(5) > self.config["glass_min"]
+
+    def weight(self, readings):
+        try:
+            with self.scale_lock:
+                return self.hx.get_weight_mean(readings=readings)
+        except Exception as e:
+            print(f"[WARNING] control: HX711 read failed: {e}")
+            return 0.0
+
+    def serve(self):
+        self.setup()
+        self.events.put(["ready", self.hx is not None, bool(self.hx and self.hx.calibrated())])
+        state = {}
+        while True:
+            self.buttons.poll()
+            name = self.buttons.pop()
+            while name is not None:
+                self.events.put(["button", name])
+                name = self.buttons.pop()
+            self.publish(state, "glass", self.glass.isPresent())
+            self.publish(state, "tripped", self.estop.tripped.is_set())
+            self.publish(state, "paused", self.relays.paused,
+                         self.relays.paused_total, self.relays.paused_at)
+
+            message = self.commands.get(CONTROL_POLL)
+            while message is not None:
+                if message[0] == "quit":
+                    self.relays.allOff()
+                    return
+                try:
+                    self.handle(message)
+                except Exception as e:
+                    self.fail(message[0], message[1] if message[0] in REPLIED else None, e)
+                message = self.commands.get(0)
+
+    def publish(self, state, op, *value):
+        # only changes go out
+        if state.get(op) != value:
+            state[op] = value
+            self.events.put([op, *value])
+
+    def handle(self, message):
+        op, args = message[0], message[1:]
+        if op == "run":
+            ident, schedule = args
+            schedule = {int(pin): t for pin, t in schedule.items()}
+            self.background(ident, lambda: self.relays.run(schedule, self.estop.tripped))
+        elif op == "weight":
+            ident, readings = args
+            self.background(ident, lambda: self.weight(readings))
+        elif op in ("zero", "tare"):
+            self.background(args[0], lambda: self.zero() if op == "zero" else self.hx.getTare())
+        elif op == "set_tare":
+            self.hx.setTare(*args)
+        elif op == "arm":
+            self.glass.arm()
+        elif op == "off":
+            self.relays.allOff()
+        elif op == "pause":
+            self.relays.pause()
+        elif op == "resume":
+            self.relays.resume()
+        elif op == "stop":
+            self.estop.stop()
+        elif op == "reset":
+            self.estop.reset()
+        elif op == "summary":
+            self.events.put(["reply", args[0], self.estop.summary()])
+        else:
+            print(f"[WARNING] control: unknown command {message!r}")
+
+    def zero(self):
+        with self.scale_lock:
+            self.hx.zero()
+        return self.hx.getTare()
+
+    def fail(self, op, ident, error):
+        print(f"[WARNING] control: {op} failed: {error}")
+        if ident is not None:
+            self.events.put(["failed", ident, str(error)])
+
+    def background(self, ident, work):
+        # long commands (a pour, a scale read) run on their own thread so the
+        # loop keeps reading buttons and commands; they always answer
+        def run():
+            try:
+                value = work()
+            except Exception as e:
+                self.fail("command", ident, e)
+                return
+            self.events.put(["reply", ident, value])
+        clock.Thread(target=run, daemon=True).start()
+
+
+def serve(config, commands, events, core, priority):
+    """
+    Entry point of the control process.
+    """
+    pin(core, priority)
+    try:
+        ControlServer(config, commands, events).serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        GPIO.cleanup()
+
+
+# --- UI process side ---
+
+class RemoteRelays(object):
+    """
+    RelayBank as seen from the UI: the control process times the pumps.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.paused = False
+        self.paused_total = 0.0
+        self.paused_at = 0.0
+
+    def run(self, schedule, stop = None):
+        # the control process stops the run on its own emergency stop; a pour
+        # (paused while the glass is away) may take as long as it takes
+        return self.client.call("run", {str(pin): t for pin, t in schedule.items()}, timeout=None)
+
+    def allOff(self):
+        self.client.send("off")
+
+    def pause(self):
+        self.client.send("pause")
+
+    def resume(self):
+        self.client.send("resume")
+
+    def pausedTime(self):
+        if not self.paused:
+            return self.paused_total
+        return self.paused_total + clock.monotonic() - self.paused_at
+
+
+class RemoteStop(object):
+    """
+    EmergencyStop as seen from the UI; the CANCEL edge is handled in the control process.
+    """
+    def __init__(self, client):
+        self.client = client
+        self.tripped = clock.Event()
+
+    def stop(self):
+        self.tripped.set()
+        self.client.send("stop")
+
+    def reset(self):
+        self.tripped.clear()
+        self.client.send("reset")
+
+    def wait(self, timeout):
+        return self.tripped.wait(timeout)
+
+    def summary(self):
+        return self.client.call("summary")
+
+
+class RemoteGlass(object):
+    def __init__(self, client):
+        self.client = client
+        self.present = clock.Event()
+
+    def arm(self):
+        self.client.send("arm")
+
+    def wait(self, timeout = None):
+        return self.present.wait(timeout)
+
+    def isPresent(self):
+        return self.present.is_set()
+
+
+class RemoteScale(object):
+    """
+    The parts of HX711Reader the bartender uses, read in the control process.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def get_weight_mean(self, readings = 30):
+        return self.client.call("weight", readings)
+
+    def zero(self, readings = 30):
+        self.client.call("zero")
+        return False
+
+    def getTare(self):
+        return tuple(self.client.call("tare"))
+
+    def calibrated(self):
+        return self.client.calibrated
+
+    def setTare(self, offset, shift = None):
+        self.client.send("set_tare", offset, shift)
+
+
+class ControlClient(object):
+    def __init__(self, config, core = CONTROL_CORE, priority = CONTROL_PRIORITY):
+        """
+        Fork the control process for `config` (see bartender.controlConfig()).
+        core / priority: where and how to run it, None / 0 to leave it to the OS.
+        """
+        context = multiprocessing.get_context("fork")
+        self.commands = Ring(context=context)
+        self.events = Ring(context=context)
+        self.process = context.Process(target=serve, name="bartender-control", daemon=True,
+                                       args=(config, self.commands, self.events, core, priority))
+        self.process.start()
+        if core is not None and hasattr(os, "sched_setaffinity"):
+            # keep the UI off the control process's core
+            others = set(range(os.cpu_count())) - {core % os.cpu_count()}
+            if others:
+                os.sched_setaffinity(0, others)
+
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.waiting = {}           # id -> [clock.Event, reply, error]
+        self.ready = clock.Event()
+        self.has_scale = False
+        self.calibrated = False
+
+        self.relays = RemoteRelays(self)
+        self.estop = RemoteStop(self)
+        self.glass = RemoteGlass(self)
+        self.buttons = ButtonInput({})     # filled by push() from the control process
+        self.hx = RemoteScale(self)
+        clock.Thread(target=self._dispatch, daemon=True).start()
+        if not self.ready.wait(START_TIMEOUT):
+            raise RuntimeError("control process did not start")
+
+    def checkAlive(self):
+        """
+        Raise ControlError if the control process has exited.
+        """
+        if not self.process.is_alive():
+            raise ControlError(f"control process exited ({self.process.exitcode})")
+
+    def send(self, op, *args):
+        while not self.commands.put([op, *args], CALL_POLL):
+            self.checkAlive()
+
+    def call(self, op, *args, timeout = CALL_TIMEOUT):
+        """
+        Send a command and wait for its reply, at most `timeout` seconds (None:
+        for as long as the control process lives). Raises ControlError if it
+        exits, the command fails there or no reply comes in time.
+        """
+        with self.lock:
+            ident = self.next_id
+            self.next_id += 1
+            slot = self.waiting[ident] = [clock.Event(), None, None]
+        try:
+            self.send(op, ident, *args)
+            deadline = None if timeout is None else clock.monotonic() + timeout
+            while not slot[0].wait(CALL_POLL):
+                self.checkAlive()
+                if deadline is not None and clock.monotonic() >= deadline:
+                    raise ControlError(f"no answer to {op} in {timeout:.0f} s")
+        finally:
+            with self.lock:
+                self.waiting.pop(ident, None)
+        if slot[2] is not None:
+            raise ControlError(f"{op} failed in the control process: {slot[2]}")
+        return slot[1]
+
+    def _dispatch(self):
+        while True:
+            message = self.events.get()
+            op, args = message[0], message[1:]
+            if op in ("reply", "failed"):
+                with self.lock:
+                    slot = self.waiting.pop(args[0], None)
+                if slot is None:
+                    continue            # the caller gave up waiting
+                slot[1 if op == "reply" else 2] = args[1]
+                slot[0].set()
+            elif op == "button":
+                self.buttons.push(args[0])
+            elif op == "glass":
+                (self.glass.present.set if args[0] else self.glass.present.clear)()
+            elif op == "tripped":
+                (self.estop.tripped.set if args[0] else self.estop.tripped.clear)()
+            elif op == "paused":
+                r = self.relays
+                r.paused, r.paused_total, r.paused_at = args
+            elif op == "ready":
+                self.has_scale, self.calibrated = args
+                self.ready.set()
+
+    def close(self):
+        if self.process.is_alive():
+            try:
+                self.send("quit")
+            except ControlError:
+                pass
+        self.process.join(2.0)
+        self.commands.close(unlink=True)
+        self.events.close(unlink=True)
@@ -0,0 +1,88 @@
+# display.py
+"""
+The OLED's render thread.
+
+Only Display's thread talks to the ssd1306. Everyone else (the menu loop,
+progress bars, widgets, the emergency stop) posts the screen they want with
+show(render), where render(draw) draws one frame onto a luma canvas, and goes
+straight back to work. The thread keeps only the newest posted frame, draws it
+at most DISPLAY_FPS times a second, and drops the frames that were replaced in
+between, so nothing ever waits on the I2C bus or interleaves writes to it.
+"""
+import threading
+from luma.core.render import canvas
+import clock
+
+DISPLAY_FPS = 20        # frames per second the render thread draws at most
+
+_CLEAR = object()       # posted by clear(): blank the panel
+
+
+class Display(object):
+    def __init__(self, device, fps = DISPLAY_FPS):
+        self.device = device
+        self.interval = 1.0 / fps
+        self.lock = threading.Lock()
+        self.pending = None         # newest frame not drawn yet
+        self.wake = clock.Event()
+        self.idle = clock.Event()   # set while everything posted is on the panel
+        self.idle.set()
+        self.posted = 0
+        self.drawn = 0
+        self.errors = 0
+
+    def start(self):
+        clock.Thread(target=self._run, daemon=True).start()
+
+    def show(self, render):
+        """
+        Post the next screen: render(draw) is called on the render thread.
+        Never blocks; a frame still waiting to be drawn is replaced.
+        """
+        with self.lock:
+            self.pending = render
+            self.posted += 1
+            self.idle.clear()
+        self.wake.set()
+
+    def clear(self):
+        self.show(_CLEAR)
+
+    def flush(self, timeout = None):
+        """
+        Wait until the newest posted frame is on the panel. True if it is.
+        """
+        return self.idle.wait(timeout)
+
+    @property
+    def dropped(self):
+        return self.posted - self.drawn
+
+    def _run(self):
+        last = None
+        while True:
+            self.wake.wait()
+            # cap the frame rate; anything posted meanwhile replaces this frame
+            if last is not None:
+                delay = last + self.interval - clock.monotonic()
+                if delay > 0:
+                    clock.sleep(delay)
+            with self.lock:
+                self.wake.clear()
+                render, self.pending = self.pending, None
+            if render is None:
+                continue
+            try:
+                if render is _CLEAR:
+                    self.device.clear()
+                else:
+                    with canvas(self.device) as draw:
+                        render(draw)
+            except Exception as e:
+                self.errors += 1
+                print(f"[WARNING] display frame failed: {e}")
+            last = clock.monotonic()
+            self.drawn += 1
+            with self.lock:
+                if self.pending is None:
+                    self.idle.set()
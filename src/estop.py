@@ -0,0 +1,118 @@
+# estop.py
+"""
+Emergency stop with a dedicated relay-kill path.
+
+The CANCEL button gets its own GPIO edge callback. As soon as the edge fires,
+every pump relay is driven HIGH (off) directly from that callback - no menu
+loop, pour loop or display code sits in between. The stop is the guard of the
+RelayBank, checked under the bank lock, so once it has tripped no pour can
+switch a pump back on until reset().
+
+RPi.GPIO doesn't timestamp edges, so the callback can only time itself: from
+entering the callback to all relays off, held against STOP_BOUND like every
+other stop. Press-to-off is measured by callers that know when the press
+happened (trigger(), tests/pump/estop_stress.py --loopback). How quickly the callback gets the GIL
+depends on the interpreter's switch interval, which bartender.py sets at start
+up to SWITCH_INTERVAL.
+"""
+from collections import deque
+import RPi.GPIO as GPIO
+import clock
+
+STOP_BOUND       = 0.010   # seconds allowed from CANCEL edge to all relays off
+STOP_BOUNCE_MS   = 50      # edge-detect debounce for the CANCEL button
+LATENCY_HISTORY  = 100     # stop events kept for reporting
+SWITCH_INTERVAL  = 0.001   # suggested interpreter thread switch interval (default 5 ms)
+
+
+class EmergencyStop(object):
+    def __init__(self, relays, bound = STOP_BOUND):
+        """
+        relays: the RelayBank of every pump; the stop installs itself as its guard
+        """
+        self.relays = relays
+        self.bound = bound
+        self.tripped = clock.Event()
+        relays.guard = self.tripped.is_set
+        self.latencies = deque(maxlen=LATENCY_HISTORY)   # (time of stop, seconds) press to off
+        self.callbacks = deque(maxlen=LATENCY_HISTORY)   # (time of stop, seconds) callback to off
+        self.violations = 0
+
+    def arm(self, pin):
+        """
+        Attach the kill path to the rising edge of `pin` (the CANCEL button).
+        """
+        try:
+            GPIO.remove_event_detect(pin)
+        except Exception:
+            pass
+        GPIO.add_event_detect(pin, GPIO.RISING, callback=self._edge,
+                              bouncetime=STOP_BOUNCE_MS)
+
+    def _edge(self, channel):
+        # no edge time to measure from: callback to relays off is held to the bound
+        start = clock.monotonic()
+        self.stop()
+        latency = clock.monotonic() - start
+        self.callbacks.append((clock.time(), latency))
+        if latency > self.bound:
+            self.violations += 1
+            print(f"[WARNING] emergency stop callback took {latency*1000:.1f} ms")
+
+    def trigger(self, pressed_at):
+        """
+        Kill every relay and record the latency since `pressed_at` (clock.monotonic()).
+        Returns that latency in seconds.
+        """
+        self.stop()
+        latency = clock.monotonic() - pressed_at
+        self.latencies.append((clock.time(), latency))
+        if latency > self.bound:
+            self.violations += 1
+            print(f"[WARNING] emergency stop took {latency*1000:.1f} ms")
+        return latency
+
+    def stop(self):
+        """
+        Trip the stop and drive every relay HIGH, without recording a latency.
+        """
+        # set before taking the bank lock: any switch-on that gets the lock
+        # after us sees the flag and is refused
+        self.tripped.set()
+        self.relays.allOff()
+
+    def reset(self):
+        """
+        Allow relays to be switched on again.
+        """
+        self.tripped.clear()
+
+    def wait(self, timeout):
+        """
+        Sleep up to `timeout` seconds, waking immediately on a stop. True if stopped.
+        """
+        return self.tripped.wait(timeout)
+
+    def summary(self):
+        """
+        Stop latency statistics in milliseconds: press to relays off for the
+        stops trigger() timed, callback to relays off for the CANCEL edges.
+        violations counts the stops of either kind over the bound.
+        """
+        report = {"count": 0, "violations": self.violations}
+        values = [lat for _, lat in self.latencies]
+        if values:
+            report.update({
+                "count":      len(values),
+                "max_ms":     max(values) * 1000,
+                "mean_ms":    sum(values) / len(values) * 1000,
+                "last_ms":    values[-1] * 1000,
+            })
+        callbacks = [lat for _, lat in self.callbacks]
+        if callbacks:
+            report.update({
+                "callbacks":        len(callbacks),
+                "callback_max_ms":  max(callbacks) * 1000,
+                "callback_mean_ms": sum(callbacks) / len(callbacks) * 1000,
+            })
+        return report
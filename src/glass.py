@@ -0,0 +1,84 @@
+# glass.py
+"""
+Glass presence from IR beam edges.
+
+The beam pin gets a GPIO edge callback instead of being polled. Breaking the
+beam wakes whatever is waiting for a glass as soon as the level has settled
+and the scale agrees there is something on it; restoring the beam (the glass
+was pulled) pauses the pump relays straight from the callback, and they resume
+when a glass is put back. The load cell is read only on those edges.
+"""
+import RPi.GPIO as GPIO
+import clock
+
+GLASS_BOUNCE_MS = 10     # edge-detect debounce for the IR beam
+GLASS_SETTLE    = 0.05   # seconds the beam must stay broken before a glass counts
+
+
+class GlassMonitor(object):
+    def __init__(self, pin, relays, confirm = None, settle = GLASS_SETTLE):
+        """
+        pin:     IR break-beam input, LOW while a glass is in the beam
+        relays:  the RelayBank to pause while there is no glass
+        confirm: optional function() -> True if the scale sees a glass, asked once
+                 per placement
+        """
+        self.pin = pin
+        self.relays = relays
+        self.confirm = confirm
+        self.settle = settle
+        self.present = clock.Event()
+        self.edge = clock.Event()
+        self.removals = 0           # glasses pulled while they counted as present
+        self.rejected = 0           # beam broken but the scale disagreed
+
+    def arm(self):
+        """
+        Attach to both edges of the beam and start the settle worker.
+        """
+        try:
+            GPIO.remove_event_detect(self.pin)
+        except Exception:
+            pass
+        GPIO.add_event_detect(self.pin, GPIO.BOTH, callback=self._edge,
+                              bouncetime=GLASS_BOUNCE_MS)
+        clock.Thread(target=self._settler, daemon=True).start()
+        self.edge.set()             # classify whatever is there right now
+
+    def _edge(self, channel):
+        # removal acts at once, from the callback; placement is left to the worker
+        if GPIO.input(self.pin) == GPIO.HIGH:
+            self._removed()
+        self.edge.set()
+
+    def _removed(self):
+        if self.present.is_set():
+            self.removals += 1
+            self.present.clear()
+        self.relays.pause()
+
+    def _settler(self):
+        while True:
+            self.edge.wait()
+            self.edge.clear()
+            # another edge within the settle time starts the wait again
+            if self.edge.wait(self.settle):
+                continue
+            if GPIO.input(self.pin) == GPIO.HIGH:
+                self._removed()
+            elif not self.present.is_set():
+                if self.confirm is None or self.confirm():
+                    self.present.set()
+                    self.relays.resume()
+                else:
+                    self.rejected += 1
+                    print("[WARNING] IR beam broken but the scale sees no glass")
+
+    def wait(self, timeout = None):
+        """
+        Block until a glass is present, or `timeout` seconds. True if present.
+        """
+        return self.present.wait(timeout)
+
+    def isPresent(self):
+        return self.present.is_set()
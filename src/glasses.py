@@ -0,0 +1,130 @@
+# glasses.py
+"""
+Glass registry and sequential glass recognition.
+
+Every known glass is a GlassProfile: its empty weight on the scale (mean and
+variance over the times it has been seen) and how much it holds. The registry
+starts out with the two glasses the bar was built around and learns new ones
+from the Settings menu.
+
+classify() reads the scale one sample at a time and keeps a posterior over the
+profiles plus an "unknown glass" hypothesis. It stops as soon as one of them
+passes the confidence threshold, so a well-separated, often-used glass is
+recognised after one or two samples instead of a fixed burst of readings.
+"""
+import json
+import math
+import os
+
+GLASS_FILE      = "glass_profiles.json"
+SCALE_NOISE     = 3.0     # grams, standard deviation of a single reading
+MIN_GLASS_SD    = 2.0     # grams, floor on a profile's spread (glasses aren't identical)
+UNKNOWN_RANGE   = 1000.0  # grams over which an unknown glass may weigh anything
+UNKNOWN_PRIOR   = 1.0     # prior weight of "unknown", in glasses seen
+CONFIDENCE      = 0.95    # posterior needed to stop sampling
+MAX_SAMPLES     = 8       # give up (unknown) after this many readings
+DEFAULT_SEEN    = 5       # the built-in glasses start out as if seen this often
+
+# (name, empty weight g, sd g, capacity mL): bartender.py's small and large glass
+DEFAULT_GLASSES = (
+    ("Small", 66.0,  50 / 3, 35.0),
+    ("Large", 371.0, 100 / 3, 310.0),
+)
+
+
+class GlassProfile(object):
+    def __init__(self, name, weight, variance, capacity, count = 1):
+        self.name = name
+        self.weight = weight
+        self.variance = variance
+        self.capacity = capacity
+        self.count = count        # times seen: the prior, and the weight of the mean
+
+    def observe(self, grams):
+        """
+        Fold one more empty weight into the mean and variance (Welford).
+        """
+        self.count += 1
+        delta = grams - self.weight
+        self.weight += delta / self.count
+        self.variance += (delta * (grams - self.weight) - self.variance) / self.count
+        self.variance = max(self.variance, MIN_GLASS_SD ** 2)
+
+    def logLikelihood(self, mean, n):
+        """
+        log p(mean of n readings | this glass): the glass's own spread plus the
+        scale noise left after averaging n readings.
+        """
+        var = self.variance + SCALE_NOISE ** 2 / n
+        return -0.5 * (math.log(2 * math.pi * var) + (mean - self.weight) ** 2 / var)
+
+    def toDict(self):
+        return {"name": self.name, "weight": self.weight, "variance": self.variance,
+                "capacity": self.capacity, "count": self.count}
+
+
+class GlassRegistry(object):
+    def __init__(self, profiles = None, path = GLASS_FILE):
+        self.path = path
+        if profiles is None:
+            profiles = [GlassProfile(name, weight, sd ** 2, capacity, DEFAULT_SEEN)
+                        for name, weight, sd, capacity in DEFAULT_GLASSES]
+        self.profiles = profiles
+
+    @classmethod
+    def load(cls, path = GLASS_FILE):
+        """
+        The saved registry, or the default glasses if nothing has been taught yet.
+        """
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls([GlassProfile(**p) for p in json.load(f)], path)
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump([p.toDict() for p in self.profiles], f, indent=2)
+
+    def posterior(self, mean, n):
+        """
+        [(profile or None for unknown, probability)] given the mean of n readings.
+        """
+        seen = sum(p.count for p in self.profiles) + UNKNOWN_PRIOR
+        logs = [(p, math.log(p.count / seen) + p.logLikelihood(mean, n)) for p in self.profiles]
+        logs.append((None, math.log(UNKNOWN_PRIOR / seen) - math.log(UNKNOWN_RANGE)))
+        top = max(l for _, l in logs)
+        weights = [(p, math.exp(l - top)) for p, l in logs]
+        total = sum(w for _, w in weights)
+        return [(p, w / total) for p, w in weights]
+
+    def classify(self, readings, confidence = CONFIDENCE, max_samples = MAX_SAMPLES):
+        """
+        Consume weights from the `readings` iterator until one hypothesis reaches
+        `confidence`. Returns (profile or None, probability, samples used, mean grams).
+        """
+        total = 0.0
+        n = 0
+        best, prob = None, 0.0
+        for grams in readings:
+            total += grams
+            n += 1
+            best, prob = max(self.posterior(total / n, n), key=lambda pair: pair[1])
+            if prob >= confidence or n >= max_samples:
+                break
+        return best, prob, n, (total / n if n else 0.0)
+
+    def teach(self, weights, capacity, name = None):
+        """
+        Add a glass from a burst of empty weights (or refine the one that matches).
+        """
+        mean = sum(weights) / len(weights)
+        variance = sum((w - mean) ** 2 for w in weights) / len(weights)
+        known, prob, _, _ = self.classify(iter(weights))
+        if known is not None and prob >= CONFIDENCE and known.capacity == capacity:
+            for w in weights:
+                known.observe(w)
+            return known
+        profile = GlassProfile(name or f"{int(round(capacity))} mL glass", mean,
+                               max(variance, MIN_GLASS_SD ** 2), capacity)
+        self.profiles.append(profile)
+        return profile
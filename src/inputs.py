@@ -0,0 +1,88 @@
+# inputs.py
+"""
+Debounced button events from a single source.
+
+Every place that used to read GPIO.input() on the buttons directly now pulls
+events from one ButtonInput, so a press is seen exactly once no matter which
+loop happens to be running.
+"""
+import threading
+from collections import deque
+import RPi.GPIO as GPIO
+import clock
+
+# Button event names handed to menus and widgets
+CONFIRM = "confirm"
+CANCEL  = "cancel"
+NEXT    = "next"
+PREV    = "prev"
+
+DEBOUNCE_TIME = 0.03   # seconds a level must be stable before it counts
+POLL_INTERVAL = 0.01   # seconds between samples while waiting for an event
+
+
+class ButtonInput(object):
+    def __init__(self, buttons, read = None, debounce = DEBOUNCE_TIME):
+        """
+        buttons: {pin: event name}, e.g. {BTN_CONFIRM: CONFIRM, ...}
+        read:    function(pin) -> level, defaults to GPIO.input
+        """
+        self.buttons = buttons
+        self.read = read or GPIO.input
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._events = deque()
+        # debounced level, last raw level and when the raw level last changed
+        self._stable = {pin: GPIO.LOW for pin in buttons}
+        self._raw = {pin: GPIO.LOW for pin in buttons}
+        self._since = {pin: 0.0 for pin in buttons}
+
+    def poll(self):
+        """
+        Sample every button once and queue an event for each debounced LOW->HIGH edge.
+        Safe to call from any thread.
+        """
+        now = clock.monotonic()
+        with self._lock:
+            for pin, name in self.buttons.items():
+                cur = self.read(pin)
+                if cur != self._raw[pin]:
+                    self._raw[pin] = cur
+                    self._since[pin] = now
+                    continue
+                if cur != self._stable[pin] and now - self._since[pin] >= self.debounce:
+                    self._stable[pin] = cur
+                    if cur == GPIO.HIGH:
+                        self._events.append(name)
+
+    def push(self, name):
+        """
+        Inject an event as if its button had been pressed (simulator, replay).
+        """
+        with self._lock:
+            self._events.append(name)
+
+    def pop(self):
+        """
+        Return the oldest pending event, or None.
+        """
+        with self._lock:
+            return self._events.popleft() if self._events else None
+
+    def get(self, timeout = None):
+        """
+        Block until an event arrives and return it, or None after `timeout` seconds.
+        """
+        deadline = None if timeout is None else clock.monotonic() + timeout
+        while True:
+            self.poll()
+            event = self.pop()
+            if event is not None:
+                return event
+            if deadline is not None and clock.monotonic() >= deadline:
+                return None
+            clock.sleep(POLL_INTERVAL)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
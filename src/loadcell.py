@@ -0,0 +1,394 @@
+# loadcell.py
+"""
+Interrupt-driven HX711 reader.
+
+The HX711 pulls DOUT low when a conversion is ready. Instead of polling DOUT
+from Python like the hx711 driver does, HX711Reader sleeps on a GPIO falling
+edge callback and only wakes to clock the 24 data bits out, so reading at the
+chip's full 10 or 80 samples per second costs next to no CPU.
+
+HX711Reader keeps the hx711 driver's interface (reset, zero, get_raw_data_mean,
+get_weight_mean, set_scale_ratio, ...) so it can replace it anywhere, and adds
+read(), samples(), select() for channel/gain switching and stats() for read
+jitter and missed samples. With a ScaleCalibration set (scalecal.py), weights
+come from its temperature-compensated curve instead of offset / scale_ratio.
+
+HX711Bank reads several HX711s wired to one SCK pin, each on its own DOUT:
+every clock pulse shifts a bit out of all of them, so N cells are sampled in
+the time of one. Its cells are HX711Channels, each with the same driver
+interface and its own tare and scale, set up from LOADCELL_FILE:
+
+    {"sck": 16, "rate": 10,
+     "cells": {"glass":    {"dout": 4, "calibration": "scale_calibration.json"},
+               "bottle_1": {"dout": 17, "offset": 81000, "scale_ratio": 420.0}}}
+"""
+import json
+import os
+import statistics
+import threading
+from collections import deque
+import RPi.GPIO as GPIO
+import clock
+from scalecal import ScaleCalibration
+
+# Extra SCK pulses after the 24 data bits select the next conversion
+PULSES = {("A", 128): 1, ("B", 32): 2, ("A", 64): 3}
+
+HX711_RATE    = 10       # samples per second the chip's RATE pin is strapped for (10 or 80)
+READY_TIMEOUT = 0.5      # seconds to wait for DOUT to go low before giving up
+POWER_DOWN    = 0.0001   # seconds SCK is held high to power the chip down (>60 us)
+SHIFT_BUDGET  = 0.002    # a 24-bit readout slower than this may have hit power-down
+JITTER_HISTORY = 200     # sample intervals kept for stats()
+LOADCELL_FILE  = "loadcells.json"   # HX711s sharing an SCK, see HX711Bank.load()
+
+
+class HX711Weights(object):
+    """
+    The hx711 driver's interface (zero, get_weight_mean, set_scale_ratio, ...)
+    for one load cell, on top of its samples().
+    """
+    def _initWeights(self):
+        self.offset = 0.0
+        self.scale_ratio = 1.0
+        self.calibration = None
+        self._data_filter = self.outliers_filter
+
+    def zero(self, readings = 30):
+        data = self.get_raw_data_mean(readings)
+        if data is False:
+            return True
+        self.offset = data
+        if self.calibration:
+            self.calibration.tare(data)
+        return False
+
+    def getTare(self):
+        """
+        (offset, calibration shift or None): what zero() set, to restore with setTare().
+        """
+        return self.offset, (self.calibration.shift if self.calibration else None)
+
+    def setTare(self, offset, shift = None):
+        self.offset = offset
+        if self.calibration and shift is not None:
+            self.calibration.shift = shift
+
+    def get_raw_data(self, readings = 30):
+        return list(self.samples(readings))
+
+    def get_raw_data_mean(self, readings = 30):
+        data = self._data_filter(self.get_raw_data(readings))
+        if not data:
+            return False
+        return statistics.mean(data)
+
+    def get_data_mean(self, readings = 30):
+        data = self.get_raw_data_mean(readings)
+        if data is False:
+            return False
+        return data - self.offset
+
+    def get_weight_mean(self, readings = 30):
+        data = self.get_raw_data_mean(readings)
+        if data is False:
+            return False
+        return self.grams(data)
+
+    def grams(self, raw):
+        """
+        The weight of a raw reading, by the calibration or offset / scale_ratio.
+        """
+        if self.calibration:
+            return self.calibration.grams(raw)
+        return (raw - self.offset) / self.scale_ratio
+
+    def set_scale_ratio(self, ratio):
+        self.scale_ratio = ratio
+
+    def calibrated(self):
+        """
+        True if weights are grams: there is a calibration curve or a scale ratio.
+        """
+        return self.calibration is not None or self.scale_ratio != 1.0
+
+    def set_calibration(self, calibration):
+        """
+        Use a ScaleCalibration for weights (None goes back to offset / scale_ratio).
+        """
+        self.calibration = calibration
+
+    def set_data_filter(self, data_filter):
+        self._data_filter = data_filter
+
+    def outliers_filter(self, data, limit = 3.0):
+        """
+        Drop readings more than `limit` median absolute deviations from the median.
+        """
+        if len(data) < 3:
+            return data
+        median = statistics.median(data)
+        spread = statistics.median(abs(x - median) for x in data) or 1
+        return [x for x in data if abs(x - median) / spread <= limit]
+
+
+class HX711Bank(object):
+    def __init__(self, dout_pins, pd_sck_pin, gain_channel_A = 128, select_channel = 'A',
+                 rate = HX711_RATE):
+        """
+        HX711s clocked together: one SCK, a DOUT each. They must be strapped to
+        the same rate; gain and channel are shared too (the pulses are).
+        """
+        self.douts = list(dout_pins)
+        self.sck = pd_sck_pin
+        self.period = 1.0 / rate
+        self.lock = threading.Lock()
+        self.ready = clock.Event()
+        self.channels = {}          # name -> HX711Channel, when built by load()
+        self.frame = None           # the last conversion of every chip
+        self.frames = 0             # how many frames read() has returned
+
+        # read statistics
+        self.count = 0
+        self.missed = 0
+        self.timeouts = 0
+        self.glitches = 0
+        self.intervals = deque(maxlen=JITTER_HISTORY)
+        self.last_at = None
+
+        GPIO.setup(self.sck, GPIO.OUT, initial=GPIO.LOW)
+        for dout in self.douts:
+            GPIO.setup(dout, GPIO.IN)
+            try:
+                GPIO.remove_event_detect(dout)
+            except Exception:
+                pass
+            GPIO.add_event_detect(dout, GPIO.FALLING, callback=self._ready)
+        self.select(select_channel, gain_channel_A if select_channel == 'A' else 32)
+
+    @classmethod
+    def load(cls, path = LOADCELL_FILE):
+        """
+        The bank of cells configured in `path` (see the module docstring), each
+        with its tare and scale, or None if there is no such file.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            config = json.load(f)
+        cells = config["cells"]
+        bank = cls([c["dout"] for c in cells.values()], config["sck"],
+                   gain_channel_A=config.get("gain", 128), rate=config.get("rate", HX711_RATE))
+        for index, (name, c) in enumerate(cells.items()):
+            cell = HX711Channel(bank, index)
+            cell.setTare(c.get("offset", 0.0))
+            cell.set_scale_ratio(c.get("scale_ratio", 1.0))
+            if "calibration" in c:
+                cell.set_calibration(ScaleCalibration.load(c["calibration"]))
+            bank.channels[name] = cell
+        return bank
+
+    def _ready(self, channel):
+        self.ready.set()
+
+    def select(self, channel = 'A', gain = 128):
+        """
+        Use `channel` ('A' or 'B') at `gain` (A: 128 or 64, B: 32) from the next
+        conversion on; the sample already converting is read and thrown away.
+        """
+        if (channel, gain) not in PULSES:
+            raise ValueError(f"HX711 has no channel {channel} at gain {gain}")
+        self.channel = channel
+        self.gain = gain
+        self.pulses = PULSES[(channel, gain)]
+        self.stale = True
+
+    def reset(self):
+        """
+        Power-cycle the chips (back to channel A / 128 inside them, and converting
+        in step again) and re-apply the selected channel and gain. Returns False
+        on success, like the hx711 driver.
+        """
+        with self.lock:
+            GPIO.output(self.sck, GPIO.HIGH)
+            clock.sleep(POWER_DOWN)
+            GPIO.output(self.sck, GPIO.LOW)
+            self.stale = True
+        return self.read() is None
+
+    def read(self, timeout = READY_TIMEOUT):
+        """
+        Wait for the next conversion of every chip and return them as signed
+        24-bit counts in dout_pins order, or None if one didn't come within
+        `timeout` seconds. A caller that had to wait for another's read gets
+        that frame: it is as new as they come.
+        """
+        frames = self.frames
+        with self.lock:
+            if self.frames != frames:
+                return self.frame
+            while True:
+                frame = self._next(timeout)
+                if frame is None or not self.stale:
+                    break
+                self.stale = False
+            if frame is not None:
+                self.frame = frame
+                self.frames += 1
+            return frame
+
+    def _next(self, timeout):
+        deadline = clock.monotonic() + timeout
+        douts = self.douts
+        while True:
+            # every chip has to be ready: they clock out together
+            while any(GPIO.input(dout) != GPIO.LOW for dout in douts):
+                self.ready.clear()
+                # the last DOUT may have fallen between the check and the clear
+                if all(GPIO.input(dout) == GPIO.LOW for dout in douts):
+                    break
+                remaining = deadline - clock.monotonic()
+                if remaining <= 0 or not self.ready.wait(remaining):
+                    self.timeouts += 1
+                    return None
+
+            at = clock.monotonic()
+            frame = self._shift()
+            if clock.monotonic() - at <= SHIFT_BUDGET * len(douts):
+                break
+            # SCK may have stayed high past 60 us and powered the chips down,
+            # which also puts them back on channel A / 128
+            self.glitches += 1
+            self.last_at = None
+            self.stale = True
+
+        if self.last_at is not None:
+            interval = at - self.last_at
+            self.intervals.append(interval)
+            if interval > 1.5 * self.period:
+                self.missed += round(interval / self.period) - 1
+        self.last_at = at
+        self.count += 1
+        return frame
+
+    def _shift(self):
+        # everything local: SCK must not stay high for 60 us, so DOUTs are
+        # read with it low, after each pulse
+        output, input_, sck, douts = GPIO.output, GPIO.input, self.sck, self.douts
+        high, low = GPIO.HIGH, GPIO.LOW
+        words = [0] * len(douts)
+        for _ in range(24):
+            output(sck, high)
+            output(sck, low)
+            words = [(w << 1) | input_(dout) for w, dout in zip(words, douts)]
+        for _ in range(self.pulses):
+            output(sck, high)
+            output(sck, low)
+        return [w - (1 << 24) if w & 0x800000 else w for w in words]
+
+    def samples(self, count = None):
+        """
+        Yield consecutive conversions as they arrive, `count` of them (or forever),
+        stopping early if the chips stop answering.
+        """
+        self.last_at = None
+        n = 0
+        while count is None or n < count:
+            value = self.read()
+            if value is None:
+                return
+            n += 1
+            yield value
+
+    def weights(self, readings = 5):
+        """
+        {cell name: grams, False if it couldn't be read} for every cell, all
+        from the same `readings` frames.
+        """
+        frames = list(self.samples(readings))
+        weights = {}
+        for name, cell in self.channels.items():
+            data = cell._data_filter([frame[cell.index] for frame in frames])
+            weights[name] = cell.grams(statistics.mean(data)) if data else False
+        return weights
+
+    def stats(self):
+        """
+        Read statistics; intervals are only measured between back-to-back reads.
+        """
+        intervals = list(self.intervals)
+        report = {
+            "samples":  self.count,
+            "missed":   self.missed,
+            "timeouts": self.timeouts,
+            "glitches": self.glitches,
+            "rate_sps": 1.0 / self.period,
+        }
+        if len(intervals) > 1:
+            report["mean_interval_ms"] = statistics.mean(intervals) * 1000
+            report["jitter_ms"] = statistics.stdev(intervals) * 1000
+            report["max_late_ms"] = max(0.0, max(intervals) - self.period) * 1000
+        return report
+
+
+class HX711Reader(HX711Bank, HX711Weights):
+    """
+    A single HX711 on its own SCK: a bank of one, read as plain counts.
+    """
+    def __init__(self, dout_pin, pd_sck_pin, gain_channel_A = 128, select_channel = 'A',
+                 rate = HX711_RATE):
+        self.dout = dout_pin
+        self._initWeights()
+        HX711Bank.__init__(self, [dout_pin], pd_sck_pin, gain_channel_A, select_channel, rate)
+
+    def read(self, timeout = READY_TIMEOUT):
+        """
+        Wait for the next conversion and return it as a signed 24-bit count,
+        or None if none came within `timeout` seconds.
+        """
+        frame = HX711Bank.read(self, timeout)
+        return None if frame is None else frame[0]
+
+    def _shift(self):
+        # one DOUT: no per-bit list to build
+        output, input_, sck, dout = GPIO.output, GPIO.input, self.sck, self.dout
+        high, low = GPIO.HIGH, GPIO.LOW
+        value = 0
+        for _ in range(24):
+            output(sck, high)
+            output(sck, low)
+            value = (value << 1) | input_(dout)
+        for _ in range(self.pulses):
+            output(sck, high)
+            output(sck, low)
+        if value & 0x800000:
+            value -= 1 << 24
+        return [value]
+
+
+class HX711Channel(HX711Weights):
+    """
+    One cell of an HX711Bank, with its own tare and scale. Reading it reads
+    the whole bank; cells read at the same time share the frames.
+    """
+    def __init__(self, bank, index):
+        self.bank = bank
+        self.index = index
+        self.dout = bank.douts[index]
+        self._initWeights()
+
+    def read(self, timeout = READY_TIMEOUT):
+        frame = self.bank.read(timeout)
+        return None if frame is None else frame[self.index]
+
+    def samples(self, count = None):
+        for frame in self.bank.samples(count):
+            yield frame[self.index]
+
+    def reset(self):
+        return self.bank.reset()
+
+    def select(self, channel = 'A', gain = 128):
+        self.bank.select(channel, gain)
+
+    def stats(self):
+        return self.bank.stats()
@@ -0,0 +1,199 @@
+# loadout.py
+"""
+Which bottles to put on the pumps.
+
+bestLoadout() picks the set of ingredients, at most one per pump, that makes
+the most drinks available, each drink counting 1 plus how often it has been
+ordered lately (from OrderHistory). It is an exact branch-and-bound over
+ingredient bitsets:
+
+  - every drink becomes a bitmask of its ingredients; drinks with the same
+    mask are merged (their weights add), so a catalog of thousands of recipes
+    over a few dozen ingredients is a few hundred masks at most
+  - ingredients are decided one at a time, the most valuable first, taking
+    each before leaving it out, so the first leaf reached is already a good
+    loadout
+  - a branch is cut as soon as the most it could still make can't beat the
+    best found (see bound() for how that is over-estimated cheaply)
+
+applyLoadout() then moves as few bottles as possible to get there.
+"""
+import heapq
+import json
+import os
+import clock
+
+HISTORY_FILE   = "drink_orders.json"
+HALF_LIFE      = 14 * 24 * 3600   # seconds for an order to count half as much
+ORDER_WEIGHT   = 1.0              # what one recent order adds to a drink's weight
+SEARCH_NODES   = 200              # branches explored before settling for the best so far
+
+
+class OrderHistory(object):
+    def __init__(self, orders = None, path = HISTORY_FILE):
+        """
+        orders: {drink name: [order count, time of the count]}, the count decayed
+        with HALF_LIFE up to that time.
+        path:   where save() writes, None to keep it in memory only.
+        """
+        self.orders = orders or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path = HISTORY_FILE):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls(json.load(f), path)
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.orders, f, indent=2)
+
+    def count(self, drink, now = None):
+        """
+        Recent orders of `drink`: every order counts 1, halving every HALF_LIFE.
+        """
+        if drink not in self.orders:
+            return 0.0
+        count, at = self.orders[drink]
+        now = clock.time() if now is None else now
+        return count * 0.5 ** (max(now - at, 0.0) / HALF_LIFE)
+
+    def record(self, drink, when = None):
+        when = clock.time() if when is None else when
+        self.orders[drink] = [self.count(drink, when) + 1.0, when]
+
+    def weights(self, drink_list, now = None):
+        """
+        {drink name: 1 + ORDER_WEIGHT * recent orders}, the value of making it available.
+        """
+        return {d['name']: 1.0 + ORDER_WEIGHT * self.count(d['name'], now) for d in drink_list}
+
+
+def bestLoadout(drink_list, pumps, options = None, weights = None, max_nodes = SEARCH_NODES):
+    """
+    The ingredients to load on `pumps` pumps that make the most (weighted) drinks.
+
+    options: ingredients there are bottles for (default: any a drink uses)
+    weights: {drink name: value}, default 1 for every drink
+    max_nodes: search budget; real menus finish well inside it, an unstructured
+               catalog returns the best loadout found by then
+
+    returns (set of ingredients, total weight of the drinks they make)
+    """
+    # drinks as ingredient sets, merged when they need exactly the same ones
+    needs = {}
+    for d in drink_list:
+        ings = frozenset(d['ingredients'])
+        if len(ings) > pumps or (options is not None and not ings <= options):
+            continue
+        w = weights.get(d['name'], 1.0) if weights else 1.0
+        needs[ings] = needs.get(ings, 0.0) + w
+    if not needs:
+        return set(), 0.0
+
+    # most valuable ingredients get the lowest bits and are decided first
+    value = {}
+    for ings, w in needs.items():
+        for ing in ings:
+            value[ing] = value.get(ing, 0.0) + w
+    order = sorted(value, key=lambda ing: (-value[ing], ing))
+    index = {ing: i for i, ing in enumerate(order)}
+    groups = []
+    for ings, w in needs.items():
+        idx = tuple(sorted(index[ing] for ing in ings))
+        mask = 0
+        for i in idx:
+            mask |= 1 << i
+        groups.append((mask, w, idx))
+    # a drink is settled once the last of its ingredients has been decided
+    settled = [[] for _ in order]
+    for mask, w, idx in groups:
+        settled[idx[-1]].append((mask, w))
+
+    def bound(chosen, slots, alive):
+        # Each drink still missing m ingredients is made only if all m get loaded.
+        # An ingredient on its own is credited the drinks it alone completes;
+        # every other drink credits each pair of its missing ingredients with
+        # w / (m (m - 1)), so loading one plus its partners recovers w exactly.
+        # An ingredient can have at most slots - 1 partners loaded, so it is
+        # worth no more than its own credit plus its best slots - 1 pair credits,
+        # and at most `slots` ingredients are loaded.
+        n = len(order)
+        own = [0.0] * n
+        pair = [0.0] * (n * n)
+        for mask, w, ings in alive:
+            missing = [i for i in ings if not chosen >> i & 1]
+            m = len(missing)
+            if m == 1:
+                own[missing[0]] += w
+                continue
+            part = w / (m * (m - 1))
+            for a in missing:
+                row = a * n
+                for b in missing:
+                    if b != a:
+                        pair[row + b] += part
+        worth = [own[a] + sum(heapq.nlargest(slots - 1, pair[a * n:(a + 1) * n]))
+                 for a in range(n)]
+        return sum(heapq.nlargest(slots, worth))
+
+    best = [0.0, 0]
+    budget = [max_nodes]
+
+    def search(i, chosen, slots, made, alive):
+        # alive: drinks still makeable, those not settled before ingredient i
+        if made > best[0]:
+            best[0], best[1] = made, chosen
+        if slots == 0 or i == len(order) or budget[0] <= 0:
+            return
+        budget[0] -= 1
+        if slots == 1:
+            # the last pump: just the ingredient that completes the most
+            gain = {}
+            for mask, w, ings in alive:
+                missing = mask & ~chosen
+                if missing & (missing - 1) == 0:
+                    gain[missing] = gain.get(missing, 0.0) + w
+            if gain:
+                last = max(gain, key=gain.get)
+                if made + gain[last] > best[0]:
+                    best[0], best[1] = made + gain[last], chosen | last
+            return
+        if made + bound(chosen, slots, alive) <= best[0]:
+            return
+        b = 1 << i
+        taken = chosen | b
+        gain = sum(w for mask, w in settled[i] if mask & ~taken == 0)
+        search(i + 1, taken, slots - 1, made + gain,
+               [g for g in alive if g[2][-1] > i and bin(g[0] & ~taken).count('1') < slots])
+        search(i + 1, chosen, slots, made,
+               [g for g in alive if not g[0] & b])
+
+    search(0, 0, pumps, 0.0, groups)
+    return {ing for i, ing in enumerate(order) if best[1] >> i & 1}, best[0]
+
+
+def applyLoadout(pump_configuration, ingredients):
+    """
+    Put `ingredients` on the pumps, leaving every bottle that is already on a
+    pump where it is. Returns the keys of the pumps that got a new bottle.
+    """
+    wanted = set(ingredients)
+    kept = {p['value'] for p in pump_configuration.values()} & wanted
+    missing = sorted(wanted - kept)
+    changed = []
+    seen = set()
+    for key in sorted(pump_configuration):
+        p = pump_configuration[key]
+        if p['value'] in kept and p['value'] not in seen:
+            seen.add(p['value'])
+            continue
+        if not missing:
+            continue
+        p['value'] = missing.pop(0)
+        changed.append(key)
+    return changed
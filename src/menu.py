@@ -1,16 +1,51 @@
 # menu.py
+from search import DrinkTrie, normalize
+
+# Special entries on the search letter picker (letters are plain strings)
+SEARCH_SHOW   = "show"     # open the ranked results submenu
+SEARCH_JUMP   = "jump"     # leave search and jump to the first name with the query
+SEARCH_DELETE = "delete"   # drop the last letter of the query
+SEARCH_EXIT   = "exit"     # leave search without changing the menu
+
+# Menu entries are slotted: a large catalog puts one on the menu per drink
 class MenuItem(object):
+	__slots__ = ("type", "name", "attributes", "visible")
+
 	def __init__(self, type, name, attributes = None, visible = True):
 		self.type = type
 		self.name = name
 		self.attributes = attributes
 		self.visible = visible
 
+class DrinkItem(MenuItem):
+	"""
+	A drink on the menu: its recipe stays packed in a Catalog (catalog.py)
+	and is only unpacked when asked for.
+	"""
+	__slots__ = ("catalog", "index")
+
+	def __init__(self, catalog, index, visible = True):
+		MenuItem.__init__(self, "drink", catalog.names[index], None, visible)
+		self.catalog = catalog
+		self.index = index
+
+	@property
+	def ingredients(self):
+		return self.catalog.recipe(self.index)
+
+	@property
+	def mask(self):
+		return self.catalog.masks[self.index]
+
 class Back(MenuItem):
+	__slots__ = ()
+
 	def __init__(self, name):
 		MenuItem.__init__(self, "back", name)
 
 class Menu(MenuItem):
+	__slots__ = ("options", "selectedOption", "parent")
+
 	def __init__(self, name, attributes = None, visible = True):
 		MenuItem.__init__(self, "menu", name, attributes, visible)
 		self.options = []
@@ -31,14 +66,28 @@ class Menu(MenuItem):
 	def nextSelection(self):
 		self.selectedOption = (self.selectedOption + 1) % len(self.options)
 
+	def previousSelection(self):
+		self.selectedOption = (self.selectedOption - 1) % len(self.options)
+
 	def getSelection(self):
 		return self.options[self.selectedOption]
 
 class MenuContext(object):
-	def __init__(self, menu, delegate):
+	def __init__(self, menu, delegate, searchAliases = None):
 		self.topLevelMenu = menu
 		self.currentMenu = menu
 		self.delegate = delegate
+
+		# search mode state, see startSearch()
+		self.searchAliases = searchAliases
+		self.searchIndex = None
+		self.searchMenu = None
+		self.searchAvailable = None
+		self.searching = False
+		self.searchQuery = ""
+		self.searchChoices = []
+		self.searchChoice = 0
+
 		self.showMenu()
 
 	def showMenu(self):
@@ -76,6 +125,10 @@ class MenuContext(object):
 
 		raises ValueError if all options are visible==False
 		"""
+		if (self.searching):
+			self.searchChoice = (self.searchChoice + 1) % len(self.searchChoices)
+			self.displaySearch()
+			return
 		for i in self.currentMenu.options:
 			self.currentMenu.nextSelection()
 			selection = self.currentMenu.getSelection()
@@ -84,6 +137,44 @@ class MenuContext(object):
 				return
 		raise ValueError("At least one option in a menu must be visible!")
 
+	def retreat(self):
+		"""
+		Moves the displayed menu to the previous visible option
+
+		raises ValueError if all options are visible==False
+		"""
+		if (self.searching):
+			self.searchChoice = (self.searchChoice - 1) % len(self.searchChoices)
+			self.displaySearch()
+			return
+		for i in self.currentMenu.options:
+			self.currentMenu.previousSelection()
+			selection = self.currentMenu.getSelection()
+			if (selection.visible):
+				self.display(selection)
+				return
+		raise ValueError("At least one option in a menu must be visible!")
+
+	def jumpTo(self, prefix):
+		"""
+		Alphabetical jump: moves the current menu to the next visible option whose
+		name starts with `prefix` (ignoring case and punctuation), wrapping around.
+
+		returns False if no option matches
+		"""
+		target = "".join(normalize(prefix))
+		menu = self.currentMenu
+		count = len(menu.options)
+		for step in range(1, count + 1):
+			i = (menu.selectedOption + step) % count
+			option = menu.options[i]
+			if (option.visible and "".join(normalize(option.name)).startswith(target)):
+				menu.selectedOption = i
+				self.display(option)
+				return True
+		self.showMenu()
+		return False
+
 	def select(self):
 		"""
 		Selects the current menu option. Calls menuItemClicked first. If it returns false,
@@ -98,6 +189,9 @@ class MenuContext(object):
 		throws ValueError if navigating back on a top-level menu
 
 		"""
+		if (self.searching):
+			self.searchSelect()
+			return
 		selection = self.currentMenu.getSelection()
 		if (not self.delegate.menuItemClicked(selection)):
 			if (selection.type is "menu"):
@@ -106,9 +200,93 @@ class MenuContext(object):
 				if (not self.currentMenu.parent):
 					raise ValueError("Cannot navigate back when parent is None")
 				self.setMenu(self.currentMenu.parent)
+			elif (selection.type == "search"):
+				self.startSearch()
 		else:
 			self.display(self.currentMenu.getSelection())
 
+	def startSearch(self):
+		"""
+		Enters type-ahead search over the drinks in the current menu and its submenus.
+		advance/retreat cycle the letter picker and select takes the highlighted entry.
+		Only letters that lead to a drink that can be made right now are offered.
+		"""
+		menu = self.currentMenu
+		if (self.searchIndex is None or self.searchMenu is not menu):
+			self.searchIndex = DrinkTrie(self.searchAliases)
+			self.searchIndex.addAll(self._drinks(menu))
+			self.searchMenu = menu
+
+		self.delegate.prepareForRender(self.topLevelMenu)
+		self.searchAvailable = set(
+			i for i, item in enumerate(self.searchIndex.items)
+			if self.delegate.isAvailable(item)
+		)
+		self.searching = True
+		self.searchQuery = ""
+		self._refreshSearch()
+
+	def stopSearch(self):
+		self.searching = False
+		self.searchQuery = ""
+
+	def searchSelect(self):
+		"""
+		Applies the highlighted search picker entry.
+		"""
+		choice = self.searchChoices[self.searchChoice]
+		if (choice == SEARCH_DELETE):
+			self.searchQuery = self.searchQuery[:-1]
+			self._refreshSearch()
+		elif (choice == SEARCH_SHOW):
+			matches = self.searchIndex.search(self.searchQuery, self.searchAvailable)
+			results = Menu("Results")
+			results.addOptions(matches)
+			results.addOption(Back("Back"))
+			results.setParent(self.searchMenu)
+			self.stopSearch()
+			self.setMenu(results)
+		elif (choice == SEARCH_JUMP):
+			query = self.searchQuery
+			self.stopSearch()
+			self.jumpTo(query)
+		elif (choice == SEARCH_EXIT):
+			self.stopSearch()
+			self.showMenu()
+		else:
+			self.searchQuery += choice
+			self._refreshSearch()
+
+	def displaySearch(self):
+		"""
+		Tells the delegate to draw the search picker. `matches` previews the query
+		extended by the highlighted letter, so results update as the picker moves.
+		"""
+		choice = self.searchChoices[self.searchChoice]
+		query = self.searchQuery
+		if (len(choice) == 1):
+			query += choice
+		matches = self.searchIndex.search(query, self.searchAvailable)
+		self.delegate.displaySearch(self.searchQuery, choice, matches)
+
+	def _refreshSearch(self):
+		letters = self.searchIndex.nextLetters(self.searchQuery, self.searchAvailable)
+		if (self.searchQuery):
+			self.searchChoices = [SEARCH_SHOW] + letters + [SEARCH_JUMP, SEARCH_DELETE, SEARCH_EXIT]
+		else:
+			self.searchChoices = letters + [SEARCH_EXIT]
+		self.searchChoice = 0
+		self.displaySearch()
+
+	def _drinks(self, menu):
+		drinks = []
+		for item in menu.options:
+			if (item.type == "drink"):
+				drinks.append(item)
+			elif (item.type == "menu"):
+				drinks.extend(self._drinks(item))
+		return drinks
+
 class MenuDelegate(object):
 	def prepareForRender(self, menu): 
 		"""
@@ -127,3 +305,16 @@ class MenuDelegate(object):
 		Called when the menu item should be displayed.
 		"""
 		raise NotImplementedError
+
+	def isAvailable(self, menuItem):
+		"""
+		Called by search to decide whether a drink can be made right now. Defaults to its visibility.
+		"""
+		return menuItem.visible
+
+	def displaySearch(self, query, choice, matches):
+		"""
+		Called when the search picker should be displayed. `choice` is a letter or one of the
+		SEARCH_* entries, `matches` the ranked drinks for the query plus the highlighted letter.
+		"""
+		raise NotImplementedError
@@ -0,0 +1,86 @@
+# priming.py
+"""
+Which pump lines are primed, kept across restarts.
+
+Every pump is in one of four states:
+
+    primed    the line is full of its ingredient, ready to pour
+    dry       never primed (or nothing known about it): the tube is full of air
+    drained   just cleaned: the tube is full of water
+    swapped   a new bottle (or a different ingredient) is on the pump
+
+primeSchedule() turns the states into relay times: primed lines are skipped,
+the others run together, each long enough to push its own line volume
+(times PRIME_VOLUMES for its state) through at its own calibrated flow. The
+state is saved in prime_state.json, so a restart in the middle of service
+finds every line still primed and primes nothing.
+"""
+import json
+import os
+from recipes import flowRate
+from usage import lineVolume
+
+PRIME_FILE = "prime_state.json"
+
+PRIMED  = "primed"
+DRY     = "dry"
+DRAINED = "drained"
+SWAPPED = "swapped"
+
+# Line volumes to pump for each state before the line is primed
+PRIME_VOLUMES = {
+    DRY:     1.5,     # fill the tube, with some margin for air pockets
+    DRAINED: 1.5,     # push the water out until it runs undiluted
+    SWAPPED: 1.0,     # clear the air (or old ingredient) at the inlet
+}
+
+
+class PrimeState(object):
+    def __init__(self, states = None, path = PRIME_FILE):
+        """
+        states: {pump key: state}; pumps missing from it are dry.
+        path:   where save() writes, None to keep it in memory only.
+        """
+        self.states = states or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path = PRIME_FILE):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls(json.load(f), path)
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.states, f, indent=2)
+
+    def state(self, key):
+        return self.states.get(key, DRY)
+
+    def mark(self, keys, state):
+        for key in keys:
+            self.states[key] = state
+
+    def primeSchedule(self, pump_configuration, flow_rate):
+        """
+        Relay times for the lines that need priming, in the same shape as
+        recipes.pumpSchedule.
+
+        returns (schedule {pin: seconds}, dispenses [(mL, seconds), ...], keys primed)
+        """
+        schedule = {}
+        dispenses = []
+        keys = []
+        for key, p in pump_configuration.items():
+            state = self.state(key)
+            if state == PRIMED:
+                continue
+            ml = PRIME_VOLUMES[state] * lineVolume(p)
+            t = ml * flowRate(p, flow_rate)
+            schedule[p["pin"]] = t
+            dispenses.append((ml, t))
+            keys.append(key)
+        return schedule, dispenses, keys
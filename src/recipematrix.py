@@ -0,0 +1,95 @@
+# recipematrix.py
+"""
+The whole catalog's recipe maths as NumPy matrix operations.
+
+RecipeMatrix turns a Catalog (catalog.py) into a drinks x ingredients matrix
+of volumes plus an alcohol mask over the ingredient columns. Each row is split
+once into its spirit and mixer shares, so scaling every drink to a glass size
+and strength is one multiply, and "which drinks can be made with these bottles
+and this much left in them" is a couple of boolean reductions. Only the shares
+and which ingredients each drink uses are kept, five bytes per cell.
+
+A single order is a row of the same result: scaleRow() gives what
+recipes.scaleRecipe() does for that drink, to float32 precision.
+
+NumPy is optional; without it `np` is None and the bartender keeps using
+recipes.scaleRecipe() one order at a time.
+"""
+from recipes import ALCOHOLS, MAX_ALC_FRACTION
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LEVEL_SLACK = 1e-3      # mL a bottle may come up short and still count as enough
+
+
+class RecipeMatrix(object):
+    def __init__(self, catalog):
+        self.catalog = catalog
+        n, m = len(catalog), len(catalog.ingredients)
+        counts = np.diff(np.frombuffer(catalog.offsets, dtype=np.uint32))
+        rows = np.repeat(np.arange(n), counts)
+        cols = np.frombuffer(catalog.ids, dtype=np.uint16)
+
+        volumes = np.zeros((n, m), dtype=np.float32)           # mL as written in the recipe
+        volumes[rows, cols] = np.frombuffer(catalog.amounts, dtype=np.float32)
+        self.uses = np.zeros((n, m), dtype=bool)               # recipe calls for it (even 0 mL)
+        self.uses[rows, cols] = True
+        self.alcohol = np.array([ing in ALCOHOLS for ing in catalog.ingredients], dtype=bool)
+
+        # each ingredient's share of its drink's spirits, or of its mixers
+        # (which one is told by the alcohol mask, so one matrix holds both)
+        alc_total = (volumes * self.alcohol).sum(axis=1, keepdims=True)
+        mix_total = (volumes * ~self.alcohol).sum(axis=1, keepdims=True)
+        total = np.where(self.alcohol, alc_total, mix_total)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.share = np.where(total > 0, volumes / total, 0.0).astype(np.float32)
+
+    def vector(self, amounts, default = 0.0):
+        """
+        A per-ingredient column vector from {value: amount} (missing ones get `default`).
+        """
+        v = np.full(len(self.catalog.ingredients), default, dtype=np.float32)
+        for value, amount in amounts.items():
+            col = self.catalog.lookup(value)
+            if col is not None:
+                v[col] = amount
+        return v
+
+    def scaled(self, glass_vol, strength):
+        """
+        mL of every ingredient for every drink (drinks x ingredients), each drink
+        scaled to `glass_vol` at `strength` 1-5 like recipes.scaleRecipe(). Either
+        may also be an array with one value per drink.
+        """
+        glass_vol = np.asarray(glass_vol, dtype=np.float32).reshape(-1, 1)
+        strength = np.asarray(strength, dtype=np.float32).reshape(-1, 1)
+        target_alc = (strength - 1) / 4 * glass_vol * MAX_ALC_FRACTION
+        target_mix = glass_vol - target_alc
+        return self.share * np.where(self.alcohol, target_alc, target_mix)
+
+    def scaleRow(self, index, glass_vol, strength):
+        """
+        One drink's scaled recipe as {value: mL}: the single-order path.
+        """
+        target_alc = (strength - 1) / 4 * glass_vol * MAX_ALC_FRACTION
+        target_mix = glass_vol - target_alc
+        row = self.share[index] * np.where(self.alcohol, target_alc, target_mix)
+        cols = np.flatnonzero(self.uses[index])
+        return {self.catalog.ingredients[c]: float(row[c]) for c in cols}
+
+    def available(self, loaded, levels = None, glass_vol = None, strength = None):
+        """
+        Boolean vector over the drinks: every ingredient is in `loaded` (the
+        values on the pumps) and, given `levels` ({value: mL left}), there is
+        enough of each for one drink of `glass_vol` at `strength`.
+        """
+        on_pump = self.vector({value: 1.0 for value in loaded}) > 0
+        ok = ~(self.uses & ~on_pump).any(axis=1)
+        if levels is not None:
+            left = self.vector(levels, default=np.inf)
+            need = self.scaled(glass_vol, strength)
+            ok &= (need <= left + LEVEL_SLACK).all(axis=1)
+        return ok
@@ -0,0 +1,81 @@
+# recipes.py
+"""
+Recipe maths shared by the bartender, benchmarks and simulators.
+"""
+
+#ALCOHOLIC INGREDIENTS
+ALCOHOLS = {"gin", "rum", "vodka", "tequila"}
+
+#MIXERS THAT LEAVE SUGAR IN THE LINES
+SUGARY = {"tonic", "coke", "oj", "mmix"}
+
+# Strength 5 fills this fraction of the glass with spirits (100 mL in 250 mL)
+MAX_ALC_FRACTION = 100.0 / 250.0
+
+
+def scaleRecipe(ingredients, glass_vol, strength):
+    """
+    Scale a recipe ({ingredient: mL}) to fill `glass_vol` mL at `strength` 1-5.
+    Spirits share the alcohol volume for the strength in the recipe's proportions,
+    mixers share the rest.
+    """
+    target_alc_vol = (strength - 1)/4 * glass_vol * MAX_ALC_FRACTION
+    target_mix_vol = glass_vol - target_alc_vol
+
+    alc_total = sum(v for k, v in ingredients.items() if k in ALCOHOLS)
+    mix_total = sum(v for k, v in ingredients.items() if k not in ALCOHOLS)
+
+    scaled = {}
+    for ing, vol in ingredients.items():
+        if ing in ALCOHOLS:
+            scaled[ing] = (vol/alc_total)*target_alc_vol if alc_total else 0.0
+        else:
+            scaled[ing] = (vol/mix_total)*target_mix_vol if mix_total else 0.0
+    return scaled
+
+
+def flowRate(pump, flow_rate):
+    """
+    Seconds per mL for a pump: its calibrated "flow_rate" in pump_config.json
+    (calibrate_pump.py), else the shared `flow_rate`.
+    """
+    return pump.get("flow_rate", flow_rate)
+
+
+def pumpSchedule(scaled, pump_configuration, flow_rate):
+    """
+    Turn scaled volumes into relay times for the pumps holding each ingredient.
+
+    returns (schedule {pin: seconds}, dispenses [(mL, seconds), ...])
+    """
+    schedule  = {}
+    dispenses = []
+    for ing, vol in scaled.items():
+        for p in pump_configuration.values():
+            if ing == p["value"]:
+                t = vol * flowRate(p, flow_rate)
+                if t <= 0:
+                    continue
+                dispenses.append((vol, t))
+                schedule[p["pin"]] = t
+    return schedule, dispenses
+
+
+def pourTime(schedule, volumes, delivered):
+    """
+    How long into a parallel pour ({pin: seconds} with matching mL `volumes`)
+    `delivered` mL had come out, each pump pouring at a steady rate.
+    """
+    times = list(schedule.values())
+    def poured(t):
+        return sum(v * min(t, ti) / ti for v, ti in zip(volumes, times) if ti > 0)
+    lo, hi = 0.0, max(times, default=0.0)
+    if delivered >= poured(hi):
+        return hi
+    for _ in range(40):
+        mid = (lo + hi) / 2
+        if poured(mid) < delivered:
+            lo = mid
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,157 @@
+# relays.py
+"""
+The pump relays as one bank.
+
+Every change to the relays is a single GPIO.output() call with the full list of
+pump pins and their levels, so pumps that start or stop together switch within
+microseconds of each other instead of one Python loop iteration apart. That
+keeps ingredient ratios honest and avoids stacking the motors' inrush current.
+
+The bank can also be paused (the glass was taken away): running pumps go off in
+one write and any run() in progress holds its remaining times until resume().
+"""
+import threading
+import RPi.GPIO as GPIO
+import clock
+
+# Pumps due to stop within this many seconds of each other stop in one write
+COALESCE_TIME = 0.005
+# How often a paused run checks whether it has been resumed or stopped
+PAUSE_POLL = 0.02
+# A stop time closer than this counts as reached (a virtual clock can't step smaller)
+DUE_SLACK = 1e-6
+
+
+class RelayBank(object):
+    def __init__(self, pins, guard = None):
+        """
+        pins:  relay pin of every pump (relays are active LOW)
+        guard: optional function() -> True while switching pumps on is forbidden
+               (the emergency stop); checked under the bank lock
+        """
+        self.pins = list(pins)
+        self.guard = guard
+        self.lock = threading.Lock()
+        self.on = set()
+        self.held = None            # pins to switch back on at resume(), None if not paused
+        self.paused_at = 0.0
+        self.paused_total = 0.0     # seconds spent paused, for run() schedules
+
+    @property
+    def paused(self):
+        return self.held is not None
+
+    def _write(self):
+        GPIO.output(self.pins, [GPIO.LOW if pin in self.on else GPIO.HIGH
+                                for pin in self.pins])
+
+    def switch(self, on = (), off = ()):
+        """
+        Switch pins `on` and `off` in a single write. Returns False, and changes
+        nothing, if pins were to be switched on while the guard forbids it.
+        """
+        with self.lock:
+            if on and self.guard and self.guard():
+                return False
+            if self.held is not None:
+                # paused: remember what should be on, keep the relays off
+                self.held.difference_update(off)
+                self.held.update(on)
+                return True
+            self.on.difference_update(off)
+            self.on.update(on)
+            self._write()
+            return True
+
+    def allOff(self):
+        with self.lock:
+            self.on.clear()
+            if self.held is not None:
+                self.held.clear()
+            self._write()
+
+    def pause(self):
+        """
+        Switch off every running pump until resume(), in one write. Runs in
+        progress stand still for the pause and finish their times afterwards.
+        """
+        with self.lock:
+            if self.held is not None:
+                return
+            self.held = set(self.on)
+            self.paused_at = clock.monotonic()
+            self.on.clear()
+            self._write()
+
+    def resume(self):
+        """
+        Switch the pumps stopped by pause() back on (unless the guard forbids it).
+        """
+        with self.lock:
+            if self.held is None:
+                return
+            self.paused_total += clock.monotonic() - self.paused_at
+            held, self.held = self.held, None
+            if held and not (self.guard and self.guard()):
+                self.on.update(held)
+                self._write()
+
+    def pausedTime(self):
+        """
+        Total seconds the bank has spent paused, including a pause in progress.
+        """
+        with self.lock:
+            if self.held is None:
+                return self.paused_total
+            return self.paused_total + clock.monotonic() - self.paused_at
+
+    def run(self, schedule, stop = None):
+        """
+        Run each pin in `schedule` ({pin: seconds}) for its time. All pumps start in
+        one write; pumps with (nearly) the same end time stop in one write.
+        `stop` is an optional clock.Event that ends the run early.
+
+        returns True if the whole schedule ran, False if it was stopped or refused
+        """
+        schedule = {pin: t for pin, t in schedule.items() if t > 0}
+        if not schedule:
+            return True
+        if not self.switch(on=schedule):
+            return False
+
+        start = clock.monotonic()
+        paused_before = self.pausedTime()
+        pending = sorted(schedule.items(), key=lambda item: item[1])
+        completed = True
+        while pending:
+            due = pending[0][1]
+            if self.paused:
+                # the schedule's clock doesn't run while paused
+                if self._wait(PAUSE_POLL, stop):
+                    completed = False
+                    break
+                continue
+            elapsed = clock.monotonic() - start - (self.pausedTime() - paused_before)
+            remaining = due - elapsed
+            if remaining > DUE_SLACK:
+                if self._wait(remaining, stop):
+                    completed = False
+                    break
+                continue        # a pause may have started meanwhile
+            group = [pin for pin, t in pending if t - due <= COALESCE_TIME]
+            pending = pending[len(group):]
+            self.switch(off=group)
+
+        if pending:
+            self.switch(off=[pin for pin, _ in pending])
+        return completed
+
+    @staticmethod
+    def _wait(seconds, stop):
+        """
+        Sleep `seconds`, or until `stop` is set. True if stopped.
+        """
+        if stop is not None:
+            return stop.wait(seconds)
+        clock.sleep(seconds)
+        return False
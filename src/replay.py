@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Record a real bartender session and replay it on the simulator.
+
+    sudo python3 replay.py record service.trace     # run the bartender, recording
+    python3 replay.py play service.trace            # replay it on the simulator
+
+Recording wraps RPi.GPIO and the HX711 reader: every change seen on an input
+pin (buttons, IR beam, edge callbacks), every relay write and every load-cell
+reading is stored with its time into a small gzip'd file of fixed-size records,
+together with the pump configuration and the state files the bartender starts
+from (priming, glasses, usage, order history, snapshot, scale calibration).
+
+Replay runs the unchanged bartender on simhw under a clock.VirtualClock, in a
+scratch directory holding the recorded state files, so it starts where the
+recording started and never touches the live ones. Input
+changes are applied at their recorded times, load-cell reads return the sample
+recorded at that moment, and time only advances while the bartender is
+waiting - so half an hour of service replays in seconds, identically every
+time. The relay timeline of the replay is then compared with the recording.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import tempfile
+import struct
+import bisect
+import argparse
+import threading
+from functools import partial
+
+import clock
+from priming import PRIME_FILE
+from glasses import GLASS_FILE
+from usage import USAGE_FILE
+from loadout import HISTORY_FILE
+from snapshot import SNAPSHOT_FILE
+from scalecal import CALIBRATION_FILE
+
+TRACE_MAGIC = b"BTTRACE2"
+HEADER = struct.Struct("<dI")          # wall time at start, length of header JSON
+RECORD = struct.Struct("<dBhi")        # seconds since start, kind, pin, value
+
+# Record kinds
+INPUT  = 1     # an input pin changed level
+OUTPUT = 2     # an output pin (relay) changed level
+SCALE  = 3     # a load-cell reading, value in milligrams
+
+# Simulated time kept running after the last recorded event
+REPLAY_TAIL = 5.0
+
+# Persisted state the bartender loads at start-up (loadcell.LOADCELL_FILE too,
+# added where loadcell can be imported)
+STATE_FILES = (PRIME_FILE, GLASS_FILE, USAGE_FILE, HISTORY_FILE, SNAPSHOT_FILE, CALIBRATION_FILE)
+
+
+class TraceWriter(object):
+    def __init__(self, path, config, state):
+        """
+        config: the pump configuration; state: {file name: contents} of the state files.
+        """
+        self.file = gzip.open(path, "wb")
+        blob = json.dumps({"config": config, "state": state}).encode()
+        self.file.write(TRACE_MAGIC + HEADER.pack(time.time(), len(blob)) + blob)
+        self.start = clock.monotonic()
+        self.lock = threading.Lock()
+
+    def write(self, kind, pin, value):
+        with self.lock:
+            self.file.write(RECORD.pack(clock.monotonic() - self.start, kind, pin, value))
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def readTrace(path):
+    """
+    Return (wall start time, pump configuration, {state file: contents},
+    [(t, kind, pin, value), ...]).
+    """
+    with gzip.open(path, "rb") as f:
+        magic = f.read(len(TRACE_MAGIC))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a {TRACE_MAGIC.decode()} bartender trace "
+                             f"(starts with {magic!r})")
+        started, size = HEADER.unpack(f.read(HEADER.size))
+        header = json.loads(f.read(size))
+        data = f.read()
+    usable = len(data) - len(data) % RECORD.size    # tolerate a cut-off last record
+    records = [RECORD.unpack_from(data, off) for off in range(0, usable, RECORD.size)]
+    return started, header["config"], header["state"], records
+
+
+def readState(files):
+    """
+    {file name: contents} of those of `files` that exist.
+    """
+    state = {}
+    for name in files:
+        if os.path.exists(name):
+            with open(name) as f:
+                state[name] = f.read()
+    return state
+
+
+class RecordingGPIO(object):
+    """
+    Passes everything through to RPi.GPIO, writing level changes to the trace.
+    """
+    def __init__(self, gpio, writer):
+        self._gpio = gpio
+        self._writer = writer
+        self._inputs = {}
+        self._outputs = {}
+
+    def __getattr__(self, name):
+        return getattr(self._gpio, name)
+
+    def setup(self, pins, mode, **kwargs):
+        self._gpio.setup(pins, mode, **kwargs)
+        for pin in (pins if isinstance(pins, (list, tuple)) else [pins]):
+            if mode == self._gpio.OUT:
+                self._outputs[pin] = None
+                self._output(pin, kwargs.get("initial", self._gpio.LOW))
+            else:
+                self.input(pin)
+
+    def input(self, pin):
+        level = self._gpio.input(pin)
+        if pin not in self._outputs and self._inputs.get(pin) != level:
+            self._inputs[pin] = level
+            self._writer.write(INPUT, pin, level)
+        return level
+
+    def output(self, pins, values):
+        self._gpio.output(pins, values)
+        if not isinstance(pins, (list, tuple)):
+            pins = [pins]
+        if not isinstance(values, (list, tuple)):
+            values = [values] * len(pins)
+        for pin, value in zip(pins, values):
+            self._output(pin, value)
+
+    def _output(self, pin, value):
+        if self._outputs.get(pin) != value:
+            self._outputs[pin] = value
+            self._writer.write(OUTPUT, pin, value)
+
+    def add_event_detect(self, pin, edge, callback = None, bouncetime = None):
+        def recorded(channel):
+            self.input(channel)
+            callback(channel)
+        kwargs = {"bouncetime": bouncetime} if bouncetime else {}
+        self._gpio.add_event_detect(pin, edge, callback=recorded if callback else None, **kwargs)
+
+
+class RecordingScale(object):
+    """
+    Passes everything through to the HX711 driver, writing each weight read to the trace.
+    """
+    def __init__(self, hx, writer, pin):
+        self._hx = hx
+        self._writer = writer
+        self._pin = pin
+
+    def __getattr__(self, name):
+        return getattr(self._hx, name)
+
+    def get_weight_mean(self, readings = 30):
+        grams = self._hx.get_weight_mean(readings)
+        if grams is not False:
+            self._writer.write(SCALE, self._pin, int(round(grams * 1000)))
+        return grams
+
+
+def installRecorder(path):
+    """
+    Wrap RPi.GPIO and loadcell.HX711Reader so that everything imported afterwards
+    records to `path`.
+    """
+    import RPi
+    import RPi.GPIO
+    import loadcell     # keeps the unwrapped GPIO: its bit-banging isn't recorded
+
+    with open("pump_config.json") as f:
+        writer = TraceWriter(path, json.load(f),
+                             readState(STATE_FILES + (loadcell.LOADCELL_FILE,)))
+    gpio = RecordingGPIO(RPi.GPIO, writer)
+    sys.modules["RPi.GPIO"] = gpio
+    RPi.GPIO = gpio
+
+    real_reader = loadcell.HX711Reader
+    def recording_reader(*args, **kwargs):
+        pin = kwargs.get("dout_pin", args[0] if args else 0)
+        return RecordingScale(real_reader(*args, **kwargs), writer, pin)
+    loadcell.HX711Reader = recording_reader
+    # cells sharing an SCK: every one of them records its reads
+    real_load = loadcell.HX711Bank.load.__func__
+    def recording_load(cls, path = loadcell.LOADCELL_FILE):
+        bank = real_load(cls, path)
+        if bank:
+            bank.channels = {name: RecordingScale(cell, writer, cell.dout)
+                             for name, cell in bank.channels.items()}
+        return bank
+    loadcell.HX711Bank.load = classmethod(recording_load)
+    return writer
+
+
+def record(path):
+    writer = installRecorder(path)
+    try:
+        from bartender import Bartender
+        from drinks import drink_list, drink_options
+        bartender = Bartender()
+        bartender.buildMenu(drink_list, drink_options)
+        bartender.run()
+    finally:
+        writer.close()
+
+
+def play(path):
+    """
+    Replay a trace on the simulator and return a report dict.
+    """
+    started, config, state, records = readTrace(path)
+    vclock = clock.use(clock.VirtualClock())
+
+    import simhw
+    sim = simhw.install()
+
+    scale_times = [t for t, kind, _, _ in records if kind == SCALE]
+    scale_grams = [value / 1000.0 for _, kind, _, value in records if kind == SCALE]
+
+    class ReplayHX711(simhw.SimHX711):
+        def zero(self, readings = 30):
+            return False
+
+        def calibrated(self):
+            # the recorded calibration file is loaded into this reader as usual;
+            # a bank's glass cell had its scale in LOADCELL_FILE instead
+            return super().calibrated() or bank_calibrated
+
+        def get_weight_mean(self, readings = 30):
+            i = bisect.bisect_right(scale_times, clock.monotonic()) - 1
+            return scale_grams[i] if i >= 0 else 0.0
+
+    import loadcell
+    loadcell.HX711Reader = ReplayHX711
+    loadcell.HX711Bank.load = classmethod(lambda cls, path = None: None)
+    for t, kind, pin, value in records:
+        if kind == INPUT:
+            vclock.at(t, partial(sim.gpio.setInput, pin, value))
+    end = (records[-1][0] if records else 0.0) + REPLAY_TAIL
+    vclock.at(end, vclock.stop)
+
+    import bartender as bt
+    from drinks import drink_list, drink_options
+    cells = json.loads(state.get(loadcell.LOADCELL_FILE, '{"cells": {}}'))["cells"]
+    glass = cells.get(bt.GLASS_CELL, {})
+    bank_calibrated = glass.get("scale_ratio", 1.0) != 1.0 or "calibration" in glass
+
+    # the recorded state files, in a scratch directory the replay may write to
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    for name, contents in dict(state, **{"pump_config.json": json.dumps(config)}).items():
+        with open(os.path.join(workdir, name), "w") as f:
+            f.write(contents)
+    os.chdir(workdir)
+
+    wall = time.perf_counter()
+    try:
+        bartender = bt.Bartender()
+        bartender.buildMenu(drink_list, drink_options)
+        bartender.run()
+    except clock.ClockStopped:
+        pass
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    wall = time.perf_counter() - wall
+
+    report = compareRelays(records, sim.gpio.timeline,
+                           [p["pin"] for p in config.values()])
+    report.update({
+        "recorded_at":  time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)),
+        "simulated_s":  vclock.now,
+        "wall_s":       wall,
+        "speedup":      vclock.now / wall if wall > 0 else 0.0,
+    })
+    clock.use(clock.RealClock())
+    return report
+
+
+def compareRelays(records, timeline, pins):
+    """
+    Pair the recorded and replayed relay changes pin by pin and measure the drift.
+    """
+    recorded = {pin: [] for pin in pins}
+    replayed = {pin: [] for pin in pins}
+    for t, kind, pin, value in records:
+        if kind == OUTPUT and pin in recorded:
+            recorded[pin].append((t, value))
+    for t, pin, value in timeline:
+        if pin in replayed:
+            replayed[pin].append((t, value))
+
+    mismatched = []
+    drift = []
+    for pin in pins:
+        if [v for _, v in recorded[pin]] != [v for _, v in replayed[pin]]:
+            mismatched.append(pin)
+            continue
+        drift.extend(abs(a - b) for (a, _), (b, _) in zip(recorded[pin], replayed[pin]))
+    return {
+        "relay_events":     sum(len(v) for v in recorded.values()),
+        "mismatched_pins":  mismatched,
+        "max_drift_ms":     max(drift) * 1000 if drift else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("record", help="run the bartender and record a trace").add_argument("trace")
+    sub.add_parser("play", help="replay a trace on the simulator").add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.trace)
+    else:
+        report = play(args.trace)
+        for key, value in report.items():
+            print(f"{key:16s} {value}")
+
+
+if __name__ == "__main__":
+    main()
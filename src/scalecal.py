@@ -0,0 +1,174 @@
+# scalecal.py
+"""
+Load-cell calibration.
+
+ScaleCalibration maps raw HX711 counts to grams with a least-squares polynomial
+fitted over several reference weights (calibrate_scale.py measures them), plus
+a linear temperature term: the bridge and the HX711 drift as the enclosure
+warms up, and the Pi's CPU temperature (the same /sys/class/thermal reading
+oled_temp_oled.py shows) follows the enclosure closely enough to correct for it.
+
+tare() only moves the zero, so the shape of the curve and the temperature term
+survive re-taring at start-up.
+"""
+import json
+import os
+
+THERMAL_ZONE     = "/sys/class/thermal/thermal_zone0/temp"
+CALIBRATION_FILE = "scale_calibration.json"
+TEMP_MIN_SPREAD  = 1.0   # °C the calibration points must span to fit a temperature term
+
+
+def cpuTemp(path = THERMAL_ZONE):
+    """
+    The Pi's CPU temperature in °C, or None where there is no thermal zone.
+    """
+    try:
+        with open(path) as f:
+            return float(f.read()) / 1000.0
+    except (OSError, ValueError):
+        return None
+
+
+def solve(a, b):
+    """
+    Solve a small dense system a·x = b by Gaussian elimination with partial pivoting.
+    """
+    n = len(b)
+    m = [list(row) + [rhs] for row, rhs in zip(a, b)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            raise ValueError("calibration points don't determine the curve")
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            f = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= f * m[col][c]
+    x = [0.0] * n
+    for r in reversed(range(n)):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def leastSquares(rows, targets):
+    """
+    Coefficients minimising the squared error of rows·x against targets (normal equations).
+    """
+    k = len(rows[0])
+    ata = [[sum(row[i] * row[j] for row in rows) for j in range(k)] for i in range(k)]
+    atb = [sum(row[i] * y for row, y in zip(rows, targets)) for i in range(k)]
+    return solve(ata, atb)
+
+
+class ScaleCalibration(object):
+    def __init__(self, coeffs = (0.0, 1.0), center = 0.0, span = 1.0,
+                 temp_coeff = 0.0, temp_ref = None, points = (), thermal = THERMAL_ZONE):
+        """
+        grams = sum(coeffs[k] * u**k) + temp_coeff * (T - temp_ref) + zero shift,
+        with u = (raw - center) / span keeping the fit well conditioned.
+        `points` are the measurements it was fitted from, kept for refitting.
+        """
+        self.coeffs = list(coeffs)
+        self.center = center
+        self.span = span
+        self.temp_coeff = temp_coeff
+        self.temp_ref = temp_ref
+        self.points = list(points)
+        self.thermal = thermal
+        self.shift = 0.0
+
+    @property
+    def degree(self):
+        return len(self.coeffs) - 1
+
+    @property
+    def compensated(self):
+        return self.temp_ref is not None and self.temp_coeff != 0.0
+
+    def temperature(self):
+        return cpuTemp(self.thermal) if self.compensated else None
+
+    def _curve(self, raw, temp):
+        u = (raw - self.center) / self.span
+        grams = 0.0
+        for c in reversed(self.coeffs):
+            grams = grams * u + c
+        if temp is not None and self.compensated:
+            grams += self.temp_coeff * (temp - self.temp_ref)
+        return grams
+
+    def grams(self, raw, temp = None):
+        """
+        Weight in grams for a raw count; reads the CPU temperature itself if none is given.
+        """
+        if temp is None:
+            temp = self.temperature()
+        return self._curve(raw, temp) + self.shift
+
+    def tare(self, raw, temp = None):
+        """
+        Make `raw` at the current temperature read as zero.
+        """
+        if temp is None:
+            temp = self.temperature()
+        self.shift = -self._curve(raw, temp)
+
+    @classmethod
+    def fit(cls, points, degree = 1):
+        """
+        Fit from measurements [{"raw", "grams", "temp"}, ...]. The temperature term
+        is only fitted when the points span at least TEMP_MIN_SPREAD °C.
+        """
+        weights = {p["grams"] for p in points}
+        if len(weights) < degree + 1:
+            raise ValueError(f"a degree {degree} curve needs {degree + 1} different weights")
+        raws = [p["raw"] for p in points]
+        center = sum(raws) / len(raws)
+        span = (max(raws) - min(raws)) / 2 or 1.0
+
+        temps = [p["temp"] for p in points if p.get("temp") is not None]
+        thermal = len(temps) == len(points) and max(temps) - min(temps) >= TEMP_MIN_SPREAD
+        temp_ref = sum(temps) / len(temps) if thermal else None
+
+        rows = []
+        for p in points:
+            u = (p["raw"] - center) / span
+            row = [u ** k for k in range(degree + 1)]
+            if thermal:
+                row.append(p["temp"] - temp_ref)
+            rows.append(row)
+        x = leastSquares(rows, [p["grams"] for p in points])
+        coeffs = x[:degree + 1]
+        temp_coeff = x[degree + 1] if thermal else 0.0
+        return cls(coeffs, center, span, temp_coeff, temp_ref, points)
+
+    def residuals(self):
+        """
+        (grams, fitted grams - grams) for every calibration point.
+        """
+        return [(p["grams"], self._curve(p["raw"], p.get("temp")) - p["grams"])
+                for p in self.points]
+
+    def save(self, path = CALIBRATION_FILE):
+        with open(path, "w") as f:
+            json.dump({
+                "coeffs":     self.coeffs,
+                "center":     self.center,
+                "span":       self.span,
+                "temp_coeff": self.temp_coeff,
+                "temp_ref":   self.temp_ref,
+                "points":     self.points,
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path = CALIBRATION_FILE):
+        """
+        The saved calibration, or None if the scale hasn't been calibrated yet.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["coeffs"], data["center"], data["span"],
+                   data.get("temp_coeff", 0.0), data.get("temp_ref"), data.get("points", ()))
@@ -0,0 +1,138 @@
+# search.py
+"""
+Prefix search over the drink menu.
+
+Every word of a drink's name and every ingredient it uses is inserted into a
+trie, so typing "TO" finds "Tonic" drinks by name as well as anything that
+pours tonic. Each trie node keeps the drinks reachable below it, which makes a
+lookup cost proportional to the length of the query rather than the size of
+the catalog - fast enough to refresh the OLED on every letter.
+"""
+
+# Characters offered by the on-device letter picker, in display order
+SEARCH_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Match ranks, lower is better
+RANK_NAME_PREFIX = 0   # query matches the start of the drink name
+RANK_WORD_PREFIX = 1   # query matches the start of a later word in the name
+RANK_INGREDIENT  = 2   # query matches an ingredient the drink uses
+
+
+def normalize(text):
+    """
+    Split `text` into upper-case alphanumeric words ("Rum & Coke" -> RUM, COKE).
+    """
+    words = []
+    word = ""
+    for ch in text.upper():
+        if ch.isalnum():
+            word += ch
+        elif word:
+            words.append(word)
+            word = ""
+    if word:
+        words.append(word)
+    return words
+
+
+class TrieNode(object):
+    __slots__ = ("children", "hits", "ranked")
+
+    def __init__(self):
+        self.children = {}   # char -> TrieNode
+        self.hits = {}       # item index -> best rank of any match through this node
+        self.ranked = None   # cached list of item indices, sorted by (rank, name)
+
+
+class DrinkTrie(object):
+    def __init__(self, aliases = None):
+        """
+        aliases: optional {ingredient value: display name} map, e.g. built from
+        drink_options, so "ORANGE" finds drinks that use "oj".
+        """
+        self.root = TrieNode()
+        self.items = []
+        self.aliases = aliases or {}
+
+    def add(self, item):
+        """
+        Index a DrinkItem by its name words and its ingredients.
+        """
+        index = len(self.items)
+        self.items.append(item)
+
+        words = normalize(item.name)
+        if words:
+            # the full name (without separators) ranks above single words so
+            # "GINT" still finds "Gin & Tonic"
+            self._insert("".join(words), index, RANK_NAME_PREFIX)
+        for i, word in enumerate(words):
+            self._insert(word, index, RANK_NAME_PREFIX if i == 0 else RANK_WORD_PREFIX)
+
+        for ing in item.ingredients:
+            for word in normalize(ing) + normalize(self.aliases.get(ing, "")):
+                self._insert(word, index, RANK_INGREDIENT)
+
+    def addAll(self, items):
+        for item in items:
+            self.add(item)
+
+    def _insert(self, word, index, rank):
+        node = self.root
+        for ch in word:
+            node = node.children.setdefault(ch, TrieNode())
+            if rank < node.hits.get(index, RANK_INGREDIENT + 1):
+                node.hits[index] = rank
+                node.ranked = None
+
+    def _find(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _ranked(self, node):
+        if node.ranked is None:
+            node.ranked = sorted(
+                node.hits,
+                key=lambda i: (node.hits[i], self.items[i].name.upper())
+            )
+        return node.ranked
+
+    def search(self, prefix, available = None, limit = None):
+        """
+        Return the drinks matching `prefix`, best match first.
+
+        available: optional set of item indices that may be returned
+        (drinks whose ingredients are not on a pump are left out).
+        """
+        node = self._find(prefix.upper())
+        if node is None or node is self.root:
+            return []
+        results = []
+        for index in self._ranked(node):
+            if available is not None and index not in available:
+                continue
+            results.append(self.items[index])
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def nextLetters(self, prefix, available = None):
+        """
+        Return the letters that extend `prefix` to at least one available drink,
+        in SEARCH_ALPHABET order. Dead ends are never offered on the picker.
+        """
+        node = self._find(prefix.upper())
+        if node is None:
+            return []
+        letters = []
+        for ch in SEARCH_ALPHABET:
+            child = node.children.get(ch)
+            if child is None:
+                continue
+            if available is None or any(i in available for i in child.hits):
+                letters.append(ch)
+        return letters
@@ -0,0 +1,513 @@
+# simhw.py
+"""
+Simulated hardware backend.
+
+Stands in for RPi.GPIO, the hx711 driver and the luma OLED so bartender.py and
+its helpers run unchanged on a laptop, in benchmarks and in replays:
+
+    import simhw
+    sim = simhw.install()          # before importing bartender
+    from bartender import Bartender
+
+The simulator models the things the bartender reacts to: button and IR levels
+(with edge callbacks), relay outputs (kept as a timeline), a load cell that
+sees the glass plus whatever the pumps have poured into it (read through the
+hx711 stand-in or bit-banged from a simulated HX711 chip), more cells on the
+same clock line if a test adds them (addLoadCell), and an OLED whose frames are
+kept as text so a test can read the screen.
+"""
+import sys
+import time
+import types
+import random
+import threading
+import clock
+from contextlib import contextmanager
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+# Simulated pump flow, mL per second while a relay is on (bartender's FLOW_RATE is s/mL)
+SIM_FLOW = 1 / 0.48
+# HX711 counts per gram and the chip's zero-load reading
+SIM_SCALE_RATIO = 420.0
+SIM_RAW_OFFSET  = 81000
+SIM_NOISE       = 30.0     # counts, standard deviation
+# HX711 chips wired to the simulated GPIO, (DOUT, SCK) - the bartender's load cell
+SIM_LOADCELLS   = ((4, 16),)
+SIM_SPS         = 10       # their conversion rate
+
+
+class SimGPIO(object):
+    """
+    The subset of RPi.GPIO the bartender uses. Levels of input pins are set with
+    setInput(); edge callbacks run on the thread that changed the level.
+    """
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.levels = {}
+        self.modes = {}
+        self.edges = {}         # pin -> edge being detected
+        self.callbacks = {}     # pin -> [callback]
+        self.timeline = []      # (clock.monotonic(), pin, level) for every output change
+        self.listeners = []     # function(pin, level) called on every output change
+        self.quiet = set()      # output pins left out of the timeline (HX711 clocks)
+
+    # --- RPi.GPIO API ---
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pins, mode, pull_up_down = None, initial = None):
+        for pin in (pins if isinstance(pins, (list, tuple)) else [pins]):
+            with self.lock:
+                self.modes[pin] = mode
+                if mode == self.OUT:
+                    self._set(pin, self.LOW if initial is None else initial, output=True)
+                elif pin not in self.levels:
+                    self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def input(self, pin):
+        with self.lock:
+            return self.levels.get(pin, self.LOW)
+
+    def output(self, pins, values):
+        if not isinstance(pins, (list, tuple)):
+            pins = [pins]
+        if not isinstance(values, (list, tuple)):
+            values = [values] * len(pins)
+        with self.lock:
+            for pin, value in zip(pins, values):
+                self._set(pin, value, output=True)
+
+    def add_event_detect(self, pin, edge, callback = None, bouncetime = None):
+        with self.lock:
+            if pin in self.edges:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            self.edges[pin] = edge
+            self.callbacks[pin] = [callback] if callback else []
+
+    def add_event_callback(self, pin, callback):
+        with self.lock:
+            self.callbacks[pin].append(callback)
+
+    def remove_event_detect(self, pin):
+        with self.lock:
+            self.edges.pop(pin, None)
+            self.callbacks.pop(pin, None)
+
+    def wait_for_edge(self, pin, edge, bouncetime = None, timeout = None):
+        """
+        Block until `pin` sees `edge`; returns the pin, or None after timeout (ms).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000.0
+        with self.lock:
+            last = self.levels.get(pin, self.LOW)
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+                level = self.levels.get(pin, self.LOW)
+                if level != last:
+                    if self._matches(edge, level):
+                        return pin
+                    last = level
+
+    def cleanup(self, pins = None):
+        with self.lock:
+            self.edges.clear()
+            self.callbacks.clear()
+
+    # --- simulator side ---
+
+    def setInput(self, pin, level):
+        """
+        Drive an input pin (button, IR beam, HX711 DOUT) and fire its edge callbacks.
+        """
+        self._set(pin, level)
+
+    def _matches(self, edge, level):
+        return edge == self.BOTH or (edge == self.RISING) == (level == self.HIGH)
+
+    def _set(self, pin, level, output = False):
+        with self.lock:
+            old = self.levels.get(pin)
+            self.levels[pin] = level
+            if old == level:
+                return
+            if output:
+                if pin not in self.quiet:
+                    self.timeline.append((clock.monotonic(), pin, level))
+                for listener in self.listeners:
+                    listener(pin, level)
+            self.changed.notify_all()
+            edge = self.edges.get(pin)
+            callbacks = list(self.callbacks.get(pin, []))
+        if old is None or edge is None or not self._matches(edge, level):
+            return
+        for callback in callbacks:
+            callback(pin)
+
+    def onTime(self, pin, since = 0.0, until = None):
+        """
+        Seconds `pin` (an active LOW relay) spent LOW between `since` and `until`.
+        """
+        until = clock.monotonic() if until is None else until
+        total = 0.0
+        low_at = None
+        for t, p, level in self.timeline:
+            if p != pin:
+                continue
+            if level == self.LOW and low_at is None:
+                low_at = max(t, since)
+            elif level == self.HIGH and low_at is not None:
+                total += max(0.0, min(t, until) - low_at)
+                low_at = None
+        if low_at is not None:
+            total += max(0.0, until - low_at)
+        return total
+
+
+class SimScale(object):
+    """
+    The load cell: glass weight plus liquid poured by relays that are on.
+    """
+    def __init__(self, gpio):
+        self.gpio = gpio
+        self.glass = 0.0
+        self.placed_at = 0.0
+        self.pump_pins = set()
+        self.flow = SIM_FLOW
+        self.noise = SIM_NOISE
+        self.offset = SIM_RAW_OFFSET
+        self.ratio = SIM_SCALE_RATIO
+
+    def grams(self):
+        if self.glass <= 0:
+            return 0.0
+        poured = sum(self.gpio.onTime(pin, since=self.placed_at) for pin in self.pump_pins)
+        return self.glass + poured * self.flow
+
+    def raw(self):
+        return int(self.offset + self.grams() * self.ratio + random.gauss(0, self.noise))
+
+
+class SimLoad(object):
+    """
+    A load cell under something that only changes when a test says so (a bottle).
+    """
+    def __init__(self, grams = 0.0):
+        self.weight = grams
+        self.noise = SIM_NOISE
+        self.offset = SIM_RAW_OFFSET
+        self.ratio = SIM_SCALE_RATIO
+
+    def grams(self):
+        return self.weight
+
+    def raw(self):
+        return int(self.offset + self.weight * self.ratio + random.gauss(0, self.noise))
+
+
+class SimHX711Chip(object):
+    """
+    An HX711 on the simulated GPIO, for drivers that bit-bang it (loadcell.py).
+    Converts the SimScale `rate` times a second, pulls DOUT low when a sample is
+    ready and shifts it out MSB first on SCK rising edges. Pulses 25-27 pick the
+    next gain (channel B is modelled as the same bridge at gain 32), and SCK held
+    high for more than 60 us powers the chip down and back to channel A / 128.
+    The chip starts converting once its SCK pin is first driven.
+    """
+    GAIN = {1: 1.0, 2: 32 / 128, 3: 64 / 128}      # mode (pulses - 24) -> relative gain
+
+    def __init__(self, gpio, scale, dout, sck, rate = SIM_SPS):
+        self.gpio = gpio
+        self.scale = scale
+        self.dout = dout
+        self.sck = sck
+        self.period = 1.0 / rate
+        self.mode = 1
+        self.data = 0
+        self.pulses = 0
+        self.loaded = False             # a conversion is waiting to be shifted out
+        self.high_at = None
+        self.started = False
+        self.conversions = 0
+        gpio.quiet.add(sck)
+        gpio.listeners.append(self._clock)
+
+    def _convert(self):
+        while True:
+            clock.sleep(self.period)
+            with self.gpio.lock:
+                if self.loaded and 0 < self.pulses < 25:
+                    continue                    # being read out right now
+                raw = self.scale.raw() * self.GAIN[self.mode]
+                self.data = int(raw) & 0xFFFFFF
+                self.pulses = 0
+                self.loaded = True
+                self.conversions += 1
+            self.gpio.setInput(self.dout, SimGPIO.LOW)
+
+    def _clock(self, pin, level):
+        if pin != self.sck:
+            return
+        if not self.started:
+            self.started = True
+            self.gpio.setInput(self.dout, SimGPIO.HIGH)
+            clock.Thread(target=self._convert, daemon=True).start()
+            return
+        if level == SimGPIO.HIGH:
+            self.high_at = clock.monotonic()
+            if not self.loaded:
+                return                          # powered down / nothing converted yet
+            self.pulses += 1
+            if self.pulses <= 24:
+                self.gpio.setInput(self.dout, (self.data >> (24 - self.pulses)) & 1)
+            elif self.pulses == 25:
+                self.gpio.setInput(self.dout, SimGPIO.HIGH)
+        else:
+            if self.high_at is not None and clock.monotonic() - self.high_at > 60e-6:
+                # powered down: back to A/128, shifting stops until the next conversion
+                self.mode = 1
+                self.pulses = 0
+                self.loaded = False
+                self.gpio.setInput(self.dout, SimGPIO.HIGH)
+            elif self.pulses >= 25:
+                self.mode = min(self.pulses - 24, 3)
+
+
+class SimHX711(object):
+    """
+    Drop-in for hx711.HX711 (the gandalf15 driver) reading from the SimScale.
+    """
+    def __init__(self, dout_pin, pd_sck_pin, gain_channel_A = 128, select_channel = 'A'):
+        self.dout_pin = dout_pin
+        self.pd_sck_pin = pd_sck_pin
+        self.offset = 0.0
+        self.scale_ratio = 1.0
+        self.calibration = None
+        self._data_filter = self.outliers_filter
+        self._scale = simulator.scale
+
+    def reset(self):
+        return False
+
+    def zero(self, readings = 30):
+        self.offset = self.get_raw_data_mean(readings)
+        if self.calibration:
+            self.calibration.tare(self.offset)
+        return False
+
+    def getTare(self):
+        return self.offset, (self.calibration.shift if self.calibration else None)
+
+    def setTare(self, offset, shift = None):
+        self.offset = offset
+        if self.calibration and shift is not None:
+            self.calibration.shift = shift
+
+    def _read(self):
+        return self._scale.raw() & 0xFFFFFF
+
+    def get_raw_data(self, readings = 30):
+        return [self._scale.raw() for _ in range(readings)]
+
+    def get_raw_data_mean(self, readings = 30):
+        data = self._data_filter(self.get_raw_data(readings))
+        return sum(data) / len(data)
+
+    def get_data_mean(self, readings = 30):
+        return self.get_raw_data_mean(readings) - self.offset
+
+    def get_weight_mean(self, readings = 30):
+        if self.calibration:
+            return self.calibration.grams(self.get_raw_data_mean(readings))
+        return self.get_data_mean(readings) / self.scale_ratio
+
+    def set_scale_ratio(self, ratio):
+        self.scale_ratio = ratio
+
+    def calibrated(self):
+        return self.calibration is not None or self.scale_ratio != 1.0
+
+    def set_calibration(self, calibration):
+        self.calibration = calibration
+
+    def set_data_filter(self, data_filter):
+        self._data_filter = data_filter
+
+    def outliers_filter(self, data):
+        return data
+
+
+class TextDraw(object):
+    """
+    Stand-in for PIL's ImageDraw that only records what was drawn.
+    """
+    def __init__(self):
+        self.ops = []
+
+    def text(self, xy, text, fill = None, font = None):
+        self.ops.append(("text", xy, text))
+
+    def rectangle(self, box, outline = None, fill = None):
+        self.ops.append(("rectangle", box))
+
+
+class SimDisplay(object):
+    """
+    Drop-in for luma's ssd1306. Every frame drawn through canvas() is counted and
+    its text kept, so tests can read what is on the screen.
+    """
+    def __init__(self, serial_interface = None, width = 128, height = 64, rotate = 0, **kwargs):
+        self.width = width
+        self.height = height
+        self.size = (width, height)
+        self.mode = "1"
+        self.bounding_box = (0, 0, width - 1, height - 1)
+        self.frames = 0
+        self.text = []
+        self.image = None
+        simulator.display = self
+
+    def clear(self):
+        self.text = []
+
+    def show(self):
+        pass
+
+    def contrast(self, level):
+        pass
+
+    def display(self, image):
+        self.image = image
+
+
+@contextmanager
+def canvas(device, **kwargs):
+    """
+    luma.core.render.canvas for the SimDisplay; rasterises with PIL when it is installed.
+    """
+    record = TextDraw()
+    if Image is not None:
+        image = Image.new(device.mode, device.size)
+        draw = ImageDraw.Draw(image)
+        proxy = _RecordingDraw(draw, record)
+        yield proxy
+        device.display(image)
+    else:
+        yield record
+    device.frames += 1
+    device.text = [op[2] for op in record.ops if op[0] == "text"]
+
+
+class _RecordingDraw(object):
+    def __init__(self, draw, record):
+        self._draw = draw
+        self._record = record
+
+    def text(self, xy, text, **kwargs):
+        self._record.text(xy, text)
+        self._draw.text(xy, text, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._draw, name)
+
+
+class Simulator(object):
+    """
+    The simulated machine: GPIO, load cell and OLED, plus helpers to act on them.
+    """
+    def __init__(self):
+        self.gpio = SimGPIO()
+        self.scale = SimScale(self.gpio)
+        self.loadcells = [SimHX711Chip(self.gpio, self.scale, dout, sck)
+                          for dout, sck in SIM_LOADCELLS]
+        self.display = None
+
+    def press(self, pin, hold = 0.05):
+        """
+        Press and release a button (buttons are active HIGH).
+        """
+        self.gpio.setInput(pin, SimGPIO.HIGH)
+        clock.sleep(hold)
+        self.gpio.setInput(pin, SimGPIO.LOW)
+
+    def placeGlass(self, ir_pin, weight):
+        """
+        Put a glass of `weight` grams on the plate; it breaks the IR beam (LOW).
+        """
+        self.scale.glass = weight
+        self.scale.placed_at = clock.monotonic()
+        self.gpio.setInput(ir_pin, SimGPIO.LOW)
+
+    def removeGlass(self, ir_pin):
+        self.scale.glass = 0.0
+        self.gpio.setInput(ir_pin, SimGPIO.HIGH)
+
+    def addLoadCell(self, dout, sck = SIM_LOADCELLS[0][1], grams = 0.0):
+        """
+        Another HX711 (on the glass scale's SCK by default) under a SimLoad of
+        `grams`; returns the SimLoad, whose weight the test can change.
+        """
+        load = SimLoad(grams)
+        self.loadcells.append(SimHX711Chip(self.gpio, load, dout, sck))
+        return load
+
+    def watchPumps(self, pins):
+        """
+        Pins whose relays pour into the glass on the scale.
+        """
+        self.scale.pump_pins = set(pins)
+
+
+simulator = Simulator()
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """
+    Register the simulated RPi.GPIO, hx711 and luma modules and return the Simulator.
+    Must run before anything imports the real ones.
+    """
+    rpi = _module("RPi")
+    rpi.GPIO = simulator.gpio
+    sys.modules["RPi.GPIO"] = simulator.gpio
+    _module("hx711", HX711=SimHX711)
+
+    luma = _module("luma")
+    luma.core = _module("luma.core")
+    luma.core.render = _module("luma.core.render", canvas=canvas)
+    luma.core.interface = _module("luma.core.interface")
+    luma.core.interface.serial = _module("luma.core.interface.serial",
+                                         i2c=lambda port = 1, address = 0x3C: None)
+    luma.oled = _module("luma.oled")
+    luma.oled.device = _module("luma.oled.device", ssd1306=SimDisplay)
+    return simulator
@@ -0,0 +1,80 @@
+# snapshot.py
+"""
+A small runtime snapshot so a restarted bartender picks up where it left off.
+
+Holds what a restart can't rebuild from the config files: the menu position,
+the pour in flight (its plan and how far it got), and the scale's tare. It is
+a few hundred bytes of JSON, replaced atomically (write a temporary file, then
+rename), so a crash at any moment leaves either the old or the new snapshot.
+
+Changes that matter for safety (a pour starting, its progress, its end) are
+written at once with save(). Menu moves only mark the snapshot dirty and are
+written by flush() from the idle loop, at most every SNAPSHOT_INTERVAL seconds.
+"""
+import json
+import os
+import clock
+
+SNAPSHOT_FILE     = "bartender_state.json"
+SNAPSHOT_INTERVAL = 1.0     # seconds between lazy writes while the menu moves
+
+
+class Snapshot(object):
+    def __init__(self, state = None, path = SNAPSHOT_FILE):
+        """
+        path: where writes go, None to keep the snapshot in memory only.
+        """
+        self.state = state or {}
+        self.path = path
+        self.dirty = False
+        self.written_at = 0.0
+
+    @classmethod
+    def load(cls, path = SNAPSHOT_FILE):
+        """
+        The snapshot a previous run left behind (empty if none, or unreadable).
+        """
+        try:
+            with open(path) as f:
+                return cls(json.load(f), path)
+        except (OSError, ValueError):
+            return cls(path=path)
+
+    def get(self, key, default = None):
+        return self.state.get(key, default)
+
+    def set(self, key, value):
+        """
+        Change one entry; written by the next flush().
+        """
+        if value is None:
+            self.state.pop(key, None)
+        else:
+            self.state[key] = value
+        self.dirty = True
+
+    def save(self, **entries):
+        """
+        Change entries (None removes one) and write the snapshot now.
+        """
+        for key, value in entries.items():
+            self.set(key, value)
+        self._write()
+
+    def flush(self):
+        """
+        Write pending changes if the last write is more than SNAPSHOT_INTERVAL old.
+        """
+        if self.dirty and clock.monotonic() - self.written_at >= SNAPSHOT_INTERVAL:
+            self._write()
+
+    def _write(self):
+        self.dirty = False
+        self.written_at = clock.monotonic()
+        if self.path is None:
+            return
+        self.state["saved_at"] = clock.time()
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
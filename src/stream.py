@@ -0,0 +1,152 @@
+# stream.py
+"""
+Live machine state for staff screens, as a server-sent-events stream.
+
+The bartender publishes what it is doing into one LiveState: the order and
+its phase, each pump's target and delivered mL, the progress, the last scale
+reading. update() only swaps in a new copy of the fields and bumps a version,
+so the pour loop never waits on a client.
+
+StreamServer serves that state on localhost with asyncio:
+
+    GET /events    text/event-stream, one "data: {json}" event per change
+    GET /state     the current state as one JSON document
+
+Every version is encoded to JSON once, however many clients are listening.
+Each client is sent only the newest version when it is ready for more and at
+most STREAM_RATE times a second, so a slow client skips intermediate states
+instead of queueing them, and never slows down anyone else.
+"""
+import asyncio
+import json
+import threading
+
+# ————— CONFIG ————— #
+STREAM_HOST   = "127.0.0.1"   # localhost only: a kiosk or a reverse proxy can forward it
+STREAM_PORT   = 8765
+STREAM_RATE   = 10            # events per second per client at most
+HEARTBEAT     = 15.0          # seconds of silence before a keep-alive comment
+# —————————————— #
+
+
+class LiveState(object):
+    def __init__(self, **fields):
+        self.lock = threading.Lock()
+        self.fields = dict(fields)
+        self.version = 0
+        self.listeners = []         # functions() called after every update
+
+    def update(self, **fields):
+        """
+        Change some fields. Cheap and non-blocking: called from the pour loop.
+        """
+        with self.lock:
+            self.fields = dict(self.fields, **fields)
+            self.version += 1
+        for changed in self.listeners:
+            changed()
+
+    def snapshot(self):
+        """
+        (version, fields); the fields dict is never modified afterwards.
+        """
+        with self.lock:
+            return self.version, self.fields
+
+
+class StreamServer(object):
+    def __init__(self, state, host = STREAM_HOST, port = STREAM_PORT):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.changed = None
+        self.frame = (-1, b"", b"")   # (version, SSE event, JSON) of the newest state
+        self.clients = 0
+
+    def start(self):
+        # a plain thread: asyncio waits in select(), outside any virtual clock
+        threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True).start()
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.changed = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._client, self.host, self.port)
+        except OSError as e:
+            print(f"[WARNING] live stream not started on {self.host}:{self.port}: {e}")
+            return
+        # only a bound server hears about changes, and only while it is serving
+        self.state.listeners.append(self._changed)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.state.listeners.remove(self._changed)
+
+    def _changed(self):
+        # runs in the bartender's threads: the loop may have closed meanwhile
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass
+
+    def _wake(self):
+        # wake every waiting client at once, then start a fresh event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def _frame(self):
+        """
+        The newest state, encoded once per version for all clients.
+        """
+        version, fields = self.state.snapshot()
+        if version != self.frame[0]:
+            body = json.dumps(fields, separators=(",", ":")).encode()
+            self.frame = (version, b"id: %d\ndata: %s\n\n" % (version, body), body)
+        return self.frame
+
+    async def _client(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass                # headers: nothing in them matters here
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else ""
+            if path == "/events":
+                await self._events(writer)
+            elif path == "/state":
+                body = self._frame()[2]
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(body), body))
+                await writer.drain()
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _events(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        self.clients += 1
+        try:
+            sent = None
+            while True:
+                waiter = self.changed
+                version, event, _ = self._frame()
+                if version != sent:
+                    writer.write(event)
+                    await writer.drain()        # a slow client waits here, alone
+                    sent = version
+                    await asyncio.sleep(1.0 / STREAM_RATE)
+                    continue
+                try:
+                    await asyncio.wait_for(waiter.wait(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                    await writer.drain()
+        finally:
+            self.clients -= 1
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Discrete-event model of a busy night at one bartender.
+
+    python3 throughput.py                                # 4 h at 60 customers/hour
+    python3 throughput.py --rate 90 --hours 3 --clean-every 40
+    python3 throughput.py --loadout gin,tonic,coke,rum,vodka,tequila \\
+                          --loadout gin,tonic,coke,rum,vodka,oj
+
+Customers arrive at random, wait in one queue and order a drink from
+drink_list. If the drink can't be made from the loaded ingredients they go
+elsewhere; if they have waited longer than their patience they walk away.
+Otherwise the machine is busy for the whole makeDrink sequence: finding the
+drink in the menu, placing the glass, the size/strength/confirm pickers, the
+pour itself, and taking the glass away.
+
+The pour uses the real scaleRecipe/pumpSchedule and the bartender's FLOW_RATE,
+per-line priming and usage-based clean plan, so relay times are the ones the
+machine would use. Bottles run dry and are swapped (then that pump is primed again), and
+every --clean-every drinks the lines that were used are moved to water,
+flushed and re-primed.
+
+Nothing is poured and no hardware is needed; every loadout is run against the
+same customers (same seed) so the numbers are directly comparable.
+"""
+import sys
+import json
+import heapq
+import random
+import argparse
+import statistics
+from collections import deque, Counter
+
+from drinks import drink_list
+from recipes import ALCOHOLS, scaleRecipe, pumpSchedule
+from usage import PumpUsage
+from priming import PrimeState, PRIMED, DRAINED, SWAPPED
+
+# ————— DEFAULT WORKLOAD ————— #
+HOURS          = 4.0                # hours customers keep arriving
+RATE           = 60.0               # customers per hour
+PATIENCE       = 600.0              # seconds a customer will queue before leaving
+SHOT_FRACTION  = 0.2                # orders that are a 50 mL shot rather than 250 mL
+STRENGTHS      = (0.1, 0.2, 0.4, 0.2, 0.1)  # how often strength 1..5 is picked
+MENU_TIME      = (3.0, 6.0, 15.0)   # s (min, mode, max) deciding and confirming a drink
+PRESS_TIME     = 0.6                # s per NEXT/PREV press to reach the drink
+GLASS_TIME     = (2.0, 3.0, 8.0)    # s placing the glass on the beam
+DETECT_TIME    = 0.5                # s "Glass detected!" pause in makeDrink
+PICK_TIME      = (1.0, 2.0, 5.0)    # s per picker (size, strength, confirm)
+REMOVE_TIME    = (2.0, 3.0, 6.0)    # s taking the drink away
+SPIRIT_BOTTLE  = 700.0              # mL in a fresh spirit bottle
+MIXER_BOTTLE   = 2000.0             # mL in a fresh mixer bottle
+SWAP_TIME      = 45.0               # s to swap a bottle
+CLEAN_EVERY    = 0                  # drinks between clean cycles (0 = never)
+CLEAN_SETUP    = 90.0               # s moving the lines to water and back
+# ———————————————————————————— #
+
+SIZES = (50.0, 250.0)
+
+# Event kinds
+ARRIVE = 0
+FREE   = 1
+
+# What the machine spends its time on
+ACTIVITIES = ("menu", "glass", "pour", "swap", "prime", "clean")
+
+
+def triangular(rng, spec):
+    low, mode, high = spec
+    return rng.triangular(low, high, mode)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def withLoadout(pump_configuration, loadout):
+    """
+    A copy of the pump configuration with pump n holding loadout[n].
+    """
+    pumps = sorted(pump_configuration)
+    if len(loadout) != len(pumps):
+        raise ValueError(f"loadout needs {len(pumps)} ingredients, got {len(loadout)}")
+    return {key: dict(pump_configuration[key], value=ing)
+            for key, ing in zip(pumps, loadout)}
+
+
+def customers(rng, drinks, hours, rate):
+    """
+    Arrival time, drink, glass volume and strength for every customer of the night.
+    Drawn once so that every loadout sees exactly the same crowd.
+    """
+    crowd = []
+    t = rng.expovariate(rate / 3600.0)
+    while t < hours * 3600.0:
+        crowd.append({
+            "arrival":   t,
+            "drink":     rng.choice(drinks),
+            "glass_vol": SIZES[0] if rng.random() < SHOT_FRACTION else SIZES[1],
+            "strength":  rng.choices(range(1, 6), weights=STRENGTHS)[0],
+            "patience":  rng.expovariate(1.0 / PATIENCE),
+        })
+        t += rng.expovariate(rate / 3600.0)
+    return crowd
+
+
+def flowRate():
+    """
+    The bartender's FLOW_RATE. Importing bartender needs GPIO, so the simulated
+    hardware is installed first unless bartender is already loaded; nothing is driven.
+    """
+    if "bartender" not in sys.modules:
+        import simhw
+        simhw.install()
+    import bartender
+    return bartender.FLOW_RATE
+
+
+class Night(object):
+    def __init__(self, pump_configuration, drinks, flow_rate = None,
+                 clean_every = CLEAN_EVERY, seed = 1):
+        self.pumps = pump_configuration
+        self.drinks = drinks
+        self.flow_rate = flow_rate or flowRate()
+        self.clean_every = clean_every
+        self.rng = random.Random(seed)
+
+        self.loaded = {p["value"] for p in self.pumps.values()}
+        self.menu = [d for d in drinks if all(ing in self.loaded for ing in d["ingredients"])]
+        self.bottle = {p["pin"]: self.bottleSize(p["value"]) for p in self.pumps.values()}
+        self.left = dict(self.bottle)
+
+        self.now = 0.0
+        self.events = []
+        self.seq = 0
+        self.queue = deque()
+        self.busy = False
+        self.since_clean = 0
+        self.usage = PumpUsage(path=None)
+        self.priming = PrimeState(path=None)
+        self.keys = {p["pin"]: key for key, p in self.pumps.items()}
+
+        self.waits = []
+        self.served = 0
+        self.turned_away = 0
+        self.walked_away = 0
+        self.max_queue = 0
+        self.busy_time = Counter()
+        self.on_time = Counter()        # pin -> seconds the relay was on
+        self.poured = Counter()         # ingredient -> mL
+        self.swaps = Counter()          # pin -> bottles swapped
+
+    @staticmethod
+    def bottleSize(ingredient):
+        return SPIRIT_BOTTLE if ingredient in ALCOHOLS else MIXER_BOTTLE
+
+    def schedule(self, when, kind, data = None):
+        self.seq += 1
+        heapq.heappush(self.events, (when, self.seq, kind, data))
+
+    def run(self, crowd):
+        # the night starts with priming every line
+        self.schedule(self.prime(), FREE)
+        self.busy = True
+        for customer in crowd:
+            self.schedule(customer["arrival"], ARRIVE, customer)
+
+        while self.events:
+            self.now, _, kind, data = heapq.heappop(self.events)
+            if kind == ARRIVE:
+                if data["drink"] not in self.menu:
+                    self.turned_away += 1
+                    continue
+                self.queue.append(data)
+                self.max_queue = max(self.max_queue, len(self.queue))
+            else:
+                self.busy = False
+            if not self.busy:
+                self.serveNext()
+        return self
+
+    def serveNext(self):
+        while self.queue:
+            customer = self.queue.popleft()
+            waited = self.now - customer["arrival"]
+            if waited > customer["patience"]:
+                self.walked_away += 1
+                continue
+            self.waits.append(waited)
+            self.busy = True
+            self.schedule(self.now + self.makeDrink(customer), FREE)
+            return
+
+    def spend(self, activity, seconds):
+        self.busy_time[activity] += seconds
+        return seconds
+
+    def prime(self):
+        """
+        Prime every line that needs it, together, as prime_pumps does.
+        Returns seconds taken.
+        """
+        schedule, dispenses, keys = self.priming.primeSchedule(self.pumps, self.flow_rate)
+        volumes = {pin: ml for pin, (ml, _) in zip(schedule, dispenses)}
+        for pin, t in schedule.items():
+            self.on_time[pin] += t
+            self.left[pin] -= volumes[pin]
+        self.recordUsage(volumes)
+        self.priming.mark(keys, PRIMED)
+        return self.spend("prime", max(schedule.values(), default=0.0))
+
+    def recordUsage(self, volumes):
+        """
+        {pin: mL} went through those lines, for the next clean.
+        """
+        for key, p in self.pumps.items():
+            if p["pin"] in volumes:
+                self.usage.record(key, p["value"], volumes[p["pin"]], when=self.now)
+
+    def makeDrink(self, customer):
+        """
+        Machine time for one customer, from finding the drink to taking it away.
+        """
+        rng = self.rng
+        drink = customer["drink"]
+        position = self.menu.index(drink)
+        presses = min(position, len(self.menu) - position)
+        taken = self.spend("menu", triangular(rng, MENU_TIME) + presses * PRESS_TIME)
+        taken += self.spend("glass", triangular(rng, GLASS_TIME) + DETECT_TIME)
+        taken += self.spend("menu", sum(triangular(rng, PICK_TIME) for _ in range(3)))
+
+        scaled = scaleRecipe(drink["ingredients"], customer["glass_vol"], customer["strength"])
+        schedule, _ = pumpSchedule(scaled, self.pumps, self.flow_rate)
+
+        # swap any bottle that can't cover its share, then re-prime that line
+        empty = [pin for pin, t in schedule.items() if self.left[pin] < t / self.flow_rate]
+        if empty:
+            for pin in empty:
+                self.swaps[pin] += 1
+                self.left[pin] = self.bottle[pin]
+            taken += self.spend("swap", SWAP_TIME * len(empty))
+            self.priming.mark([self.keys[pin] for pin in empty], SWAPPED)
+            taken += self.prime()
+
+        for pin, t in schedule.items():
+            self.on_time[pin] += t
+            self.left[pin] -= t / self.flow_rate
+        self.recordUsage({pin: t / self.flow_rate for pin, t in schedule.items()})
+        for ing, vol in scaled.items():
+            self.poured[ing] += vol
+        taken += self.spend("pour", max(schedule.values(), default=0.0))
+        taken += self.spend("glass", triangular(rng, REMOVE_TIME))
+        self.served += 1
+
+        self.since_clean += 1
+        if self.clean_every and self.since_clean >= self.clean_every:
+            self.since_clean = 0
+            taken += self.clean()
+        return taken
+
+    def clean(self):
+        """
+        The lines used since the last clean to water, flushed for their
+        usage-based times (as Bartender.clean does), back and re-primed.
+        """
+        schedule, _, keys = self.usage.cleanSchedule(self.pumps, self.flow_rate, self.now)
+        if not schedule:
+            return 0.0
+        for pin, t in schedule.items():
+            self.on_time[pin] += t
+        self.usage.cleaned(keys)
+        self.priming.mark(keys, DRAINED)
+        taken = self.spend("clean", CLEAN_SETUP + max(schedule.values()))
+        return taken + self.prime()
+
+    def report(self, hours):
+        makespan = max(self.now, hours * 3600.0)
+        names = {p["pin"]: f"{p['name']} ({p['value']})" for p in self.pumps.values()}
+        return {
+            "menu_drinks":      len(self.menu),
+            "served":           self.served,
+            "turned_away":      self.turned_away,
+            "walked_away":      self.walked_away,
+            "drinks_per_hour":  self.served / (makespan / 3600.0),
+            "wait_p50_s":       percentile(self.waits, 50),
+            "wait_p90_s":       percentile(self.waits, 90),
+            "wait_p99_s":       percentile(self.waits, 99),
+            "wait_mean_s":      statistics.mean(self.waits) if self.waits else 0.0,
+            "max_queue":        self.max_queue,
+            "last_drink_h":     self.now / 3600.0,
+            "machine_busy":     sum(self.busy_time.values()) / makespan,
+            "time_split":       {a: self.busy_time[a] / makespan for a in ACTIVITIES},
+            "pump_utilisation": {names[pin]: self.on_time[pin] / makespan for pin in self.bottle},
+            "bottle_swaps":     {names[pin]: self.swaps[pin] for pin in self.bottle},
+            "poured_ml":        dict(self.poured),
+        }
+
+
+def simulate(pump_configuration, drinks = drink_list, hours = HOURS, rate = RATE,
+             flow_rate = None, clean_every = CLEAN_EVERY, seed = 1):
+    """
+    Run one night for a pump configuration and return the report dict.
+    """
+    crowd = customers(random.Random(seed), drinks, hours, rate)
+    night = Night(pump_configuration, drinks, flow_rate, clean_every, seed)
+    return night.run(crowd).report(hours)
+
+
+def printReport(title, report):
+    print(title)
+    for key, value in report.items():
+        if isinstance(value, dict):
+            print(f"  {key}")
+            for name, v in value.items():
+                print(f"    {name:28s} {v:10.2f}")
+        elif isinstance(value, float):
+            print(f"  {key:30s} {value:10.2f}")
+        else:
+            print(f"  {key:30s} {value:10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hours", type=float, default=HOURS)
+    parser.add_argument("--rate", type=float, default=RATE, help="customers per hour")
+    parser.add_argument("--flow-rate", type=float, default=None,
+                        help=f"seconds per mL (default FLOW_RATE = {flowRate()})")
+    parser.add_argument("--clean-every", type=int, default=CLEAN_EVERY,
+                        help="drinks between clean cycles, 0 for none")
+    parser.add_argument("--loadout", action="append", default=[],
+                        help="comma-separated ingredient per pump, in pump order; repeat to compare")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--config", default="pump_config.json")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        pumps = json.load(f)
+    loadouts = [withLoadout(pumps, l.split(",")) for l in args.loadout] or [pumps]
+
+    for configuration in loadouts:
+        title = ", ".join(configuration[key]["value"] for key in sorted(configuration))
+        report = simulate(configuration, hours=args.hours, rate=args.rate,
+                          flow_rate=args.flow_rate, clean_every=args.clean_every,
+                          seed=args.seed)
+        printReport(title, report)
+        print()
+
+
+if __name__ == "__main__":
+    main()
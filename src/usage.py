@@ -0,0 +1,110 @@
+# usage.py
+"""
+What each pump has pumped since its line was last cleaned, and the clean
+cycle that follows from it.
+
+Every pour is recorded per pump: how much went through, whether any of it was
+a sugary mixer, and when the line was last used. cleanSchedule() turns that
+into relay times: lines that haven't pumped anything since their last clean
+are left alone, a line that only held spirit gets a short rinse, and a sugary
+line gets more, growing with the volume pumped and with how long the syrup has
+been sitting in the tube. Kept in pump_usage.json so a restart doesn't forget
+which lines are dirty.
+"""
+import json
+import os
+import clock
+from recipes import SUGARY, flowRate
+
+USAGE_FILE     = "pump_usage.json"
+LINE_VOLUME    = 8.0       # mL of liquid standing in one pump's tubing
+RINSE_VOLUMES  = 2.0       # line volumes of water for a line that only held spirit
+SUGAR_VOLUMES  = 4.0       # ... for a line that held a sugary mixer
+SUGAR_PER_L    = 0.25      # extra line volumes per litre of sugary mixer pumped
+IDLE_LIMIT     = 4 * 3600  # seconds a sugary line may stand before it starts to dry out
+IDLE_VOLUMES   = 2.0       # extra line volumes for a sugary line left longer than that
+MAX_VOLUMES    = 10.0      # never flush a line for more than this many line volumes
+
+
+def lineVolume(pump):
+    """
+    mL standing in this pump's tubing: its own "line_ml" in pump_config.json, else LINE_VOLUME.
+    """
+    return pump.get("line_ml", LINE_VOLUME)
+
+
+class PumpUsage(object):
+    def __init__(self, pumps = None, path = USAGE_FILE):
+        """
+        pumps: {pump key: {"volume": mL, "sugary": bool, "last_used": time}},
+        only for pumps that have pumped since their last clean.
+        path:  where save() writes, None to keep it in memory only.
+        """
+        self.pumps = pumps or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path = USAGE_FILE):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls(json.load(f), path)
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.pumps, f, indent=2)
+
+    def record(self, key, ingredient, ml, when = None):
+        """
+        `ml` of `ingredient` went through pump `key`.
+        """
+        if ml <= 0:
+            return
+        entry = self.pumps.setdefault(key, {"volume": 0.0, "sugary": False, "last_used": 0.0})
+        entry["volume"] += ml
+        entry["sugary"] = entry["sugary"] or ingredient in SUGARY
+        entry["last_used"] = clock.time() if when is None else when
+
+    def cleaned(self, keys):
+        for key in keys:
+            self.pumps.pop(key, None)
+
+    def isDirty(self, key):
+        return key in self.pumps
+
+    def flushVolumes(self, key, now = None):
+        """
+        Line volumes of water pump `key` needs to be clean again (0 if it already is).
+        """
+        entry = self.pumps.get(key)
+        if not entry:
+            return 0.0
+        if not entry["sugary"]:
+            volumes = RINSE_VOLUMES
+        else:
+            volumes = SUGAR_VOLUMES + SUGAR_PER_L * entry["volume"] / 1000.0
+            idle = (clock.time() if now is None else now) - entry["last_used"]
+            if idle > IDLE_LIMIT:
+                volumes += IDLE_VOLUMES
+        return min(volumes, MAX_VOLUMES)
+
+    def cleanSchedule(self, pump_configuration, flow_rate, now = None):
+        """
+        Relay times for a clean cycle, in the same shape as recipes.pumpSchedule.
+
+        returns (schedule {pin: seconds}, dispenses [(mL, seconds), ...], keys cleaned)
+        """
+        schedule = {}
+        dispenses = []
+        keys = []
+        for key, p in pump_configuration.items():
+            ml = self.flushVolumes(key, now) * lineVolume(p)
+            if ml <= 0:
+                continue
+            t = ml * flowRate(p, flow_rate)
+            schedule[p["pin"]] = t
+            dispenses.append((ml, t))
+            keys.append(key)
+        return schedule, dispenses, keys
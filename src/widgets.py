@@ -0,0 +1,140 @@
+# widgets.py
+"""
+Small event-driven OLED widgets.
+
+A widget holds its own state, updates it from button events and only asks to
+be redrawn when that state changes. runWidget() drives one to completion from
+a ButtonInput (or anything with the same get(timeout) method), so the same
+picker works in makeDrink, clean and at start-up, and runs at full speed when
+fed scripted events.
+"""
+from inputs import CONFIRM, CANCEL, NEXT, PREV
+
+# How often runWidget wakes with no input to check its idle callback
+IDLE_INTERVAL = 0.1
+
+
+class Widget(object):
+    def __init__(self):
+        self.dirty = True      # needs a redraw
+        self.done = False
+        self.result = None
+
+    def handle(self, event):
+        """
+        Update state for a button event. Set self.dirty when the screen changes.
+        """
+        raise NotImplementedError
+
+    def render(self, draw):
+        """
+        Draw the widget onto a luma canvas.
+        """
+        raise NotImplementedError
+
+    def finish(self, result):
+        self.done = True
+        self.result = result
+
+
+class ChoicePicker(Widget):
+    def __init__(self, title, choices, selected = 0, detail = None):
+        """
+        choices: list of (label, value). CONFIRM returns the value, CANCEL returns None.
+        detail:  optional function(value) -> text for the bottom line
+        """
+        Widget.__init__(self)
+        self.title = title
+        self.choices = choices
+        self.selected = selected
+        self.detail = detail
+
+    def handle(self, event):
+        if event == NEXT:
+            self.selected = (self.selected + 1) % len(self.choices)
+            self.dirty = True
+        elif event == PREV:
+            self.selected = (self.selected - 1) % len(self.choices)
+            self.dirty = True
+        elif event == CONFIRM:
+            self.finish(self.choices[self.selected][1])
+        elif event == CANCEL:
+            self.finish(None)
+
+    def render(self, draw):
+        label, value = self.choices[self.selected]
+        draw.text((0,  5), self.title, fill="white")
+        draw.text((0, 25), f"< {label} >", fill="white")
+        if self.detail:
+            draw.text((0, 45), self.detail(value), fill="white")
+
+
+class NumberStepper(Widget):
+    def __init__(self, title, value, minimum, maximum, step = 1, detail = None):
+        """
+        Steps `value` within [minimum, maximum]. CONFIRM returns it, CANCEL returns None.
+        """
+        Widget.__init__(self)
+        self.title = title
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.detail = detail
+
+    def handle(self, event):
+        if event in (NEXT, PREV):
+            delta = self.step if event == NEXT else -self.step
+            value = min(self.maximum, max(self.minimum, self.value + delta))
+            if value != self.value:
+                self.value = value
+                self.dirty = True
+        elif event == CONFIRM:
+            self.finish(self.value)
+        elif event == CANCEL:
+            self.finish(None)
+
+    def render(self, draw):
+        draw.text((0,  5), self.title, fill="white")
+        draw.text((0, 25), f"< {self.value} >", fill="white")
+        if self.detail:
+            draw.text((0, 45), self.detail(self.value), fill="white")
+
+
+class ConfirmDialog(Widget):
+    def __init__(self, *lines):
+        """
+        Shows up to three lines of text. CONFIRM returns True, CANCEL returns False.
+        """
+        Widget.__init__(self)
+        self.lines = lines
+
+    def handle(self, event):
+        if event == CONFIRM:
+            self.finish(True)
+        elif event == CANCEL:
+            self.finish(False)
+
+    def render(self, draw):
+        for i, line in enumerate(self.lines):
+            draw.text((0, 10 + 20*i), line, fill="white")
+
+
+def runWidget(widget, buttons, show, idle = None):
+    """
+    Run `widget` until it finishes and return its result.
+
+    buttons: event source with get(timeout) -> event name or None
+    show:    function(render) that draws render(draw) on the display
+    idle:    optional function() -> True to abort (the widget then returns None)
+    """
+    while not widget.done:
+        if widget.dirty:
+            widget.dirty = False
+            show(widget.render)
+        event = buttons.get(timeout=IDLE_INTERVAL)
+        if event is not None:
+            widget.handle(event)
+        elif idle and idle():
+            widget.finish(None)
+    return widget.result
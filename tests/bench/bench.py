@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the bartender's hot paths, run on the simulated hardware.
+
+Covers menu navigation on large menus, drink filtering and pump-selection
+marking, recipe scaling, the loadout search, the menu's memory per drink, OLED
+frame and progress-bar rendering, reading several load cells over one clock
+line, and complete simulated pours. Results are
+written as JSON so runs on the Pi and on x86, or before and after a change,
+can be compared:
+
+    python3 tests/bench/bench.py -o before.json
+    python3 tests/bench/bench.py -o after.json
+    python3 tests/bench/bench.py --compare before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import statistics
+import atexit
+import shutil
+import tempfile
+import tracemalloc
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+sys.path.insert(0, SRC)
+
+import simhw
+sim = simhw.install()
+
+# Bartender reads pump_config.json from the working directory and writes its
+# usage, order history, glasses and snapshot there: a scratch copy, so a run on
+# the Pi leaves the machine's own state alone
+START_DIR = os.getcwd()
+WORKDIR = tempfile.mkdtemp(prefix="bench-")
+atexit.register(shutil.rmtree, WORKDIR, ignore_errors=True)
+shutil.copy(os.path.join(SRC, "pump_config.json"), WORKDIR)
+os.chdir(WORKDIR)
+import bartender as bt
+from drinks import drink_list, drink_options
+from recipes import scaleRecipe
+from loadout import bestLoadout
+from catalog import Catalog
+from recipematrix import RecipeMatrix, np
+from inputs import CONFIRM
+from loadcell import HX711Bank, HX711Reader
+
+# ————— CONFIG ————— #
+MENU_SIZES   = (100, 1000, 10000)   # drinks in the synthetic catalogs
+BAR_SIZE     = 48                    # ingredients behind a large bar, for the loadout search
+REPEAT       = 7                     # timed batches per benchmark
+POUR_REPEAT  = 3                     # simulated pours
+POUR_FLOW    = 0.002                 # s/mL during simulated pours (310 mL in 0.6 s)
+LOADCELLS    = ((17, 21), (27, 20), (26, 7), (19, 8))   # (DOUT, own SCK) of the extra cells
+REGRESSION   = 1.10                  # --compare flags anything 10% slower
+# —————————————— #
+
+WORDS = ["Rum", "Gin", "Vodka", "Tequila", "Sunrise", "Tonic", "Coke", "Mule",
+         "Island", "Sour", "Fizz", "Breeze", "Punch", "Spritz", "Smash", "Storm"]
+
+
+def makeCatalog(n, seed = 1, values = None):
+    """
+    A deterministic synthetic drink_list of `n` drinks over the drink_options
+    (or over the ingredient `values` given).
+    """
+    rng = random.Random(seed)
+    values = values or [opt["value"] for opt in drink_options]
+    catalog = []
+    for i in range(n):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        picked = rng.sample(values, rng.randint(1, 4))
+        catalog.append({
+            "name": name,
+            "ingredients": {ing: rng.choice((15, 25, 50, 100, 150)) for ing in picked}
+        })
+    return catalog
+
+
+def measure(fn, number, repeat = REPEAT):
+    """
+    Time `number` calls of fn() `repeat` times; statistics are per call in microseconds.
+    """
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number * 1e6)
+    per_call.sort()
+    return {
+        "calls":     number * repeat,
+        "mean_us":   statistics.mean(per_call),
+        "median_us": statistics.median(per_call),
+        "min_us":    per_call[0],
+        "max_us":    per_call[-1],
+    }
+
+
+def benchMenus(bartender, results):
+    for size in MENU_SIZES:
+        catalog = makeCatalog(size)
+        bartender.buildMenu(catalog, drink_options)
+        ctx = bartender.menuContext
+        main = ctx.topLevelMenu
+        settings = next(item for item in main.options if item.name == "Settings")
+        number = max(10, 20000 // size)
+
+        results[f"menu.advance[{size}]"] = measure(ctx.advance, number)
+
+        def select_settings():
+            ctx.setMenu(main)
+            main.selectedOption = main.options.index(settings)
+            ctx.select()
+        results[f"menu.select[{size}]"] = measure(select_settings, number)
+        ctx.setMenu(main)
+
+        results[f"filterDrinks[{size}]"] = measure(lambda: bartender.filterDrinks(main), number)
+        results[f"selectConfigurations[{size}]"] = measure(
+            lambda: bartender.selectConfigurations(main), number)
+
+
+class DictItem(object):
+    """
+    menu.MenuItem before catalog.py: a __dict__ per entry, and a drink's attributes
+    held {'ingredients': ...} pointing at its drink_list recipe.
+    """
+    def __init__(self, type, name, attributes = None, visible = True):
+        self.type = type
+        self.name = name
+        self.attributes = attributes
+        self.visible = visible
+
+
+def traced(build):
+    """
+    Bytes still allocated by build() once it returns (whatever it built is kept alive).
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def benchMemory(results):
+    """
+    The menu's memory per drink, on a Bartender of its own: the other benchmarks'
+    menu is never replaced, and there is no old menu to free while tracing.
+    """
+    size = MENU_SIZES[-1]
+    catalog = makeCatalog(size)
+    bartender = bt.Bartender()
+
+    def build_menu():
+        bartender.buildMenu(catalog, drink_options)
+        return bartender.menuContext
+    def build_old():
+        # buildMenu's drink entries before catalog.py
+        return [DictItem('drink', d["name"], {'ingredients': d["ingredients"]})
+                for d in catalog]
+    for name, build in (("menu", build_menu), ("oldMenu", build_old)):
+        total = traced(build)
+        results[f"memory.{name}[{size}]"] = {"bytes": total, "bytes_per_drink": total / size}
+
+
+def benchRecipes(bartender, results):
+    catalog = makeCatalog(1000)
+
+    def scale_all():
+        for drink in catalog:
+            scaleRecipe(drink["ingredients"], 250.0, 3)
+    stats = measure(scale_all, 10)
+    results["scaleRecipe[1000]"] = stats
+
+    # the same maths for a whole catalog at once (needs NumPy)
+    if np is not None:
+        size = MENU_SIZES[-1]
+        matrix = RecipeMatrix(Catalog(makeCatalog(size)))
+        loaded = bartender.loadedIngredients()
+        levels = {ing: 500.0 for ing in loaded}
+        results[f"recipeMatrix.scaled[{size}]"] = measure(lambda: matrix.scaled(250.0, 3), 10)
+        results[f"recipeMatrix.available[{size}]"] = measure(
+            lambda: matrix.available(loaded, levels, 250.0, 3), 10)
+        results["recipeMatrix.scaleRow"] = measure(lambda: matrix.scaleRow(0, 250.0, 3), 1000)
+
+    pumps = len(bartender.pump_configuration)
+    results["bestLoadout[1000]"] = measure(lambda: bestLoadout(catalog, pumps), 10)
+    bar = makeCatalog(10000, values=[f"ing{i}" for i in range(BAR_SIZE)])
+    results[f"bestLoadout[10000x{BAR_SIZE}]"] = measure(lambda: bestLoadout(bar, pumps), 1, repeat=3)
+
+
+def benchRendering(bartender, results):
+    item = bartender.menuContext.topLevelMenu.getSelection()
+    # posting is instant; time the frame until the render thread has drawn it,
+    # without the frame-rate cap
+    interval, bartender.display.interval = bartender.display.interval, 0.0
+    def menu_frame():
+        bartender.displayMenuItem(item)
+        bartender.display.flush()
+    results["render.menuItem"] = measure(menu_frame, 200)
+
+    def progress_frame():
+        bartender.show(lambda draw: bartender.drawProgress(draw, 123.0, 250.0, 123.0 / 250.0))
+        bartender.display.flush()
+    results["render.progressBar"] = measure(progress_frame, 200)
+    bartender.display.interval = interval
+
+
+def benchLoadcells(bartender, results):
+    """
+    Clocking one frame out of every extra cell: all on one SCK (HX711Bank)
+    against one HX711Reader per cell, read one after the other.
+    """
+    for dout, sck in LOADCELLS:
+        sim.addLoadCell(dout, LOADCELLS[0][1])
+        sim.addLoadCell(dout + 100, sck)            # not a real pin: the separate chips
+    bank = HX711Bank([dout for dout, _ in LOADCELLS], LOADCELLS[0][1])
+    readers = [HX711Reader(dout + 100, sck) for dout, sck in LOADCELLS]
+    n = len(LOADCELLS)
+    results[f"loadcell.bank[{n}]"] = measure(bank._shift, 100)
+    results[f"loadcell.sequential[{n}]"] = measure(lambda: [r._shift() for r in readers], 100)
+
+
+def benchPours(bartender, results):
+    """
+    Full makeDrink runs with scripted buttons; reports wall time and how far each
+    relay's on-time was from the planned pour time.
+    """
+    bt.FLOW_RATE = POUR_FLOW
+    pins = [p["pin"] for p in bartender.pump_configuration.values()]
+    sim.watchPumps(pins)
+    drink = drink_list[0]
+    planned = {}
+    # the large glass: recognised on the scale, so no size picker
+    for ing, vol in scaleRecipe(drink["ingredients"], bt.LARGE_CAPACITY, 3).items():
+        for p in bartender.pump_configuration.values():
+            if p["value"] == ing:
+                planned[p["pin"]] = vol * POUR_FLOW
+
+    walls, errors = [], []
+    for _ in range(POUR_REPEAT):
+        sim.placeGlass(bt.IR_PIN, bt.LARGE_EMPTY_WT)
+        bartender.glass.wait(2.0)                   # settled and confirmed on the scale
+        for _ in range(2):                          # strength, pour
+            bartender.buttons.push(CONFIRM)
+        since = time.monotonic()
+        bartender.makeDrink(drink["name"], drink["ingredients"])
+        walls.append(time.monotonic() - since)
+        for pin, t in planned.items():
+            errors.append(abs(sim.gpio.onTime(pin, since=since) - t) * 1000)
+        sim.removeGlass(bt.IR_PIN)
+
+    results["pour.makeDrink"] = {
+        "calls":          POUR_REPEAT,
+        "planned_s":      max(planned.values()),
+        "mean_wall_s":    statistics.mean(walls),
+        "max_relay_error_ms":  max(errors),
+        "mean_relay_error_ms": statistics.mean(errors),
+    }
+
+
+def meta():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "host":     socket.gethostname(),
+        "machine":  platform.machine(),
+        "python":   platform.python_version(),
+        "revision": rev,
+        "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pil":      simhw.Image is not None,
+    }
+
+
+def compare(old_file, new_file):
+    with open(old_file) as f:
+        old = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+    print(f"{'benchmark':32s} {'old':>12s} {'new':>12s}  ratio")
+    slower = 0
+    for name, stats in new["results"].items():
+        key = next(k for k in ("median_us", "bytes_per_drink", "mean_wall_s") if k in stats)
+        before = old["results"].get(name, {}).get(key)
+        after = stats[key]
+        if not before:
+            print(f"{name:32s} {'-':>12s} {after:12.2f}")
+            continue
+        ratio = after / before
+        flag = "  <-- slower" if ratio > REGRESSION else ""
+        slower += ratio > REGRESSION
+        print(f"{name:32s} {before:12.2f} {after:12.2f}  {ratio:5.2f}{flag}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", default=None,
+                        help="JSON file to write (default bench-<host>-<machine>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--skip-pours", action="store_true")
+    args = parser.parse_args()
+    cwd = os.environ.get("PWD", START_DIR)
+
+    if args.compare:
+        old, new = (os.path.join(cwd, f) for f in args.compare)
+        sys.exit(1 if compare(old, new) else 0)
+
+    info = meta()
+    results = {}
+    # first: its Bartender arms the button and beam callbacks, the one below re-arms them
+    benchMemory(results)
+
+    bartender = bt.Bartender()
+    # grams rather than raw counts, so the default glasses are recognised
+    bartender.hx.set_scale_ratio(simhw.SIM_SCALE_RATIO)
+    benchMenus(bartender, results)
+    benchRecipes(bartender, results)
+    benchRendering(bartender, results)
+    if not args.skip_pours:
+        benchPours(bartender, results)
+    benchLoadcells(bartender, results)
+
+    for name, stats in results.items():
+        if "median_us" in stats:
+            print(f"{name:32s} {stats['median_us']:12.2f} us")
+        elif "bytes_per_drink" in stats:
+            print(f"{name:32s} {stats['bytes_per_drink']:12.1f} B/drink")
+        else:
+            print(f"{name:32s} {stats['mean_wall_s']:9.3f} s wall, "
+                  f"relay error max {stats['max_relay_error_ms']:.2f} ms")
+
+    output = args.output or f"bench-{info['host']}-{info['machine']}.json"
+    output = os.path.join(cwd, output)
+    with open(output, "w") as f:
+        json.dump({"meta": info, "results": results}, f, indent=2)
+    print(f"\nwrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Emergency-stop stress test.
+
+Runs many concurrent pour threads against the real relay pins and fires the
+emergency stop over and over, checking that every relay reads back HIGH (off)
+within STOP_BOUND of the stop and that no pour manages to switch one back on
+while the stop is tripped.
+
+Disconnect the pumps (or leave the lines dry) before running. For a true
+press-to-off measurement, wire a spare GPIO to the CANCEL button input and
+pass it with --loopback; the test then "presses" CANCEL through that wire and
+the stop goes through the real edge callback.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import RPi.GPIO as GPIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+from estop import EmergencyStop, STOP_BOUND, SWITCH_INTERVAL
+from relays import RelayBank
+
+# ————— CONFIG ————— #
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src", "pump_config.json")
+BTN_CANCEL  = 6      # as wired in bartender.py
+POURS       = 48     # concurrent pour threads
+STOPS       = 200    # emergency stops to fire
+HOLD_TIME   = 0.02   # seconds to watch the relays after each stop
+# —————————————— #
+
+
+def pour_worker(estop, relays, quit):
+    """Start random pours on the bank as fast as the pour loop would."""
+    while not quit.is_set():
+        pins = random.sample(relays.pins, random.randint(1, len(relays.pins)))
+        schedule = {pin: random.uniform(0.001, 0.05) for pin in pins}
+        if not relays.run(schedule, estop.tripped):
+            time.sleep(0.001)
+
+
+def all_off(pins):
+    return all(GPIO.input(pin) == GPIO.HIGH for pin in pins)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pours", type=int, default=POURS)
+    parser.add_argument("--stops", type=int, default=STOPS)
+    parser.add_argument("--loopback", type=int, default=None,
+                        help="BCM pin wired to the CANCEL input")
+    args = parser.parse_args()
+    sys.setswitchinterval(SWITCH_INTERVAL)      # as bartender.py runs
+
+    with open(CONFIG_FILE) as f:
+        pins = [p["pin"] for p in json.load(f).values()]
+
+    GPIO.setwarnings(False)
+    GPIO.setmode(GPIO.BCM)
+    for pin in pins:
+        GPIO.setup(pin, GPIO.OUT, initial=GPIO.HIGH)
+
+    relays = RelayBank(pins)
+    estop = EmergencyStop(relays)
+    if args.loopback is not None:
+        GPIO.setup(BTN_CANCEL, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        GPIO.setup(args.loopback, GPIO.OUT, initial=GPIO.LOW)
+        estop.arm(BTN_CANCEL)
+
+    quit = threading.Event()
+    workers = [threading.Thread(target=pour_worker, args=(estop, relays, quit), daemon=True)
+               for _ in range(args.pours)]
+    for w in workers:
+        w.start()
+
+    observed = []      # press -> all relays read back HIGH, seconds
+    leaks = 0          # relays seen LOW while the stop was tripped
+    try:
+        for i in range(args.stops):
+            time.sleep(random.uniform(0.02, 0.1))   # let the pours get going
+            pressed = time.monotonic()
+            if args.loopback is not None:
+                GPIO.output(args.loopback, GPIO.HIGH)
+            else:
+                estop.trigger(pressed)
+            while not all_off(pins):
+                if time.monotonic() - pressed > 1.0:
+                    break
+            observed.append(time.monotonic() - pressed)
+
+            # nobody may switch a relay back on while tripped
+            hold = time.monotonic()
+            while time.monotonic() - hold < HOLD_TIME:
+                if not all_off(pins):
+                    leaks += 1
+                    break
+
+            if args.loopback is not None:
+                GPIO.output(args.loopback, GPIO.LOW)
+                time.sleep(0.06)   # longer than the edge bouncetime
+            estop.reset()
+            print(f"{i+1}/{args.stops}  {observed[-1]*1000:6.2f} ms", end="\r", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        quit.set()
+        for w in workers:
+            w.join()
+        GPIO.cleanup()
+
+    observed.sort()
+    n = len(observed)
+    over = sum(1 for v in observed if v > STOP_BOUND)
+    print()
+    if n:
+        print(f"stops: {n}   pours: {args.pours}   bound: {STOP_BOUND*1000:.1f} ms")
+        print(f"observed  p50 {observed[n//2]*1000:.2f} ms   "
+              f"p99 {observed[min(n-1, int(n*0.99))]*1000:.2f} ms   max {observed[-1]*1000:.2f} ms")
+    print(f"recorded: {estop.summary()}")
+    print(f"over bound: {over}   relays back on while stopped: {leaks}")
+    print("PASS" if n and over == 0 and leaks == 0 else "FAIL")
+
+
+if __name__ == "__main__":
+    main()
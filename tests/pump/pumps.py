@@ -1,47 +1,109 @@
 import RPi.GPIO as GPIO
+import config # config.py contains the pump pins, priming times and flow rate
 import time
-from threading import Thread
+from threading import Thread, Event
 
 GPIO.setmode(GPIO.BCM)
 
+# How often pump workers publish what they have poured
+PUMP_TICK = 0.05
+# How often the caller of dispense() is handed the total (its frame rate)
+UI_INTERVAL = 1.0 / 30
+# Seconds to prime a pump that has no entry in config.PRIMING_TIME
+DEFAULT_PRIMING_TIME = 5
+
 def init_pumps():
     for pin in config.PUMP_PINS.values():
         GPIO.setup(pin, GPIO.OUT, initial=GPIO.HIGH)
 
 def prime_all():
-    """Run each pump for its priming time in sequence."""
-    for fluid, pin in config.PUMP_PINS.items():
-        duration = config.PRIMING_TIME[fluid]
-        GPIO.output(pin, GPIO.LOW)
-        time.sleep(duration)
-        GPIO.output(pin, GPIO.HIGH)
+    """Run every pump at once, stopping each after its priming time."""
+    times = {fluid: config.PRIMING_TIME.get(fluid, DEFAULT_PRIMING_TIME)
+             for fluid in config.PUMP_PINS}
+    order = sorted(config.PUMP_PINS.items(), key=lambda item: times[item[0]])
+    try:
+        for _, pin in order:
+            GPIO.output(pin, GPIO.LOW)
+        start = time.monotonic()
+        for fluid, pin in order:
+            remaining = start + times[fluid] - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            GPIO.output(pin, GPIO.HIGH)
+    finally:
+        # an error or Ctrl-C must not leave a pump running
+        for _, pin in order:
+            GPIO.output(pin, GPIO.HIGH)
 
-def dispense(ingredients, update_callback=None):
+
+class PourProgress:
     """
-    ingredients: dict of fluid->milliliters.
-    update_callback(percent_complete, poured_ml)
+    What every pump has poured so far. Each worker owns one slot and is the
+    only thread writing it; a float store is atomic, so no lock is needed and
+    a reader summing the slots always sees a recent value from every pump.
     """
-    total = sum(ingredients.values())
-    poured = 0
+    def __init__(self, ingredients):
+        self.fluids = list(ingredients)
+        self.target = [float(ml) for ml in ingredients.values()]
+        self.poured_ml = [0.0] * len(self.fluids)
+        self.total = sum(self.target)
+        self.finished = Event()
+
+    def set(self, slot, ml):
+        self.poured_ml[slot] = ml
+
+    def poured(self):
+        return sum(self.poured_ml)
+
+    def fraction(self):
+        return self.poured() / self.total if self.total else 1.0
+
 
+def start_dispense(ingredients):
+    """
+    Start one worker per fluid and return their PourProgress right away.
+    progress.finished is set once every pump has stopped.
+    """
+    progress = PourProgress(ingredients)
     threads = []
-    for fluid, ml in ingredients.items():
+    for slot, (fluid, ml) in enumerate(ingredients.items()):
         pin = config.PUMP_PINS[fluid]
-        t = Thread(target=_run_pump, args=(pin, ml, update_callback, lambda: poured))
+        t = Thread(target=_run_pump, args=(pin, ml, progress, slot), daemon=True)
         threads.append(t)
         t.start()
 
-    for t in threads:
-        t.join()
+    def finish():
+        for t in threads:
+            t.join()
+        progress.finished.set()
+    Thread(target=finish, daemon=True).start()
+    return progress
+
+def dispense(ingredients, update_callback=None):
+    """
+    ingredients: dict of fluid->milliliters.
+    update_callback(poured_ml) is called from the calling thread at most every
+    UI_INTERVAL while pouring, and once more with the final total.
+    """
+    progress = start_dispense(ingredients)
+    while not progress.finished.wait(UI_INTERVAL):
+        if update_callback: update_callback(progress.poured())
+    if update_callback: update_callback(progress.poured())
+    return progress
 
-def _run_pump(pin, ml, cb, get_poured):
-    """Turn on pump pin for time proportional to ml."""
+def _run_pump(pin, ml, progress, slot):
+    """Turn on pump pin for time proportional to ml, publishing what it has poured."""
     rate = config.FLOW_RATE  # ml per second
     duration = ml / rate
     GPIO.output(pin, GPIO.LOW)
-    start = time.time()
-    while time.time() - start < duration:
-        poured = get_poured() + rate * (time.time() - start)
-        if cb: cb(poured)
-        time.sleep(0.1)
-    GPIO.output(pin, GPIO.HIGH)
+    start = time.monotonic()
+    try:
+        while True:
+            elapsed = time.monotonic() - start
+            if elapsed >= duration:
+                break
+            progress.set(slot, rate * elapsed)
+            time.sleep(min(PUMP_TICK, duration - elapsed))
+    finally:
+        GPIO.output(pin, GPIO.HIGH)
+    progress.set(slot, float(ml))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Relay switch-skew benchmark across the six pump relays.
+
+Compares three ways of switching all pumps on:
+  loop    - one GPIO.output() per pin in a Python loop (old prime_pumps)
+  threads - one thread per pin, released together (old per-pump pour threads)
+  bank    - a single list write through RelayBank (what the bartender uses now)
+
+Skew is the time between the first and the last pin changing. For the list
+write the pins change inside one C call, so the duration of that call is an
+upper bound. Run with the pumps disconnected.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import RPi.GPIO as GPIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+from relays import RelayBank
+
+# ————— CONFIG ————— #
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src", "pump_config.json")
+ROUNDS      = 500
+# —————————————— #
+
+
+def skew_loop(pins):
+    stamps = []
+    for pin in pins:
+        GPIO.output(pin, GPIO.LOW)
+        stamps.append(time.perf_counter())
+    for pin in pins:
+        GPIO.output(pin, GPIO.HIGH)
+    return stamps[-1] - stamps[0]
+
+
+def skew_threads(pins):
+    barrier = threading.Barrier(len(pins) + 1)
+    stamps = [0.0] * len(pins)
+
+    def worker(i, pin):
+        barrier.wait()
+        GPIO.output(pin, GPIO.LOW)
+        stamps[i] = time.perf_counter()
+
+    threads = [threading.Thread(target=worker, args=(i, pin)) for i, pin in enumerate(pins)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    for t in threads:
+        t.join()
+    for pin in pins:
+        GPIO.output(pin, GPIO.HIGH)
+    return max(stamps) - min(stamps)
+
+
+def skew_bank(bank):
+    start = time.perf_counter()
+    bank.switch(on=bank.pins)
+    end = time.perf_counter()
+    bank.allOff()
+    return end - start
+
+
+def report(name, values):
+    values = sorted(values)
+    n = len(values)
+    print(f"{name:8s} median {values[n//2]*1e6:9.1f} us   "
+          f"p99 {values[min(n-1, int(n*0.99))]*1e6:9.1f} us   max {values[-1]*1e6:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args()
+
+    with open(CONFIG_FILE) as f:
+        pins = [p["pin"] for p in json.load(f).values()]
+
+    GPIO.setwarnings(False)
+    GPIO.setmode(GPIO.BCM)
+    for pin in pins:
+        GPIO.setup(pin, GPIO.OUT, initial=GPIO.HIGH)
+    bank = RelayBank(pins)
+
+    try:
+        print(f"{len(pins)} relays, {args.rounds} rounds each\n")
+        report("loop",    [skew_loop(pins) for _ in range(args.rounds)])
+        report("threads", [skew_threads(pins) for _ in range(args.rounds)])
+        report("bank",    [skew_bank(bank) for _ in range(args.rounds)])
+    finally:
+        GPIO.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,57 @@
 import RPi.GPIO as GPIO
 from hx711 import HX711
 import config # config.py contains the necessary GPIO pin definitions
-import time
+import threading
 
 GPIO.setmode(GPIO.BCM)
 
+# Beam edges are debounced, then confirmed once on the scale
+GLASS_BOUNCE_MS = 10
+GLASS_SETTLE = 0.05     # seconds the beam must stay broken
+GLASS_MIN_WT = 50       # grams, e.g., >50 grams
+
 # Infrared break‑beam sensor for glass detection
 GPIO.setup(config.IR_SENSOR_PIN, GPIO.IN)
 
 # Weight sensor (HX711) for backup glass detect & live volume
 hx = HX711(config.HX711_DT, config.HX711_SCK)
+hx_lock = threading.Lock()
+
+_present = threading.Event()
+_edge = threading.Event()
+
+def _on_edge(channel):
+    if GPIO.input(config.IR_SENSOR_PIN):   # beam restored = glass gone
+        _present.clear()
+    _edge.set()
+
+def _settler():
+    """Decide on placement after the beam settles; the only place the scale is read."""
+    while True:
+        _edge.wait()
+        _edge.clear()
+        if _edge.wait(GLASS_SETTLE):
+            continue
+        if GPIO.input(config.IR_SENSOR_PIN):
+            _present.clear()
+        elif not _present.is_set() and get_weight() > GLASS_MIN_WT:
+            _present.set()
 
 def is_glass_present():
-    """Return True if either IR beam is broken or weight > threshold."""
-    ir = not GPIO.input(config.IR_SENSOR_PIN)  # beam broken = 0
-    weight = hx.get_weight_mean(5)             # average of 5 readings
-    return ir or (weight > 50)  # e.g., >50 grams
+    """Return True if the IR beam is broken and the scale confirmed a glass (no I/O)."""
+    return _present.is_set()
+
+def wait_for_glass(timeout=None):
+    """Block until a glass is placed; wakes on the beam edge. True if present."""
+    return _present.wait(timeout)
 
 def get_weight():
     """Return current weight in grams."""
-    return hx.get_weight_mean(5)
+    with hx_lock:
+        return hx.get_weight_mean(5)
+
+# start watching only once everything the settler calls is defined
+GPIO.add_event_detect(config.IR_SENSOR_PIN, GPIO.BOTH, callback=_on_edge,
+                      bouncetime=GLASS_BOUNCE_MS)
+threading.Thread(target=_settler, daemon=True).start()
+_edge.set()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Analyse a raw load-cell recording made with record_adc.py:
+
+    python3 adc_analysis.py shift.adc
+    python3 adc_analysis.py shift.adc --ratio 420 --window 20
+
+The file is mapped straight into NumPy (nothing is copied or parsed), so hours
+of samples load instantly. Reported:
+
+  noise floor   spread of the signal while nothing changes on the plate
+  drift         how the empty-plate reading wanders over the recording
+  settling      how long after a glass breaks the beam the reading is stable,
+                and the settled glass weights, grouped, with suggested windows
+                for detect_glass_type
+  filters       residual noise and settling time of moving mean/median and of
+                block mean / median / outlier-filtered mean (the driver's filter)
+"""
+import argparse
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import adcfile
+
+DTYPE = np.dtype([("t", "<f8"), ("raw", "<i4"), ("flags", "<i4")])
+
+# ————— DEFAULTS ————— #
+NOISE_WINDOW = 20      # samples per window for the noise floor
+SETTLE_SKIP  = 3.0     # seconds after a beam change not counted as "quiet"
+SETTLE_K     = 4.0     # settled = within SETTLE_K * noise floor of the final value
+SETTLE_HOLD  = 1.0     # ... for at least this many seconds
+NOISE_SPAN   = 30.0    # seconds per window when comparing filter noise
+DRIFT_BIN    = 60.0    # seconds per bin of the drift curve
+CLUSTER_GAP  = 30.0    # grams between settled weights that start a new glass group
+FILTER_SIZES = (5, 10, 20)
+CHUNK        = 200000  # samples per chunk for the moving median
+# ———————————————————— #
+
+
+def load(path):
+    """
+    Map a recording: returns (header dict, records) where records is a read-only
+    structured array (fields t, raw, flags) backed by the file itself.
+    """
+    head = np.memmap(path, dtype=np.uint8, mode="r", shape=(adcfile.HEADER.size,))
+    header = adcfile.readHeader(head.tobytes())
+    records = np.memmap(path, dtype=DTYPE, mode="r", offset=adcfile.HEADER.size,
+                        shape=(header["count"],))
+    return header, records
+
+
+def segments(flags):
+    """
+    (start, end, glass) index ranges over which the beam state doesn't change.
+    """
+    glass = (flags & adcfile.FLAG_GLASS) != 0
+    cuts = np.concatenate(([0], np.flatnonzero(np.diff(glass)) + 1, [len(glass)]))
+    return [(int(a), int(b), bool(glass[a])) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+
+def quietMask(t, flags, skip = SETTLE_SKIP):
+    """
+    True for samples at least `skip` seconds after the last beam change.
+    """
+    mask = np.ones(len(t), dtype=bool)
+    for start, end, _ in segments(flags):
+        mask[start:end] = t[start:end] >= t[start] + skip
+    return mask
+
+
+def noiseFloor(raw, quiet, window = NOISE_WINDOW):
+    """
+    Standard deviation of quiet samples, per window of `window` samples.
+    """
+    x = raw.astype(np.float64)
+    stds = []
+    for start, end in _runs(quiet):
+        n = (end - start) // window
+        if n:
+            stds.append(x[start:start + n*window].reshape(n, window).std(axis=1))
+    if not stds:
+        return {"windows": 0}
+    stds = np.concatenate(stds)
+    return {
+        "windows":   len(stds),
+        "median":    float(np.median(stds)),
+        "p90":       float(np.percentile(stds, 90)),
+        "max":       float(stds.max()),
+    }
+
+
+def drift(t, raw, flags, quiet, bin_s = DRIFT_BIN):
+    """
+    Empty-plate reading binned over time, with its linear trend per hour.
+    """
+    empty = quiet & ((flags & adcfile.FLAG_GLASS) == 0)
+    if empty.sum() < 2:
+        return {"bins": 0}
+    te, xe = t[empty], raw[empty].astype(np.float64)
+    bins = (te // bin_s).astype(np.int64)
+    keys, index = np.unique(bins, return_inverse=True)
+    means = np.bincount(index, weights=xe) / np.bincount(index)
+    centres = (keys + 0.5) * bin_s
+    slope = float(np.polyfit(centres, means, 1)[0]) * 3600 if len(keys) > 1 else 0.0
+    return {
+        "bins":          len(keys),
+        "range":         float(means.max() - means.min()),
+        "slope_per_h":   slope,
+        "start":         float(means[0]),
+        "end":           float(means[-1]),
+    }
+
+
+def settling(t, x, flags, tolerance):
+    """
+    For every placement (beam broken) return (settle seconds, settled value,
+    settled value minus the empty reading before it).
+    """
+    results = []
+    segs = segments(flags)
+    for i, (start, end, glass) in enumerate(segs):
+        if not glass or i == 0 or t[end - 1] - t[start] < 2 * SETTLE_SKIP:
+            continue
+        seg = x[start:end]
+        final = float(np.median(seg[len(seg)//2:]))
+        prev_start, prev_end, _ = segs[i - 1]
+        before = x[prev_start:prev_end]
+        empty = float(np.median(before[len(before)//2:]))
+        # settled from the first sample after which `hold` seconds stay in the band
+        inside = np.abs(seg - final) <= tolerance
+        hold = max(1, int(np.searchsorted(t[start:end] - t[start], SETTLE_HOLD)))
+        if len(inside) < hold:
+            continue
+        run = np.convolve(inside, np.ones(hold, dtype=np.int64), mode="valid")
+        full = np.flatnonzero(run == hold)
+        if not len(full):
+            continue
+        results.append((float(t[start + full[0]] - t[start]), final, final - empty))
+    return results
+
+
+def glassGroups(weights, gap = CLUSTER_GAP):
+    """
+    Group settled glass weights (grams) that lie within `gap` of each other.
+    """
+    if not len(weights):
+        return []
+    w = np.sort(np.asarray(weights))
+    splits = np.flatnonzero(np.diff(w) > gap) + 1
+    return [{"n": len(g), "mean_g": float(g.mean()), "std_g": float(g.std()),
+             "window_g": float(max(4 * g.std(), 5.0))}
+            for g in np.split(w, splits)]
+
+
+def movingMean(x, n):
+    c = np.cumsum(np.concatenate(([0.0], x)))
+    return (c[n:] - c[:-n]) / n
+
+
+def movingMedian(x, n):
+    out = np.empty(len(x) - n + 1)
+    for start in range(0, len(out), CHUNK):
+        stop = min(start + CHUNK, len(out))
+        out[start:stop] = np.median(sliding_window_view(x[start:stop + n - 1], n), axis=1)
+    return out
+
+
+def blocks(x, n):
+    m = len(x) // n
+    return x[:m*n].reshape(m, n)
+
+
+def blockMad(x, n, limit = 3.0):
+    """
+    The driver's outlier filter on blocks of `n`: mean of the readings within
+    `limit` median absolute deviations of the block median.
+    """
+    b = blocks(x, n)
+    med = np.median(b, axis=1, keepdims=True)
+    mad = np.median(np.abs(b - med), axis=1, keepdims=True)
+    mad[mad == 0] = 1
+    keep = np.abs(b - med) / mad <= limit
+    return (b * keep).sum(axis=1) / keep.sum(axis=1)
+
+
+def compareFilters(t, raw, flags, noise, sizes = FILTER_SIZES):
+    """
+    Residual noise on quiet stretches and median settling time for each filter.
+    """
+    x = raw.astype(np.float64)
+    quiet = quietMask(t, flags).astype(np.float64)
+    rows = {}
+    for n in [n for n in sizes if len(x) >= 2 * n]:
+        # an output is quiet only if every sample that went into it was
+        moving_quiet = movingMean(quiet, n) > 1.0 - 1e-9
+        rows[f"moving mean {n}"] = (movingMean(x, n), t[n-1:], flags[n-1:], moving_quiet)
+        rows[f"moving median {n}"] = (movingMedian(x, n), t[n-1:], flags[n-1:], moving_quiet)
+        bt, bf = blocks(t, n)[:, -1], blocks(flags, n).max(axis=1)
+        block_quiet = blocks(quiet, n).min(axis=1) == 1.0
+        rows[f"block mean {n}"] = (blocks(x, n).mean(axis=1), bt, bf, block_quiet)
+        rows[f"block median {n}"] = (np.median(blocks(x, n), axis=1), bt, bf, block_quiet)
+        rows[f"block mad {n}"] = (blockMad(x, n), bt, bf, block_quiet)
+
+    report = {}
+    for name, (y, ty, fy, qy) in rows.items():
+        rate = (len(ty) - 1) / (ty[-1] - ty[0]) if len(ty) > 1 and ty[-1] > ty[0] else 1.0
+        floor = noiseFloor(y, qy, max(5, int(NOISE_SPAN * rate)))
+        settle = settling(ty, y, fy, SETTLE_K * noise)
+        report[name] = {
+            "noise":    floor.get("median", 0.0),
+            "settle_s": float(np.median([s for s, _, _ in settle])) if settle else 0.0,
+        }
+    return report
+
+
+def analyse(path, ratio = None, window = NOISE_WINDOW):
+    header, rec = load(path)
+    t, raw, flags = rec["t"], rec["raw"], rec["flags"]
+    ratio = ratio or header["ratio"] or 1.0
+    quiet = quietMask(t, flags)
+    noise = noiseFloor(raw, quiet, window)
+    floor = noise.get("median", 1.0)
+    places = settling(t, raw.astype(np.float64), flags, SETTLE_K * floor)
+    return {
+        "header":   header,
+        "samples":  len(rec),
+        "hours":    float(t[-1] / 3600) if len(t) else 0.0,
+        "ratio":    ratio,
+        "noise":    noise,
+        "drift":    drift(t, raw, flags, quiet),
+        "settling": places,
+        "glasses":  glassGroups([w / ratio for _, _, w in places]),
+        "filters":  compareFilters(t, raw, flags, floor) if len(rec) else {},
+    }
+
+
+def _runs(mask):
+    """
+    (start, end) of every run of True in a boolean array.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return zip(edges[::2], edges[1::2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recording")
+    parser.add_argument("--ratio", type=float, default=None,
+                        help="counts per gram (default: the one stored in the file, else 1)")
+    parser.add_argument("--window", type=int, default=NOISE_WINDOW)
+    args = parser.parse_args()
+
+    r = analyse(args.recording, args.ratio, args.window)
+    g = r["ratio"]
+    print(f"{r['samples']} samples over {r['hours']:.2f} h at {r['header']['rate']:.0f} SPS")
+
+    n = r["noise"]
+    if n["windows"]:
+        print(f"\nNoise floor   median {n['median']:.1f} counts ({n['median']/g:.3f} g)"
+              f"   p90 {n['p90']:.1f}   max {n['max']:.1f}")
+    d = r["drift"]
+    if d["bins"]:
+        print(f"Drift         {d['slope_per_h']/g:+.3f} g/h   range {d['range']/g:.3f} g"
+              f" over {d['bins']} bins")
+
+    if r["settling"]:
+        times = np.array([s for s, _, _ in r["settling"]])
+        print(f"\nPlacements    {len(times)}   settle p50 {np.median(times):.2f} s"
+              f"   p90 {np.percentile(times, 90):.2f} s   max {times.max():.2f} s")
+        print("Glass groups (settled weight above the empty plate):")
+        for grp in r["glasses"]:
+            print(f"  {grp['n']:4d} x {grp['mean_g']:8.1f} g   sd {grp['std_g']:5.2f} g"
+                  f"   suggested window +/-{grp['window_g']:.1f} g")
+
+    if r["filters"]:
+        print(f"\n{'filter':20s} {'noise (g)':>10s} {'settle (s)':>11s}")
+        for name, f in r["filters"].items():
+            print(f"{name:20s} {f['noise']/g:10.3f} {f['settle_s']:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
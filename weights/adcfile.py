@@ -0,0 +1,70 @@
+"""
+File format for raw load-cell recordings (record_adc.py writes, adc_analysis.py reads).
+
+A fixed 64-byte header followed by a preallocated array of 16-byte records:
+
+    header:  magic, version, record size, capacity, count, start time (wall),
+             sample rate, counts per gram
+    record:  t (float64 s since start), raw (int32 signed count), flags (int32)
+
+The file is sized for `capacity` records up front and written through mmap, so
+recording never allocates or copies and the analysis side can map it straight
+into NumPy. `count` in the header is the number of valid records.
+"""
+import mmap
+import struct
+import time
+
+MAGIC   = b"ADCREC01"
+VERSION = 1
+HEADER  = struct.Struct("<8sIIQQddd8x")     # 64 bytes
+RECORD  = struct.Struct("<dii")             # 16 bytes
+COUNT_OFFSET = 24                            # where `count` lives in the header
+
+# Record flags
+FLAG_GLASS = 1      # IR beam broken while the sample was taken
+
+
+class ADCWriter(object):
+    def __init__(self, path, capacity, rate, ratio = 0.0):
+        """
+        Create `path` holding up to `capacity` records. `ratio` (counts per gram,
+        0 if unknown) is stored for the analysis.
+        """
+        self.capacity = capacity
+        self.count = 0
+        self.file = open(path, "w+b")
+        self.file.truncate(HEADER.size + capacity * RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.start = time.time()
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, RECORD.size, capacity, 0,
+                         self.start, rate, ratio)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, t, raw, flags = 0):
+        if self.count >= self.capacity:
+            return False
+        RECORD.pack_into(self.map, HEADER.size + self.count * RECORD.size, t, raw, flags)
+        self.count += 1
+        struct.pack_into("<Q", self.map, COUNT_OFFSET, self.count)
+        return True
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+def readHeader(buf):
+    magic, version, record_size, capacity, count, start, rate, ratio = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("not a load-cell recording")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"unsupported recording version {version}")
+    return {"capacity": capacity, "count": count, "start": start, "rate": rate, "ratio": ratio}
@@ -1,6 +1,9 @@
-import time
+import os
+import sys
 import RPi.GPIO as GPIO
-from hx711 import HX711
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from loadcell import HX711Reader
 
 GPIO.setwarnings(False)
 GPIO.setmode(GPIO.BCM)
@@ -8,10 +11,13 @@ GPIO.setmode(GPIO.BCM)
 DATA_PIN  = 4    # HX711 DOUT → BCM4 (pin 7)
 CLOCK_PIN = 16   # HX711 SCK  → BCM16 (pin 36)
 
-hx = HX711(dout_pin=DATA_PIN, pd_sck_pin=CLOCK_PIN)
+hx = HX711Reader(dout_pin=DATA_PIN, pd_sck_pin=CLOCK_PIN)
 
 hx.zero()
 
-while True:
-	reading = hx.get_data_mean()
-	print(reading)
+try:
+	while True:
+		reading = hx.get_data_mean()
+		print(reading)
+except KeyboardInterrupt:
+	print(hx.stats())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Record every raw HX711 sample, with its time and the IR beam state, to a
+memory-mapped file for later analysis with adc_analysis.py:
+
+    python3 record_adc.py shift.adc --hours 8
+    python3 adc_analysis.py shift.adc
+"""
+import os
+import sys
+import time
+import argparse
+import RPi.GPIO as GPIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from loadcell import HX711Reader
+from adcfile import ADCWriter, FLAG_GLASS
+
+# ————— CONFIG ————— #
+DT_PIN   = 4     # HX711 DOUT → BCM4 (pin 7)
+CLK_PIN  = 16    # HX711 SCK  → BCM16 (pin 36)
+IR_PIN   = 22    # IR break-beam, LOW while a glass is in it
+RATE     = 10    # samples per second the HX711 is strapped for (10 or 80)
+FLUSH_S  = 5.0   # seconds between flushes of the map to disk
+# —————————————— #
+
+GPIO.setwarnings(False)
+GPIO.setmode(GPIO.BCM)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--hours", type=float, default=1.0,
+                        help="space to preallocate (recording stops when full)")
+    parser.add_argument("--rate", type=int, default=RATE)
+    parser.add_argument("--ratio", type=float, default=0.0,
+                        help="counts per gram, if known (from tare_scale.py)")
+    args = parser.parse_args()
+
+    GPIO.setup(IR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    hx = HX711Reader(dout_pin=DT_PIN, pd_sck_pin=CLK_PIN, rate=args.rate)
+    hx.reset()
+
+    capacity = int(args.hours * 3600 * args.rate * 1.05)
+    writer = ADCWriter(args.output, capacity, args.rate, args.ratio)
+    print(f"Recording up to {capacity} samples to {args.output}: Ctrl-C to stop\n")
+
+    start = time.monotonic()
+    flushed = start
+    try:
+        for raw in hx.samples():
+            now = time.monotonic()
+            flags = FLAG_GLASS if GPIO.input(IR_PIN) == GPIO.LOW else 0
+            if not writer.append(now - start, raw, flags):
+                print("\nFile full")
+                break
+            if now - flushed >= FLUSH_S:
+                writer.flush()
+                flushed = now
+                print(f"{writer.count} samples  {raw:9d}", end="\r", flush=True)
+        else:
+            print("\nHX711 stopped answering")
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        writer.close()
+        print(f"\n{writer.count} samples written. Reads: {hx.stats()}")
+        GPIO.cleanup()
+
+
+if __name__ == "__main__":
+    main()
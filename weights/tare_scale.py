@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import RPi.GPIO as GPIO
-from hx711 import HX711
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from loadcell import HX711Reader
 from statistics import StatisticsError
 
 # ————— HARDWARE CONFIG ————— #
@@ -16,7 +20,7 @@ GPIO.setwarnings(False)
 GPIO.setmode(GPIO.BCM)
 
 # Instantiate HX711 on channel A, gain=128
-hx = HX711(
+hx = HX711Reader(
     dout_pin       = DT_PIN,
     pd_sck_pin     = CLK_PIN,
     gain_channel_A = 128,